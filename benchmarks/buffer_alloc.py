@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+下载缓冲区内存分配对比
+用法：
+  python benchmarks/buffer_alloc.py [图片大小MB] [图片数]
+
+对比旧路径（16KB 分块 + b''.join + 头部探测 bytes() 拷贝 + 网格/预览/剪贴板各自
+QByteArray 拷贝）与新路径（按 Content-Length 预分配 readinto + 共享只读缓冲区，
+Qt 侧只构造一次 QByteArray）每张图片分配的字节数。
+Python 侧用 tracemalloc 统计，Qt 侧按构造的 QByteArray 字节数统计。
+"""
+
+import io
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import QByteArray
+
+from src.utils.image_buffer import BodyReader, as_qbytearray
+
+CHUNK = 16384
+CONSUMERS = ('grid', 'preview', 'clipboard')
+
+
+class FakeRaw(io.BytesIO):
+    """模拟 urllib3 原始响应流（支持 readinto）"""
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.headers = {'Content-Length': str(len(payload))}
+        self.raw = FakeRaw(payload)
+
+    def iter_content(self, chunk_size):
+        while True:
+            chunk = self.raw.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def legacy_path(payload):
+    """旧实现：返回 (Python 分配峰值, Qt 拷贝字节数)"""
+    response = FakeResponse(payload)
+    tracemalloc.start()
+    chunks = []
+    header_probe = bytearray()
+    for chunk in response.iter_content(CHUNK):
+        chunks.append(chunk)
+        if len(header_probe) < 64 * 1024:
+            header_probe.extend(chunk)
+            bytes(header_probe)  # 每块一次头部探测拷贝
+    data = b''.join(chunks)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    qt_bytes = 0
+    for _ in CONSUMERS:
+        qt_bytes += QByteArray(data).size()
+    return peak, qt_bytes
+
+
+def shared_path(payload):
+    """新实现：返回 (Python 分配峰值, Qt 拷贝字节数)"""
+    response = FakeResponse(payload)
+    tracemalloc.start()
+    reader = BodyReader(response, chunk_size=CHUNK)
+    for _ in reader:
+        pass
+    data = reader.result()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    seen = set()
+    qt_bytes = 0
+    for _ in CONSUMERS:
+        qbytes = as_qbytearray(data)
+        if id(qbytes) not in seen:
+            seen.add(id(qbytes))
+            qt_bytes += qbytes.size()
+    return peak, qt_bytes
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 3
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    payload = os.urandom(int(size_mb * 1024 * 1024))
+
+    for name, fn in (('legacy', legacy_path), ('shared', shared_path)):
+        py_total = qt_total = 0
+        for _ in range(count):
+            py, qt = fn(payload)
+            py_total += py
+            qt_total += qt
+        per_image = (py_total + qt_total) / count / 1024 / 1024
+        print(f"{name:<7} python_peak={py_total / count / 1024 / 1024:6.2f}MB  "
+              f"qt_copies={qt_total / count / 1024 / 1024:6.2f}MB  "
+              f"per_image={per_image:6.2f}MB  ({per_image / size_mb:.1f}x payload)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+内存缓存多线程压力测试
+用法：
+  python benchmarks/cache_stress.py [线程数] [每线程操作数]
+
+多个线程按热点分布并发 get/set，输出吞吐量，并在结束后校验每个分片的
+字节计数、配额与统计数字是否一致（分片数 1 相当于单锁，用于对比锁竞争）；
+每种淘汰策略各运行一遍。
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.eviction import POLICIES
+from src.utils.image_cache import ImageMemoryCache
+
+
+def make_urls(n):
+    """生成 n 张图片在不同域名、不同尺寸段下的 URL"""
+    urls = []
+    for i in range(n):
+        host = f"wx{i % 4 + 1}.sinaimg.cn"
+        variant = ('orj360', 'bmiddle', 'mw1024')[i % 3]
+        urls.append(f"https://{host}/{variant}/006pic{i:06d}.jpg")
+    return urls
+
+
+def worker(cache, urls, ops, seed, counters):
+    rng = random.Random(seed)
+    hot = urls[:len(urls) // 10]
+    gets = 0
+    for _ in range(ops):
+        url = rng.choice(hot) if rng.random() < 0.8 else rng.choice(urls)
+        if cache.get(url) is None:
+            cache.set(url, b'x' * rng.randint(4 * 1024, 64 * 1024))
+        gets += 1
+    counters.append(gets)
+
+
+def check(cache):
+    """校验分片内部一致性，返回错误列表"""
+    errors = []
+    for i, shard in enumerate(cache._shards):
+        with shard.lock:
+            total = sum(size for _, size in shard.entries.values())
+            if total != shard.bytes:
+                errors.append(f"分片 {i}: 字节计数 {shard.bytes} != 实际 {total}")
+            if shard.policy.bytes != shard.bytes:
+                errors.append(f"分片 {i}: 策略字节计数 {shard.policy.bytes} != {shard.bytes}")
+            if shard.bytes > shard.max_bytes:
+                errors.append(f"分片 {i}: 超出配额 {shard.bytes} > {shard.max_bytes}")
+            for key, (data, size) in shard.entries.items():
+                if len(data) != size:
+                    errors.append(f"分片 {i}: {key} 记录大小不一致")
+                    break
+    return errors
+
+
+def run(shards, threads, ops, policy='lru'):
+    cache = ImageMemoryCache(max_size_mb=20, shards=shards, policy=policy)
+    urls = make_urls(5000)
+    counters = []
+    pool = [threading.Thread(target=worker, args=(cache, urls, ops, seed, counters))
+            for seed in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    stats = cache.get_stats()
+    errors = check(cache)
+    if stats['hits'] + stats['misses'] != sum(counters):
+        errors.append(f"统计不一致: hits+misses={stats['hits'] + stats['misses']} 实际 get={sum(counters)}")
+
+    print(f"policy={policy:<8} shards={shards:<2} threads={threads:<2} "
+          f"{sum(counters) / elapsed:>10.0f} ops/s  "
+          f"hit_rate={stats['hit_rate']:.2f}  size={stats['size_mb']:.1f}MB  "
+          f"count={stats['count']}  {'OK' if not errors else 'CORRUPT'}")
+    for e in errors[:10]:
+        print("  " + e)
+    return not errors
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    ok = True
+    for policy in POLICIES:
+        for shards in (1, 4, 16):
+            ok = run(shards, threads, ops, policy) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
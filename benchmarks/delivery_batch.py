@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+加载结果交付方式对比（逐条排队 vs 按帧批量）
+用法：
+  QT_QPA_PLATFORM=offscreen python benchmarks/delivery_batch.py [结果数] [轮数]
+
+模拟 N 个缓存命中的缩略图同时完成：工作线程同时发出结果，
+- queued：每条结果一个排队信号，UI 线程逐条设置图片（旧实现）
+- batched：经 DeliveryBatcher 合并，批次结束后统一布局一次（只有被设置图片的卡片重绘）
+统计从发出到全部应用（含布局与重绘）所用的事件循环轮次与耗时。
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QImage, QPixmap
+from PyQt6.QtWidgets import QApplication, QGridLayout, QLabel, QWidget
+
+from src.utils.delivery import DeliveryBatcher
+
+COLUMNS = 4
+SIDE = 120
+
+
+class Emitter(QObject):
+    loaded = pyqtSignal(int, object)
+
+
+def make_grid(n):
+    grid = QWidget()
+    layout = QGridLayout(grid)
+    labels = []
+    for i in range(n):
+        label = QLabel()
+        label.setFixedSize(SIDE, SIDE)
+        layout.addWidget(label, i // COLUMNS, i % COLUMNS)
+        labels.append(label)
+    grid.show()
+    return grid, layout, labels
+
+
+def make_thumbs(n):
+    thumbs = []
+    for i in range(n):
+        image = QImage(SIDE, SIDE, QImage.Format.Format_ARGB32_Premultiplied)
+        image.fill(QColor.fromHsv(i * 37 % 360, 160, 220))
+        thumbs.append(image)
+    return thumbs
+
+
+def run(app, n, batched):
+    """返回 (耗时毫秒, 交付轮次)"""
+    grid, layout, labels = make_grid(n)
+    thumbs = make_thumbs(n)
+    app.processEvents()
+    done = [0]
+    turns = [0]
+
+    def apply(index, thumb):
+        labels[index].setPixmap(QPixmap.fromImage(thumb))
+        labels[index].updateGeometry()
+        done[0] += 1
+
+    emitter = Emitter()
+    if batched:
+        batcher = DeliveryBatcher()
+        batcher.batch_finished.connect(lambda _n: layout.activate())
+        batcher.batch_finished.connect(lambda _n: turns.__setitem__(0, turns[0] + 1))
+        emitter.loaded.connect(lambda i, t: batcher.post(apply, i, t), Qt.ConnectionType.DirectConnection)
+    else:
+        def on_loaded(i, t):
+            turns[0] += 1
+            apply(i, t)
+        emitter.loaded.connect(on_loaded, Qt.ConnectionType.QueuedConnection)
+
+    def worker():
+        for i in range(n):
+            emitter.loaded.emit(i, thumbs[i])
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=worker)
+    thread.start()
+    while done[0] < n or thread.is_alive():
+        app.processEvents()
+    grid.repaint()
+    elapsed = (time.perf_counter() - started) * 1000
+    thread.join()
+    grid.close()
+    grid.deleteLater()
+    app.processEvents()
+    return elapsed, turns[0]
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    results = {}
+    for name, batched in (('queued', False), ('batched', True)):
+        total_ms = total_turns = 0
+        for _ in range(rounds):
+            ms, turns = run(app, n, batched)
+            total_ms += ms
+            total_turns += turns
+        results[name] = total_ms / rounds
+        print(f"{name:<8} results={n}  avg_ms={total_ms / rounds:7.2f}  "
+              f"deliveries={total_turns / rounds:5.1f}")
+    saved = results['queued'] - results['batched']
+    print(f"event loop time saved: {saved:.2f}ms per burst of {n}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+滚动 500 个结果时的常驻内存（RSS）对比
+用法：
+  python benchmarks/scroll_memory.py [结果数]
+
+模拟网格滚动：每张图片“下载”后进入内存缓存，可见卡片持有原始数据（GIF 另有 QBuffer），
+每 10 张悬停预览一次，每 50 张复制一次；卡片离开视口即回收。
+- legacy：各持有方各自一份（bytes + 卡片/预览/剪贴板各自构造 QByteArray）
+- shared：共享只读缓冲区 + 句柄登记表，所有持有方共用一份
+每种模式在独立子进程中运行，输出滚动过程中的 RSS 峰值与结束时的 RSS。
+"""
+
+import os
+import random
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+VISIBLE = 48   # 可见 + 缓冲行的卡片数（4 列 x 12 行）
+STEP = 4       # 每次滚动一行
+
+
+def rss_mb():
+    """当前常驻内存（MB）"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def make_results(n):
+    rng = random.Random(7)
+    results = []
+    for i in range(n):
+        gif = rng.random() < 0.6
+        size = rng.randint(40, 400) * 1024 if rng.random() < 0.9 else rng.randint(1024, 3072) * 1024
+        results.append((f"https://wx{i % 4 + 1}.sinaimg.cn/mw690/006bench{i:06d}.gif", size, gif))
+    return results
+
+
+def download(size, rng):
+    """模拟分块下载得到的数据"""
+    return rng.randbytes(size)
+
+
+def run(mode, n):
+    from PyQt6.QtCore import QBuffer, QByteArray, QMimeData
+    from src.utils.image_cache import ImageMemoryCache
+    from src.utils.image_buffer import ImageHandleRegistry, as_qbytearray
+
+    rng = random.Random(11)
+    cache = ImageMemoryCache()
+    handles = ImageHandleRegistry()
+    results = make_results(n)
+    cards = {}        # 索引 -> 卡片持有的对象
+    preview = None
+    clipboard = None
+    baseline = rss_mb()
+    peak = baseline
+
+    def load(url, size):
+        data = cache.get(url)
+        if data is None:
+            data = download(size, rng)
+            if mode == 'shared':
+                data = handles.intern(url, data)
+            cache.set(url, data)
+        return data
+
+    for top in range(0, max(1, n - VISIBLE + 1), STEP):
+        visible = range(top, min(n, top + VISIBLE))
+        for idx in list(cards):
+            if idx not in visible:
+                del cards[idx]
+        for idx in visible:
+            if idx in cards:
+                continue
+            url, size, gif = results[idx]
+            data = load(url, size)
+            held = [data]
+            if gif:
+                buf = QBuffer()
+                buf.setData(as_qbytearray(data) if mode == 'shared' else QByteArray(data))
+                held.append(buf)
+            cards[idx] = held
+            if idx % 10 == 0:
+                preview = as_qbytearray(data) if mode == 'shared' else QByteArray(data)
+            if idx % 50 == 0:
+                clipboard = QMimeData()
+                clipboard.setData('image/gif', as_qbytearray(data) if mode == 'shared' else QByteArray(data))
+        peak = max(peak, rss_mb())
+
+    final = rss_mb()
+    del preview, clipboard
+    stats = cache.get_stats()
+    print(f"{mode:<7} results={n}  peak_rss={peak - baseline:7.1f}MB  final_rss={final - baseline:7.1f}MB  "
+          f"cache={stats['size_mb']:.1f}MB/{stats['count']}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    if len(sys.argv) > 2:
+        run(sys.argv[2], n)
+        return 0
+    for mode in ('legacy', 'shared'):
+        subprocess.run([sys.executable, os.path.abspath(__file__), str(n), mode], check=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
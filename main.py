@@ -6,6 +6,7 @@ macOS 原生风格 + 性能优化
 
 import sys
 import signal
+import multiprocessing
 from src.core.app import MojiApp
 
 
@@ -18,6 +19,9 @@ def signal_handler(sig, frame):
 
 
 if __name__ == '__main__':
+    # 解码子进程使用 spawn 启动（打包后的可执行文件需要）
+    multiprocessing.freeze_support()
+
     # 注册信号处理器
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
@@ -8,6 +8,7 @@ from urllib.parse import quote
 from collections import OrderedDict
 from datetime import datetime, timedelta
 from src.utils.network import NetworkManager
+from src.utils.net_timing import net_timing
 
 
 class SearchCache:
@@ -81,6 +82,8 @@ class WeiboAPI:
                     stream=False
                 )
 
+                net_timing.finish(response)
+
                 if response.status_code == 200:
                     data = response.json()
                     # 有时 ok!=1 表示被限流/反爬，虽然返回 200，但没有数据
@@ -89,7 +92,7 @@ class WeiboAPI:
                         time.sleep(1.2 * (retry + 1))
                         # 轻量预热一次主页以尝试获取必要的 cookie
                         try:
-                            session.get('https://m.weibo.cn/', headers=cls.HEADERS, timeout=(2, 5))
+                            net_timing.finish(session.get('https://m.weibo.cn/', headers=cls.HEADERS, timeout=(2, 5)))
                         except Exception:
                             pass
                         continue
@@ -104,7 +107,7 @@ class WeiboAPI:
                     time.sleep(1.2 * (retry + 1))
                     # 预热主页后再试
                     try:
-                        session.get('https://m.weibo.cn/', headers=cls.HEADERS, timeout=(2, 5))
+                        net_timing.finish(session.get('https://m.weibo.cn/', headers=cls.HEADERS, timeout=(2, 5)))
                     except Exception:
                         pass
                     continue
@@ -147,6 +150,12 @@ class WeiboAPI:
                 return False
             return False
 
+        def remember_size(url, w, h):
+            # 登记原图尺寸（按图片 ID），各尺寸段据此决定是否还需下载前探测
+            if w and h:
+                from src.utils.image_probe import image_probe
+                image_probe.remember_original(url, w, h)
+
         for card in cards:
             if card.get('card_type') != 9:
                 continue
@@ -163,6 +172,7 @@ class WeiboAPI:
                 h = lg.get('h') or lg.get('height') or pic.get('h') or pic.get('height') or geo.get('height')
                 if is_oversize(w, h):
                     continue
+                remember_size(url, w, h)
                 images.append(url)
                 seen.add(url)
 
@@ -187,6 +197,7 @@ class WeiboAPI:
                     h = size_src.get('height') or size_src.get('h') or info.get('height') or info.get('h')
                     if is_oversize(w, h):
                         continue
+                    remember_size(cand, w, h)
                     images.append(cand)
                     seen.add(cand)
 
@@ -77,10 +77,24 @@ class MojiApp:
 
         show_action = QAction("打开 Moji", None)
         show_action.triggered.connect(self.show_window)
+        # 省流模式：小尺寸图片 + 流量预算（适合热点/计流量网络）
+        from src.utils.bandwidth import bandwidth_budget
+        self.data_saver_action = QAction("省流模式", None)
+        self.data_saver_action.setCheckable(True)
+        self.data_saver_action.setChecked(bandwidth_budget.enabled)
+        self.data_saver_action.toggled.connect(bandwidth_budget.set_enabled)
+        # 隔离解码：大图在子进程中解码，超时/崩溃不影响应用
+        from src.utils.decode_service import decode_service
+        self.isolated_decode_action = QAction("隔离解码大图", None)
+        self.isolated_decode_action.setCheckable(True)
+        self.isolated_decode_action.setChecked(decode_service.enabled)
+        self.isolated_decode_action.toggled.connect(decode_service.set_enabled)
         quit_action = QAction("退出", None)
         quit_action.triggered.connect(self.quit)
 
         menu.addAction(show_action)
+        menu.addAction(self.data_saver_action)
+        menu.addAction(self.isolated_decode_action)
         menu.addSeparator()
         menu.addAction(quit_action)
 
@@ -255,6 +269,14 @@ class MojiApp:
             self.window.cleanup()
             self.window.close()
 
+        # 结束解码子进程
+        from src.utils.decode_service import decode_service
+        decode_service.shutdown()
+
+        # 写出缓存访问记录的缓冲内容
+        from src.utils.image_cache import image_cache
+        image_cache.stop_trace()
+
         # 隐藏托盘图标
         if hasattr(self, 'tray'):
             self.tray.hide()
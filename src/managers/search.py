@@ -2,12 +2,27 @@
 搜索逻辑管理器
 """
 
-from PyQt6.QtCore import QObject, pyqtSignal, QTimer
+from PyQt6.QtCore import QObject, pyqtSignal, QTimer, QThreadPool
 from PyQt6.QtGui import QPixmap
 from src.core.api import WeiboAPI
-from src.utils.loaders import ImageLoader
+from src.utils.loaders import get_grid_url, get_display_url, get_thumb_url, get_copy_url, is_gif_url
 from src.managers.virtual_scroll import VirtualScrollManager
-from src.utils.thread_pool import ImageThreadPool
+from src.utils.thread_pool import ImageThreadPool, PRIORITY_URGENT
+from src.utils.bandwidth import bandwidth_budget
+from src.utils.net_timing import net_timing
+from src.utils.image_cache import image_cache
+from src.utils.disk_cache import disk_cache
+from src.utils.derivatives import derivative_store, GRID_SIDE
+from src.utils.image_probe import image_probe
+from src.utils.progressive import partial_store
+from src.utils.preview_cache import preview_cache
+from src.utils.clipboard_files import clipboard_files
+from src.utils.clipboard_payload import clipboard_payloads
+from src.utils.image_buffer import image_handles
+from src.utils.decode_service import decode_service
+from src.utils.phash import perceptual_hashes, DuplicateIndex
+from src.utils.memory_governor import MemoryGovernor
+from collections import deque
 import time
 
 
@@ -17,7 +32,7 @@ class SearchManager(QObject):
     # 信号定义
     error_occurred = pyqtSignal(str)
     loading_status_changed = pyqtSignal(bool, str)  # loading, message
-    image_loaded = pyqtSignal(int, bytes)
+    image_loaded = pyqtSignal(int, object, object)  # index, data（bytes-like）, 缩略图 QImage（可能为 None）
 
     def __init__(self, grid_layout, scroll_area):
         super().__init__()
@@ -33,10 +48,28 @@ class SearchManager(QObject):
         self.virtual_manager = VirtualScrollManager(visible_rows=4, cols=4)
         self.active_widgets = {}  # 当前活动的widget {index: widget}
         self.filtered_indices = set()  # 被过滤（超大图等）的索引集合
-
-        # 使用线程池替代原来的 self.loaders = {}
+        self.deferred_prefetch = set()  # 预算耗尽时跳过的预取索引，进入视口后再加载
+        self.progressive_gifs = True    # 网格 GIF 只下载首帧，悬停时续传完整动图
+        self.copy_prefetches = {}       # 悬停意图预取 {url: 请求键}
+        self.copy_latencies = deque(maxlen=200)  # 点击到写入剪贴板的耗时 [(秒, 来源: prepared/cache/fetch)]
+        self.collapse_duplicates = True  # 合并同一搜索中的近似重复表情（感知哈希）
+        self.duplicates = DuplicateIndex()
+        self.loaded_indices = set()  # 已交付过的索引（悬停续传完整动图时会再次交付）
+        QThreadPool.globalInstance().start(perceptual_hashes.warm)
+        QThreadPool.globalInstance().start(disk_cache.warm)  # 磁盘缓存索引在工作线程建立，UI 线程查询不阻塞
+        QThreadPool.globalInstance().start(derivative_store.warm)
+        self._in_batch = False
+        self._relayout_pending = False
+
+        # 图片加载线程池
         self.image_pool = ImageThreadPool(max_threads=8)
-        self.loaders = {}  # 保留以保持应急兼容性
+        # 按帧批量交付：批次内推迟压缩排布，结束后统一布局一次；只有被设置图片的卡片重绘
+        self.image_pool.batcher.batch_started.connect(self._begin_delivery_batch)
+        self.image_pool.batcher.batch_finished.connect(self._end_delivery_batch)
+
+        # 内存预算：卡片动画/解码帧/缓存字节超出预算时依次释放
+        self.memory_governor = MemoryGovernor(parent=self)
+        self.memory_governor.watch(self.active_widgets, self.virtual_manager)
 
         # 性能监控
         self.metrics = {
@@ -64,6 +97,7 @@ class SearchManager(QObject):
         self.metrics['first_image_time'] = None
         self.metrics['images_loaded'] = 0
         self.metrics['errors'] = 0
+        bandwidth_budget.start_search()
 
         self.keyword = keyword
         self.page = 1
@@ -84,25 +118,16 @@ class SearchManager(QObject):
         """清理网格 - 使用线程池的取消机制"""
         # 取消所有图片加载任务
         self.image_pool.cancel_all()
-
-        # 兼容旧的loader逻辑
-        if self.loaders:
-            for loader in self.loaders.values():
-                if hasattr(loader, 'request_stop'):
-                    loader.request_stop()
-            for loader in self.loaders.values():
-                if not loader.wait(100):
-                    if loader.isRunning():
-                        print(f"Warning: Force terminating loader {loader.index}")
-                        loader.terminate()
-                        loader.wait(50)
-            self.loaders.clear()
+        self.copy_prefetches.clear()
 
         # 4. 回收widget
         for widget in self.active_widgets.values():
             self.virtual_manager.recycle_widget(widget)
         self.active_widgets.clear()
         self.filtered_indices.clear()
+        self.deferred_prefetch.clear()
+        self.duplicates.clear()
+        self.loaded_indices.clear()
 
         # 5. 清理布局
         while self.grid_layout.count():
@@ -126,7 +151,10 @@ class SearchManager(QObject):
 
             if images:
                 # 添加到虚拟管理器
+                base = len(self.virtual_manager.all_urls)
                 self.virtual_manager.append_urls(images)
+                # 哈希已知的重复表情直接过滤，不再下载
+                self._collapse_known_duplicates(base)
                 # 更新容器最小高度，制造可滚动空间
                 self.update_container_height()
                 print(f"[load_images] page={self.page}, images={len(images)}, total={len(self.virtual_manager.all_urls)}, "
@@ -242,13 +270,15 @@ class SearchManager(QObject):
         end_row_exclusive = (start_idx + len(urls) + cols - 1) // cols
         visible_rows = max(0, end_row_exclusive - start_row)
 
+        # 计算 start 之前未被过滤的条目数 -> 有效起始行
+        filtered_before = sum(1 for i in self.filtered_indices if i < start_idx)
+        non_filtered_before = max(0, start_idx - filtered_before)
+        start_row_eff = non_filtered_before // cols
+        # 视口实际覆盖的有效行区间；区间外的缓冲行视为预取
+        first_row, last_row, center_row = self._viewport_row_range()
+
         # 1) 顶/底占位：按“非过滤条目”的行数精确撑起离屏行高，避免中间出现大空白
         if getattr(self, '_use_spacers', False):
-            # 计算 start 之前未被过滤的条目数 -> 有效起始行
-            filtered_before = sum(1 for i in self.filtered_indices if i < start_idx)
-            non_filtered_before = max(0, start_idx - filtered_before)
-            start_row_eff = non_filtered_before // cols
-
             # 可见的“有效”行数
             visible_count = len(visible_indices)
             visible_rows_eff = max(0, (visible_count + cols - 1) // cols)
@@ -284,18 +314,23 @@ class SearchManager(QObject):
             url = self.virtual_manager.all_urls[idx]
             row = (j // cols) + 1              # +1：避开顶部占位行
             col = j % cols
+            row_eff = start_row_eff + j // cols
+            in_view = first_row <= row_eff < last_row
+            # 优先级 = 距视口中心的行距：视口中央最先下载，缓冲行其后
+            priority = abs(row_eff + 0.5 - center_row)
 
             if idx not in self.active_widgets:
                 widget = self.virtual_manager.get_widget()
                 widget.url = url
                 self.active_widgets[idx] = widget
                 # 使用线程池加载图片
-                self.image_pool.load_image(
-                    url,
-                    idx,
-                    self._handle_image_loaded,
-                    self._handle_image_error
-                )
+                self._request_image(idx, url, prefetch=not in_view, priority=priority)
+            elif in_view and idx in self.deferred_prefetch:
+                # 之前因预算跳过的预取项进入视口，补加载
+                self._request_image(idx, url, priority=priority)
+            else:
+                # 滚动后重新排序仍在排队的任务
+                self.image_pool.set_priority(idx, priority)
 
             # 摆放位置
             widget = self.active_widgets[idx]
@@ -311,9 +346,117 @@ class SearchManager(QObject):
                 to_remove.append(idx)
         for idx in to_remove:
             del self.active_widgets[idx]
+            self.deferred_prefetch.discard(idx)
+            # 取消离屏卡片的下载（接近完成的降级为仅填充缓存）
+            self.image_pool.cancel(idx)
+
+    def _viewport_row_range(self):
+        """当前视口覆盖的有效行区间 [first, last)（不含上下缓冲行）及视口中心所在行（浮点）"""
+        rh = self.virtual_manager.row_height
+        v = self.scroll_area.verticalScrollBar().value()
+        h = self.scroll_area.viewport().height()
+        return int(v / rh), int((v + h) / rh) + 1, (v + h / 2) / rh
+
+    def _grid_url(self, url):
+        """网格下载使用的尺寸：省流模式用 thumb150，否则按卡片尺寸和像素比选小图（不再下载 large）"""
+        if bandwidth_budget.enabled:
+            return get_thumb_url(url)
+        try:
+            dpr = self.scroll_area.devicePixelRatioF()
+        except Exception:
+            dpr = 1.0
+        return get_grid_url(url, GRID_SIDE, dpr)
+
+    def _request_image(self, idx, url, prefetch=False, priority=0):
+        """按省流策略提交图片加载；预算耗尽时跳过预取，待进入视口再加载"""
+        if prefetch and not bandwidth_budget.allow_prefetch():
+            self.deferred_prefetch.add(idx)
+            return
+        self.deferred_prefetch.discard(idx)
+
+        # 省流模式下 GIF 先显示缩略图，悬停时再下载完整动图
+        widget = self.active_widgets.get(idx)
+        if widget is not None:
+            widget.deferred_full = bandwidth_budget.enabled and is_gif_url(url)
+
+        self.image_pool.load_image(
+            self._grid_url(url),
+            idx,
+            self._handle_image_loaded,
+            self._handle_image_error,
+            priority=priority,
+            first_frame_only=self.progressive_gifs and not bandwidth_budget.enabled and is_gif_url(url)
+        )
+
+    def load_full_image(self, url):
+        """悬停 GIF：按需下载完整动图（失败时保留缩略图，下次悬停重试）
+        - 渐进式：下载网格尺寸的完整内容（部分下载仍在时续传其余字节，已被淘汰时重新完整下载）
+        - 省流模式：网格为 thumb150，下载显示尺寸"""
+        full_url = get_display_url(url) if bandwidth_budget.enabled else self._grid_url(url)
+        for idx, widget in self.active_widgets.items():
+            if widget.url == url:
+                self.image_pool.load_image(
+                    full_url, idx, self._handle_image_loaded,
+                    lambda i, _code, _message, u=url: self._on_full_failed(i, u),
+                    priority=PRIORITY_URGENT, first_frame_only=False
+                )
+                return
 
+    def _on_full_failed(self, index, url):
+        """完整动图下载失败：恢复卡片的待下载状态，保留首帧"""
+        widget = self.active_widgets.get(index)
+        if widget is not None and widget.url == url:
+            widget.full_failed()
 
 
+    def prefetch_copy(self, url):
+        """悬停意图：把复制尺寸预取到缓存，并在工作线程提前准备好剪贴板数据，点击时即可直接复制
+        已准备、已在预取或预算不允许时跳过"""
+        copy_url = get_copy_url(url)
+        if url in self.copy_prefetches or clipboard_payloads.get(copy_url) is not None:
+            return
+        if image_cache.contains(copy_url) or disk_cache.contains(copy_url, block=False):
+            clipboard_payloads.prepare(copy_url)
+            return
+        if not bandwidth_budget.allow_prefetch():
+            return
+        self.copy_prefetches[url] = self.image_pool.fetch(
+            copy_url,
+            lambda data, u=url: self._on_copy_prefetched(u, data),
+            lambda _code, _message, u=url: self.copy_prefetches.pop(u, None),
+            priority=PRIORITY_URGENT
+        )
+
+    def _on_copy_prefetched(self, url, data):
+        self.copy_prefetches.pop(url, None)
+        clipboard_payloads.prepare(get_copy_url(url), data)
+
+    def cancel_copy_prefetch(self, url):
+        """离开卡片：取消未完成的预取（接近完成的降级为仅填充缓存；已点击复制的请求不受影响）"""
+        key = self.copy_prefetches.pop(url, None)
+        if key is not None:
+            self.image_pool.cancel(key)
+
+    def record_copy_latency(self, seconds, source):
+        """记录点击到写入剪贴板的耗时（source: prepared 已准备 / cache 已缓存 / fetch 需下载）"""
+        self.copy_latencies.append((seconds, source))
+
+    def _copy_latency_stats(self):
+        """点击复制耗时统计（毫秒），按来源（prepared / cache / fetch）计数"""
+        if not self.copy_latencies:
+            return {'count': 0}
+        ms = sorted(s * 1000 for s, _ in self.copy_latencies)
+        sources = [src for _, src in self.copy_latencies]
+        return {
+            'count': len(ms),
+            'avg_ms': sum(ms) / len(ms),
+            'p50_ms': ms[len(ms) // 2],
+            'p90_ms': ms[min(len(ms) - 1, int(len(ms) * 0.9))],
+            'max_ms': ms[-1],
+            'cached_rate': sum(1 for src in sources if src != 'fetch') / len(sources),
+            'sources': {name: sources.count(name) for name in ('prepared', 'cache', 'fetch')}
+        }
+
     def _first_render(self):
         """首屏渲染（延后一拍执行，避免布局未稳定导致可视区计算异常）"""
         try:
@@ -339,7 +482,17 @@ class SearchManager(QObject):
         except Exception as e:
             self.error_occurred.emit(f"首屏渲染异常: {e}")
 
-    def _handle_image_loaded(self, index, data):
+    def _begin_delivery_batch(self):
+        """交付批次开始：批次内的过滤只标记，压缩排布推迟到批次结束
+        （不暂停整个网格的重绘：批次内只有被设置图片的卡片各自请求重绘，Qt 在下一次绘制时合并）"""
+        self._in_batch = True
+
+    def _end_delivery_batch(self, count):
+        self._in_batch = False
+        if self._relayout_pending:
+            self._relayout()
+
+    def _handle_image_loaded(self, index, data, thumb=None):
         """处理图片加载完成 - 记录性能数据"""
         # 记录第一张图片加载时间
         if self.metrics['first_image_time'] is None:
@@ -347,8 +500,55 @@ class SearchManager(QObject):
             ttfi = self.metrics['first_image_time'] - self.metrics['search_start_time']
             print(f"[Performance] Time to first image: {ttfi:.2f}s")
 
-        self.metrics['images_loaded'] += 1
-        self.image_loaded.emit(index, data)
+        # 同一索引再次交付（完整动图替换首帧）：已通过去重检查，不重复计数
+        if index not in self.loaded_indices:
+            self.loaded_indices.add(index)
+            self.metrics['images_loaded'] += 1
+            if self.collapse_duplicates and self._is_duplicate(index):
+                self._drop_index(index)
+                return
+        self.image_loaded.emit(index, data, thumb)
+
+    def _is_duplicate(self, index):
+        """按感知哈希判断是否与本次搜索中已显示的表情近似重复（哈希由工作线程算好）"""
+        all_urls = self.virtual_manager.all_urls
+        if not 0 <= index < len(all_urls):
+            return False
+        value = perceptual_hashes.peek(self._grid_url(all_urls[index]))
+        return value is not None and self.duplicates.add(index, value) is not None
+
+    def _collapse_known_duplicates(self, start):
+        """新一页结果中哈希已缓存的图片：重复的直接过滤"""
+        if not self.collapse_duplicates:
+            return
+        all_urls = self.virtual_manager.all_urls
+        for idx in range(start, len(all_urls)):
+            value = perceptual_hashes.peek(self._grid_url(all_urls[idx]))
+            if value is not None and self.duplicates.add(idx, value) is not None:
+                self.filtered_indices.add(idx)
+
+    def _drop_index(self, index):
+        """过滤并回收该索引的卡片；压缩排布在交付批次结束时统一进行"""
+        self.filtered_indices.add(index)
+        widget = self.active_widgets.pop(index, None)
+        if widget:
+            self.virtual_manager.recycle_widget(widget)
+        self.image_pool.cancel(index)
+        self._relayout_pending = True
+        if not self._in_batch:
+            self._relayout()
+
+    def _relayout(self):
+        """重新渲染当前可视区并更新容器高度（压缩排布，去掉空洞）"""
+        self._relayout_pending = False
+        try:
+            self.update_container_height()
+            v = self.scroll_area.verticalScrollBar().value()
+            h = self.scroll_area.viewport().height()
+            start_idx, indices, visible_urls = self._compute_visible_unfiltered(v, h)
+            self.update_visible_widgets(start_idx, indices, visible_urls)
+        except Exception:
+            pass
 
     def _handle_image_error(self, index, code, message):
         """处理图片加载错误；统一为所有错误移除占位，避免出现“白块”"""
@@ -366,21 +566,8 @@ class SearchManager(QObject):
             pass
 
         # 统一策略：所有错误（包括 TIMEOUT/HTTP_xxx/CONNECTION/UNKNOWN）都过滤并回收
-        # 这样布局会立即压缩，不会留下空白占位
-        self.filtered_indices.add(index)
-        widget = self.active_widgets.pop(index, None)
-        if widget:
-            self.virtual_manager.recycle_widget(widget)
-
-        # 重新渲染当前可视区并更新容器高度（压缩排布，去掉空洞）
-        try:
-            self.update_container_height()
-            v = self.scroll_area.verticalScrollBar().value()
-            h = self.scroll_area.viewport().height()
-            start_idx, indices, visible_urls = self._compute_visible_unfiltered(v, h)
-            self.update_visible_widgets(start_idx, indices, visible_urls)
-        except Exception:
-            pass
+        # 这样布局会压缩，不会留下空白占位
+        self._drop_index(index)
 
         # 同时提示用户（不过不阻塞 UI，也避免持续刷屏）
         try:
@@ -418,6 +605,26 @@ class SearchManager(QObject):
                 'images_loaded': self.metrics['images_loaded'],
                 'errors': self.metrics['errors'],
                 'avg_time': elapsed / max(1, self.metrics['images_loaded']),
-                'thread_count': len(self.image_pool.active_tasks)
+                'thread_count': len(self.image_pool.active_tasks),
+                'queued': self.image_pool.pending_count(),
+                'coalesced': self.image_pool.coalesced_count,
+                'delivery': self.image_pool.batcher.get_stats(),
+                'bandwidth': bandwidth_budget.get_stats(),
+                'network': net_timing.get_summary(),
+                'probe': image_probe.get_stats(),
+                'progressive': partial_store.get_stats(),
+                'copy': self._copy_latency_stats(),
+                'preview': preview_cache.get_stats(),
+                'clipboard_files': clipboard_files.get_stats(),
+                'clipboard_payloads': clipboard_payloads.get_stats(),
+                'decode_service': decode_service.get_stats(),
+                'duplicates': dict(perceptual_hashes.get_stats(), collapsed=self.duplicates.collapsed),
+                'memory': self.memory_governor.get_stats(),
+                'cache': {
+                    'handles': image_handles.get_stats(),
+                    'memory': image_cache.get_stats(),
+                    'disk': disk_cache.get_stats(),
+                    'derived': derivative_store.get_stats()
+                }
             }
         return None
\ No newline at end of file
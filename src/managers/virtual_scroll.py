@@ -14,6 +14,7 @@ class VirtualScrollManager:
         self.row_height = 80  # 单行高度(像素)，72卡片 + vertical spacing(8) 更精确
         self.total_visible = (visible_rows + self.buffer_rows * 2) * cols
         self.widgets_pool = []  # 组件池
+        self.max_pool = self.total_visible * 2  # 组件池上限，超出的回收组件直接销毁
         self.all_urls = []  # 所有图片URL
         self.current_offset = 0
 
@@ -44,8 +45,17 @@ class VirtualScrollManager:
         widget.setParent(None)
         widget.url = ""
         widget.clear()
+        if len(self.widgets_pool) >= self.max_pool:
+            widget.deleteLater()
+            return
         self.widgets_pool.append(widget)
 
+    def trim_pool(self, keep=None):
+        """销毁多余的空闲组件（内存调控使用），默认保留一屏"""
+        keep = self.total_visible if keep is None else keep
+        while len(self.widgets_pool) > keep:
+            self.widgets_pool.pop().deleteLater()
+
     def get_widget(self):
         """从池中获取或创建widget"""
         if self.widgets_pool:
@@ -2,9 +2,16 @@
 预览浮层：在悬停图片时展示更大的预览（支持 GIF 播放）
 """
 
-from PyQt6.QtCore import Qt, QPoint, QBuffer, QSize, QRect
+from PyQt6.QtCore import Qt, QPoint, QBuffer, QSize, QRect, QTimer, QThreadPool
 from PyQt6.QtGui import QMovie, QPixmap, QPainter, QColor, QPen, QBrush, QImageReader
 from PyQt6.QtWidgets import QWidget, QLabel, QVBoxLayout, QGraphicsDropShadowEffect
+from src.utils.image_buffer import as_qbytearray
+from src.utils.loaders import get_preview_url
+from src.utils.preview_cache import preview_cache, PreviewDecodeTask, TOO_LARGE
+from src.utils.thread_pool import PRIORITY_URGENT
+from src.utils.bandwidth import bandwidth_budget
+from src.utils.image_cache import image_cache
+from src.utils.disk_cache import disk_cache
 
 
 class PreviewOverlay(QWidget):
@@ -12,6 +19,8 @@ class PreviewOverlay(QWidget):
     - 顶层无边框、圆角阴影
     - 支持静态图与 GIF
     - 按最长边限制解码/播放尺寸，避免内存超限
+    - 按预览尺寸获取合适的尺寸段，在工作线程解码（GIF 解码全部帧），结果进入预览 LRU；
+      首次悬停先用网格数据即时显示，解码完成后替换；再次悬停直接显示缓存的解码结果
     """
 
     def __init__(self, parent=None, max_side: int = 320):
@@ -51,11 +60,100 @@ class PreviewOverlay(QWidget):
         self._movie: QMovie | None = None
         self._gif_buffer: QBuffer | None = None
 
+        # 预览尺寸获取与解码
+        self._pool = None           # 图片线程池（与网格共用缓存、去重与调度）
+        self._current_url = ""
+        self._current_pos = QPoint()
+        self._fetch_key = None
+        self._decoded = None        # 正在显示的 DecodedPreview
+        self._frame_index = 0
+        self._frame_timer = QTimer(self)
+        self._frame_timer.setSingleShot(True)
+        self._frame_timer.timeout.connect(self._next_frame)
+
         # 初始隐藏
         self.hide()
 
+    def set_image_pool(self, pool):
+        """设置用于获取预览尺寸的图片线程池"""
+        self._pool = pool
+
     # --------- 内部辅助 ---------
+    def _dpr(self):
+        try:
+            return max(1.0, self.devicePixelRatioF())
+        except Exception:
+            return 1.0
+
+    def _decode_side(self):
+        return int(self.max_side * self._dpr())
+
+    def _cancel_fetch(self):
+        if self._fetch_key is not None and self._pool is not None:
+            self._pool.cancel(self._fetch_key)
+        self._fetch_key = None
+
+    def _request_preview(self, url):
+        """后台获取预览尺寸并在工作线程解码（网格已是该尺寸段时直接命中缓存）
+        省流模式下只使用已缓存的预览尺寸，不额外下载（保留网格数据的即时显示）"""
+        if self._pool is None:
+            return
+        side = self._decode_side()
+        preview_url = get_preview_url(url, self.max_side, self._dpr())
+        if bandwidth_budget.enabled and not (image_cache.contains(preview_url)
+                                             or disk_cache.contains(preview_url, block=False)):
+            return
+        self._fetch_key = self._pool.fetch(
+            preview_url,
+            lambda data, u=url, s=side: self._on_preview_data(u, s, data),
+            lambda _code, _message: None,  # 失败时保留即时显示的内容
+            priority=PRIORITY_URGENT
+        )
+
+    def _on_preview_data(self, url, side, data):
+        if url == self._current_url:
+            self._fetch_key = None
+        task = PreviewDecodeTask(data, side)
+        task.signals.done.connect(
+            lambda result, u=url, s=side: self._on_decoded(u, s, result),
+            Qt.ConnectionType.QueuedConnection
+        )
+        QThreadPool.globalInstance().start(task)
+
+    def _on_decoded(self, url, side, result):
+        """解码完成：放入缓存；仍在预览该图片时替换显示
+        超出上限的记入 oversized 不再尝试；解码失败（如数据不完整）不记录，下次悬停重试"""
+        if result is TOO_LARGE:
+            preview_cache.mark_oversized(url, side)
+            return
+        if result is None:
+            return
+        preview_cache.put(url, side, result, self._dpr())
+        if preview_cache.is_oversized(url, side):
+            result.to_pixmaps(self._dpr())  # 未进入缓存（过大）：本次仍直接显示
+        if url == self._current_url and self.isVisible():
+            self._cleanup()
+            self._show_decoded(result)
+            self._fit_and_move(self._current_pos)
+
+    def _show_decoded(self, decoded):
+        self._decoded = decoded
+        self._frame_index = 0
+        self.label.setPixmap(decoded.frames[0])
+        if decoded.animated:
+            self._frame_timer.start(decoded.delays[0])
+
+    def _next_frame(self):
+        decoded = self._decoded
+        if decoded is None or not decoded.animated:
+            return
+        self._frame_index = (self._frame_index + 1) % len(decoded.frames)
+        self.label.setPixmap(decoded.frames[self._frame_index])
+        self._frame_timer.start(decoded.delays[self._frame_index])
+
     def _cleanup(self):
+        self._frame_timer.stop()
+        self._decoded = None
         if self._movie:
             try:
                 self._movie.stop()
@@ -89,9 +187,23 @@ class PreviewOverlay(QWidget):
         self.move(pos)
 
     # --------- 对外 API ---------
-    def show_preview(self, data: bytes, is_gif: bool, global_pos: QPoint):
+    def show_preview(self, data: bytes, is_gif: bool, global_pos: QPoint, url: str = ""):
 
         self._cleanup()
+        if url != self._current_url:
+            self._cancel_fetch()
+        self._current_url = url
+        self._current_pos = global_pos
+
+        # 最近预览过：直接显示缓存的解码结果
+        side = self._decode_side()
+        decoded = preview_cache.get(url, side) if url else None
+        if decoded is not None:
+            self._show_decoded(decoded)
+            self._fit_and_move(global_pos)
+            self.show()
+            return
+
         if not data:
 
             return
@@ -99,7 +211,7 @@ class PreviewOverlay(QWidget):
         if is_gif:
             # GIF 使用 QMovie + QBuffer，并按 max_side 限制播放尺寸
             self._gif_buffer = QBuffer(self)
-            self._gif_buffer.setData(data)
+            self._gif_buffer.setData(as_qbytearray(data))  # 与网格共享同一份字节
             if not self._gif_buffer.open(QBuffer.OpenModeFlag.ReadOnly):
                 return
             self._movie = QMovie(self)
@@ -112,7 +224,7 @@ class PreviewOverlay(QWidget):
             # 静态图：用 QImageReader 按最长边解码
             try:
                 buf = QBuffer()
-                buf.setData(data)
+                buf.setData(as_qbytearray(data))
                 if not buf.open(QBuffer.OpenModeFlag.ReadOnly):
                     return
                 reader = QImageReader(buf)
@@ -138,9 +250,15 @@ class PreviewOverlay(QWidget):
         self._fit_and_move(global_pos)
         self.show()
 
+        # 后台获取预览尺寸并解码，完成后替换（长动图无法完整解码时保持 QMovie 播放）
+        if url and self._fetch_key is None and not preview_cache.is_oversized(url, side):
+            self._request_preview(url)
+
 
     def hide_preview(self):
 
         self._cleanup()
+        self._cancel_fetch()
+        self._current_url = ""
         self.hide()
 
@@ -4,8 +4,20 @@ UI 组件定义
 
 from PyQt6.QtWidgets import QLabel, QGraphicsDropShadowEffect
 from PyQt6.QtCore import Qt, pyqtSignal, QBuffer, QSize, QTimer
-from PyQt6.QtGui import QColor, QPixmap, QMovie, QImageReader
+from PyQt6.QtGui import QColor, QPixmap, QMovie
 from collections import deque
+from src.utils.derivatives import derivative_store, decode_scaled, fit_size, GRID_SIDE
+from src.utils.image_header import ImageHeaderSniffer
+from src.utils.image_buffer import as_qbytearray, as_view
+
+# 网格卡片内图片的解码边长（72 卡片 - padding）
+THUMB_SIZE = GRID_SIDE
+
+# 悬停停留多久视为有复制意图（毫秒），之后开始预取复制尺寸
+HOVER_INTENT_MS = 150
+
+# 不超过该大小的 GIF 缓存全部解码帧（QMovie CacheAll），更大的边播放边解码
+MOVIE_CACHE_ALL_BYTES = 1024 * 1024
 
 
 def is_gif_data(data: bytes) -> bool:
@@ -21,6 +33,16 @@ def is_gif_data(data: bytes) -> bool:
     return header in (b'GIF87a', b'GIF89a')
 
 
+def _image_size(data):
+    """从文件头解析图片尺寸 (宽, 高)，无法解析时返回 None"""
+    sniffer = ImageHeaderSniffer()
+    try:
+        sniffer.feed(bytes(as_view(data)[:1024]))
+    except Exception:
+        return None
+    return (sniffer.width, sniffer.height) if sniffer.size_known and sniffer.width and sniffer.height else None
+
+
 class GifPlaybackManager:
     """全局 GIF 播放管理器 - 限制同时播放数量"""
     _instance = None
@@ -73,9 +95,12 @@ class GifPlaybackManager:
 class EmojiWidget(QLabel):
     """增强版表情包组件 - 支持 GIF 动画"""
     clicked = pyqtSignal(str)  # 保持向后兼容
-    clicked_with_data = pyqtSignal(str, bytes, bool)  # url, data, is_gif
-    preview_requested = pyqtSignal(str, bytes, bool)  # url, data, is_gif
+    clicked_with_data = pyqtSignal(str, object, bool)  # url, data(bytes-like), is_gif
+    preview_requested = pyqtSignal(str, object, bool)  # url, data(bytes-like), is_gif
     preview_close = pyqtSignal()  # 关闭预览
+    full_requested = pyqtSignal(str)  # 省流模式/渐进式 GIF：悬停时请求完整动图
+    copy_intent = pyqtSignal(str)         # 悬停停留：预取复制尺寸
+    copy_intent_cancel = pyqtSignal(str)  # 离开：取消未完成的预取
 
     def __init__(self, url=""):
         super().__init__()
@@ -90,13 +115,20 @@ class EmojiWidget(QLabel):
         self.gif_badge = None      # GIF 标识标签
         self.original_data = None  # 原始图片数据（用于复制）
         self._gif_buffer = None    # GIF 数据缓冲区
+        self._movie_played = False # 是否播放过（CacheAll 时帧已解码缓存）
 
         # 性能优化：播放管理器和延迟定时器
         self.playback_manager = GifPlaybackManager()
         self.hover_timer = None
         self.preview_timer = None
+        self.intent_timer = None
+        self._intent_sent = False
         self._want_preview_when_ready = False
 
+        # 省流模式：GIF 先显示缩略图，悬停时再请求完整动图
+        self.deferred_full = False
+        self._full_pending = False
+
         self.setFixedSize(72, 72)
         self.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.setStyleSheet("""
@@ -132,8 +164,20 @@ class EmojiWidget(QLabel):
         self.shadow.setBlurRadius(12)
         self.shadow.setOffset(0, 4)
 
-        # 进入日志
-
+        # 省流模式下的 GIF 缩略图 / 渐进式 GIF 首帧：悬停时才下载完整动图
+        if self.deferred_full and self.original_data:
+            self.deferred_full = False
+            self._full_pending = True
+            self.full_requested.emit(self.url)
+
+        # 悬停意图：停留超过 HOVER_INTENT_MS 才预取复制尺寸，快速掠过不产生下载
+        if self.url:
+            if self.intent_timer:
+                self.intent_timer.stop()
+            self.intent_timer = QTimer()
+            self.intent_timer.setSingleShot(True)
+            self.intent_timer.timeout.connect(self._emit_copy_intent)
+            self.intent_timer.start(HOVER_INTENT_MS)
 
         # 触发预览（100ms 延迟，避免快速掠过）
         if self.original_data:
@@ -149,12 +193,27 @@ class EmojiWidget(QLabel):
             self._want_preview_when_ready = True
 
 
+    def _emit_copy_intent(self):
+        if self.url:
+            self._intent_sent = True
+            self.copy_intent.emit(self.url)
+
+    def _cancel_copy_intent(self):
+        """停止悬停意图计时；已发出预取时通知取消"""
+        if self.intent_timer:
+            self.intent_timer.stop()
+            self.intent_timer = None
+        if self._intent_sent:
+            self._intent_sent = False
+            if self.url:
+                self.copy_intent_cancel.emit(self.url)
+
     def _emit_preview(self):
         self.preview_requested.emit(self.url, self.original_data, self.is_gif)
 
 
-        # 设置延迟播放 GIF（100ms 延迟，避免快速掠过触发）
-        if self.is_gif and self.movie and self.original_data:
+        # 设置延迟播放 GIF（100ms 延迟，避免快速掠过触发；动画已被内存调控释放时播放前重建）
+        if self.is_gif and self.original_data:
             # 取消之前的定时器
             if self.hover_timer:
                 self.hover_timer.stop()
@@ -178,6 +237,7 @@ class EmojiWidget(QLabel):
         if self.preview_timer:
             self.preview_timer.stop()
             self.preview_timer = None
+        self._cancel_copy_intent()
         # 取消等待标记
         self._want_preview_when_ready = False
 
@@ -194,47 +254,51 @@ class EmojiWidget(QLabel):
 
         self.preview_close.emit()
 
-    def set_image_data(self, data: bytes, url: str):
-        """智能设置图片数据（保持 QBuffer 生命周期，避免崩溃）"""
+    def full_failed(self):
+        """完整动图下载失败：恢复待下载标记，下次悬停重试"""
+        self._full_pending = False
+        self.deferred_full = True
+
+    def set_image_data(self, data: bytes, url: str, thumb=None):
+        """智能设置图片数据（保持 QBuffer 生命周期，避免崩溃）
+        thumb: 工作线程已解码缩放好的首帧 QImage；提供时 UI 线程不再解码"""
         self._cleanup_resources()
         self.url = url
         self.original_data = data
 
-        # when data ready
-
-        if self._want_preview_when_ready and self.underMouse():
+        # when data ready（完整动图到达时若仍在悬停，刷新预览并开始播放）
+        full_arrived = self._full_pending
+        self._full_pending = False
+        if (self._want_preview_when_ready or full_arrived) and self.underMouse():
             QTimer.singleShot(10, self._emit_preview)
         self._want_preview_when_ready = False
 
+        # 渐进式 GIF 只有首帧：悬停时续传完整动图（已在悬停则下一拍续传，等信号连接完成）
+        if getattr(data, 'partial', False):
+            self.deferred_full = True
+            if self.underMouse():
+                self.deferred_full = False
+                self._full_pending = True
+                QTimer.singleShot(0, lambda u=url: self.full_requested.emit(u) if self.url == u else None)
+
         if is_gif_data(data):
             self.is_gif = True
-            self._setup_gif_display(data)
+            self._setup_gif_display(data, thumb)
             self._create_gif_badge()
         else:
             self.is_gif = False
-            self._setup_static_display(data)
+            self._setup_static_display(data, thumb)
 
-    def _setup_gif_display(self, data: bytes):
-        """准备 GIF 显示但默认不播放；提取首帧作为静态显示"""
-        # 关键：QBuffer 必须保存为实例属性，确保生命周期覆盖 QMovie
-        self._gif_buffer = QBuffer(self)
-        self._gif_buffer.setData(data)
-        self._gif_buffer.open(QBuffer.OpenModeFlag.ReadOnly)
+    def _setup_gif_display(self, data: bytes, thumb=None):
+        """准备 GIF 显示但默认不播放；提取首帧作为静态显示（优先使用预生成的首帧衍生图）"""
+        self._create_movie(data)
 
-        self.movie = QMovie(self)
-        self.movie.setDevice(self._gif_buffer)
-
-        # 性能优化：根据文件大小选择缓存模式
-        file_size = len(data) / 1024 / 1024  # MB
-        if file_size <= 1:
-            self.movie.setCacheMode(QMovie.CacheMode.CacheAll)
-        elif file_size <= 5:
-            self.movie.setCacheMode(QMovie.CacheMode.CacheAll)
-        else:
-            self.movie.setCacheMode(QMovie.CacheMode.CacheNone)
-
-        # 直接按目标尺寸解码，减少每帧缩放开销
-        self.movie.setScaledSize(QSize(64, 64))  # 留出 padding 空间
+        # 已有首帧缩略图时无需解码 GIF（悬停播放时才真正解码）
+        derived = thumb if thumb is not None else derivative_store.get(self.url, THUMB_SIZE, memory_only=True)
+        if derived is not None:
+            self.static_pixmap = QPixmap.fromImage(derived)
+            self.setPixmap(self.static_pixmap)
+            return
 
         # 提取第一帧作为静态图
         self.movie.jumpToFrame(0)
@@ -247,36 +311,86 @@ class EmojiWidget(QLabel):
             self._setup_static_display(data)
             self.is_gif = False
 
-    def _setup_static_display(self, data: bytes):
+    def _create_movie(self, data):
+        """创建 QMovie（不播放）"""
+        # 关键：QBuffer 必须保存为实例属性，确保生命周期覆盖 QMovie
+        self._gif_buffer = QBuffer(self)
+        self._gif_buffer.setData(as_qbytearray(data))  # 共享缓冲区，不拷贝
+        self._gif_buffer.open(QBuffer.OpenModeFlag.ReadOnly)
+
+        self.movie = QMovie(self)
+        self.movie.setDevice(self._gif_buffer)
+
+        # 小动图缓存全部帧（反复悬停不再解码）；大动图边播放边解码，避免帧缓存占用过多内存
+        if len(data) <= MOVIE_CACHE_ALL_BYTES:
+            self.movie.setCacheMode(QMovie.CacheMode.CacheAll)
+        else:
+            self.movie.setCacheMode(QMovie.CacheMode.CacheNone)
+
+        # 直接按目标尺寸解码，减少每帧缩放开销；与静态首帧同一缩放规则（保持宽高比），开始播放时不变形
+        size = _image_size(data)
+        if size is None:
+            self.movie.jumpToFrame(0)
+            rect = self.movie.frameRect()
+            size = (rect.width(), rect.height()) if rect.width() > 0 and rect.height() > 0 else None
+        if size is not None:
+            self.movie.setScaledSize(fit_size(size[0], size[1], THUMB_SIZE))
+        else:
+            self.movie.setScaledSize(QSize(THUMB_SIZE, THUMB_SIZE))
+        self._movie_played = False
+
+    def release_movie(self):
+        """释放 QMovie 与其帧缓存，保留首帧静态图与原始数据（悬停播放时重建）"""
+        if self.movie is None:
+            return
+        self.playback_manager.stop_playing(self)
+        try:
+            self.movie.stop()
+            self.setMovie(None)  # 同时清空显示内容，需还原首帧
+            if self.static_pixmap:
+                self.setPixmap(self.static_pixmap)
+            self.movie.deleteLater()
+        except Exception:
+            pass
+        self.movie = None
+        if self._gif_buffer:
+            try:
+                self._gif_buffer.close()
+            except Exception:
+                pass
+        self._gif_buffer = None
+        self._movie_played = False
+
+    def movie_bytes(self):
+        """QMovie 已解码帧占用的估算字节数"""
+        if self.movie is None:
+            return 0
+        scaled = self.movie.scaledSize()
+        frame = max(1, scaled.width()) * max(1, scaled.height()) * 4
+        if self._movie_played and self.movie.cacheMode() == QMovie.CacheMode.CacheAll:
+            return max(1, self.movie.frameCount()) * frame
+        return frame
+
+    def pixmap_bytes(self):
+        """静态首帧占用的字节数"""
+        pixmap = self.static_pixmap
+        if pixmap is None or pixmap.isNull():
+            return 0
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth()) // 8
+
+    def _setup_static_display(self, data: bytes, thumb=None):
         """设置静态图片显示（使用 QImageReader 按目标尺寸解码，避免超大图触发 256MB 限制）"""
+        # 优先使用工作线程解码好的缩略图/衍生图，重新绑定回收的卡片时无需再解码
+        derived = thumb if thumb is not None else derivative_store.get(self.url, THUMB_SIZE, memory_only=True)
+        if derived is not None:
+            self.static_pixmap = QPixmap.fromImage(derived)
+            self.setPixmap(self.static_pixmap)
+            return
+
         try:
-            buf = QBuffer()
-            buf.setData(data)
-            if not buf.open(QBuffer.OpenModeFlag.ReadOnly):
-                return
-
-            reader = QImageReader(buf)
-            reader.setAutoTransform(True)
-
-            # 目标边长（与现有 UI 保持一致）
-            target = 64
-            # 读取原始尺寸（只解析头，不会解码整图）
-            size = reader.size()
-            if size.isValid() and size.width() > 0 and size.height() > 0:
-                if size.width() >= size.height():
-                    w = target
-                    h = max(1, int(size.height() * target / size.width()))
-                else:
-                    h = target
-                    w = max(1, int(size.width() * target / size.height()))
-                reader.setScaledSize(QSize(w, h))
-            else:
-                # 如果读不到尺寸，退化为直接目标尺寸（可能会拉伸，但能避免超限）
-                reader.setScaledSize(QSize(target, target))
-
-            image = reader.read()
-            buf.close()
-            if not image.isNull():
+            # 与衍生图相同的缩放规则（decode_scaled），保证同一表情不论走哪条路径尺寸一致
+            image = decode_scaled(data, THUMB_SIZE)
+            if image is not None:
                 self.static_pixmap = QPixmap.fromImage(image)
                 self.setPixmap(self.static_pixmap)
         except Exception:
@@ -318,13 +432,16 @@ class EmojiWidget(QLabel):
 
     def _start_gif_playback(self):
         """开始播放 GIF（延迟触发）"""
-        if self.is_gif and self.movie and self.original_data:
+        if self.is_gif and self.original_data:
+            if self.movie is None:
+                self._create_movie(self.original_data)
             # 检查 movie 是否有效
             if self.movie.isValid():
                 # 请求播放权限
                 if self.playback_manager.request_play(self):
                     self.setMovie(self.movie)
                     self.movie.start()  # 默认循环播放
+                    self._movie_played = True
 
     def _cleanup_resources(self):
         """释放资源，避免内存泄漏/悬挂指针"""
@@ -370,11 +487,15 @@ class EmojiWidget(QLabel):
         self._cleanup_resources()
 
         # 清空显示
+        self._cancel_copy_intent()
         self.setPixmap(QPixmap())
         self.url = ""
+        self.deferred_full = False
+        self._full_pending = False
 
         # 关键：断开信号并重置标记
-        for sig in (self.clicked, self.clicked_with_data, self.preview_requested, self.preview_close):
+        for sig in (self.clicked, self.clicked_with_data, self.preview_requested, self.preview_close,
+                    self.full_requested, self.copy_intent, self.copy_intent_cancel):
             try:
                 sig.disconnect()
             except Exception:
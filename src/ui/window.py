@@ -5,19 +5,25 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit, QScrollArea,
                            QGridLayout, QLabel, QGraphicsDropShadowEffect, QApplication,
                            QToolButton)
-from PyQt6.QtCore import Qt, QTimer, QMimeData, QByteArray, QUrl, QBuffer, QSize
-from PyQt6.QtGui import QPixmap, QColor, QCursor, QImageReader
+from PyQt6.QtCore import Qt, QTimer, QMimeData, QUrl
+from PyQt6.QtGui import QColor, QCursor
 from src.managers.search import SearchManager
-from src.utils.loaders import CopyLoader
+from src.utils.loaders import get_copy_url
+from src.utils.image_cache import image_cache
+from src.utils.disk_cache import disk_cache
+from src.utils.clipboard_payload import clipboard_payloads
+from src.utils.image_buffer import as_qbytearray
 from src.ui.preview import PreviewOverlay
 
-import os, tempfile, uuid
+import time
 
 
 class MainWindow(QWidget):
     """主窗口 - macOS 原生风格"""
     def __init__(self):
         super().__init__()
+        self._copy_seq = 0        # 最近一次点击复制的序号
+        self._copy_final_seq = 0  # 已写入复制尺寸的点击序号
         self.init_ui()
         self.setup_search_manager()
 
@@ -196,6 +202,8 @@ class MainWindow(QWidget):
     def setup_search_manager(self):
         """设置搜索管理器"""
         self.search_manager = SearchManager(self.grid_layout, self.scroll_area)
+        # 预览浮层与网格共用线程池获取预览尺寸
+        self.preview.set_image_pool(self.search_manager.image_pool)
 
         # 连接信号
         self.search_manager.error_occurred.connect(self.show_error)
@@ -226,14 +234,15 @@ class MainWindow(QWidget):
         if keyword:
             self.search_manager.do_search(keyword)
 
-    def update_image(self, index, data):
-        """更新图片显示 - 委托给 EmojiWidget 处理 GIF/静态图"""
+    def update_image(self, index, data, thumb=None):
+        """更新图片显示 - 委托给 EmojiWidget 处理 GIF/静态图（thumb 为工作线程解码好的缩略图）"""
         if index in self.search_manager.active_widgets:
             widget = self.search_manager.active_widgets[index]
             # 委托给 widget 自己处理图片数据（支持 GIF）
-            widget.set_image_data(data, widget.url)
+            widget.set_image_data(data, widget.url, thumb)
 
-            # 使用UniqueConnection避免重复连接
+            # 只在卡片首次使用时连接信号（clear() 断开后重置 _connected）；
+            # 按帧批量交付时每批会调用多次，避免每次重复连接
             if not widget._connected:
                 # 优先使用带数据的信号（支持 GIF 复制）
                 try:
@@ -243,14 +252,8 @@ class MainWindow(QWidget):
                     )
                 except TypeError:
                     pass  # 已连接，忽略
-                # 兜底：仍连接传统 clicked（仅 URL），确保无数据时也能复制
-                try:
-                    widget.clicked.connect(
-                        self.copy_image,
-                        Qt.ConnectionType.UniqueConnection
-                    )
-                except TypeError:
-                    pass  # 已连接，忽略
+                # 注意：不再连接传统 clicked（仅 URL）——网格只持有缩略图，
+                # copy_image_with_data 会自行下载复制尺寸，避免重复下载
                 # 悬停预览
                 try:
                     widget.preview_requested.connect(
@@ -266,29 +269,32 @@ class MainWindow(QWidget):
                     )
                 except TypeError:
                     pass
-                widget._connected = True
-
-
-                # 确保预览信号已连接（即使之前已连接也不重复）
+                # 省流模式/渐进式 GIF：悬停时下载（续传）完整动图
                 try:
-                    widget.preview_requested.connect(
-                        self.on_preview_requested,
+                    widget.full_requested.connect(
+                        self.search_manager.load_full_image,
                         Qt.ConnectionType.UniqueConnection
                     )
                 except TypeError:
                     pass
+                # 悬停意图：预取复制尺寸，点击时直接从缓存复制
                 try:
-                    widget.preview_close.connect(
-                        self.on_preview_close,
+                    widget.copy_intent.connect(
+                        self.search_manager.prefetch_copy,
+                        Qt.ConnectionType.UniqueConnection
+                    )
+                    widget.copy_intent_cancel.connect(
+                        self.search_manager.cancel_copy_prefetch,
                         Qt.ConnectionType.UniqueConnection
                     )
                 except TypeError:
                     pass
+                widget._connected = True
 
     def on_preview_requested(self, url: str, data: bytes, is_gif: bool):
         """接收子项悬停请求并显示预览"""
         try:
-            self.preview.show_preview(data, is_gif, QCursor.pos())
+            self.preview.show_preview(data, is_gif, QCursor.pos(), url)
         except Exception:
             pass
 
@@ -301,88 +307,102 @@ class MainWindow(QWidget):
 
 
     def copy_image_with_data(self, url: str, data: bytes, is_gif: bool):
-        """复制图片到剪贴板（支持 GIF 格式）"""
-        if data:
-            # 直接使用已有的数据，避免重新下载
-            self._copy_to_clipboard(data, is_gif)
-        else:
-            # 回退到原有的下载方式
-            self.copy_image(url)
-
-    def copy_image(self, url):
-        """复制图片到剪贴板（后台下载，避免UI阻塞）"""
-        self.copy_loader = CopyLoader(url)
-        self.copy_loader.done.connect(self._after_copy_done)
-        self.copy_loader.start()
+        """复制图片到剪贴板（支持 GIF 格式）
+        网格只持有缩略图：复制尺寸（mw1024）已缓存时直接复制；
+        否则先用缩略图即时复制，后台下载完成后替换为复制尺寸。
+        剪贴板数据（临时文件、兜底静态图、缩放解码）在工作线程准备，悬停卡片的数据已提前准备好；
+        记录点击到写入剪贴板的耗时。"""
+        started = time.perf_counter()
+        self._copy_seq += 1
+        seq = self._copy_seq
+        copy_url = get_copy_url(url)
+
+        payload = clipboard_payloads.get(copy_url)
+        if payload is not None:
+            self._apply_copy_payload(seq, payload, True, started, 'prepared')
+            return
+        if clipboard_payloads.is_pending(copy_url) or image_cache.contains(copy_url) \
+                or disk_cache.contains(copy_url, block=False):
+            clipboard_payloads.prepare(
+                copy_url, None,
+                lambda p: self._on_cached_payload(seq, url, p, started)
+            )
+            return
+        # 渐进式 GIF 只有首帧，不作为临时替代
+        if data and not getattr(data, 'partial', False):
+            clipboard_payloads.prepare(
+                url, data,
+                lambda p: self._apply_copy_payload(seq, p, False),
+                remember=False
+            )
+        self.copy_image(url, started, seq)
+
+    def _on_cached_payload(self, seq, url, payload, started):
+        """缓存中的复制尺寸准备完成；期间被淘汰时改为下载"""
+        if payload is not None:
+            self._apply_copy_payload(seq, payload, True, started, 'cache')
+        elif seq == self._copy_seq:
+            self.copy_image(url, started, seq)
+
+    def copy_image(self, url, started=None, seq=None):
+        """复制图片到剪贴板（后台下载，避免UI阻塞；与网格共用缓存并合并重复下载）"""
+        if started is None:
+            started = time.perf_counter()
+        if seq is None:
+            self._copy_seq += 1
+            seq = self._copy_seq
+        copy_url = get_copy_url(url)
+        self.search_manager.image_pool.fetch(
+            copy_url,
+            lambda data: self._after_copy_done(copy_url, data, "", started, seq),
+            lambda code, message: self._after_copy_done(copy_url, b"", message)
+        )
 
-    def _copy_to_clipboard(self, data: bytes, is_gif: bool = False):
-        """复制数据到剪贴板（支持 GIF）"""
+    def _apply_copy_payload(self, seq, payload, final, started=None, source=None):
+        """把准备好的数据写入剪贴板（UI 线程只组装 QMimeData）
+        只处理最近一次点击；复制尺寸写入后不再被临时缩略图覆盖"""
+        if payload is None or seq != self._copy_seq:
+            return
+        if not final and self._copy_final_seq == seq:
+            return
+        if final:
+            self._copy_final_seq = seq
+        self._copy_to_clipboard(payload)
+        if started is not None:
+            self.search_manager.record_copy_latency(time.perf_counter() - started, source)
+
+    def _copy_to_clipboard(self, payload):
+        """写入剪贴板（支持 GIF）"""
         clipboard = QApplication.clipboard()
 
-        if is_gif:
+        if payload.is_gif:
             # 优先：以“文件”的方式提供 GIF，便于多数应用保留动图
             mime_data = QMimeData()
-
-            # 1) 写入临时 .gif 文件，并将文件 URL 放入剪贴板
-            tmp_dir = os.path.join(tempfile.gettempdir(), "moji_emoji")
-            try:
-                os.makedirs(tmp_dir, exist_ok=True)
-            except Exception:
-                pass
-            file_path = os.path.join(tmp_dir, f"{uuid.uuid4().hex}.gif")
-            try:
-                with open(file_path, "wb") as f:
-                    f.write(data)
-                mime_data.setUrls([QUrl.fromLocalFile(file_path)])
-            except Exception:
-                # 写文件失败也不影响后续 MIME 方式
-                pass
-
-            # 2) 同时提供 GIF 原始数据
-            mime_data.setData('image/gif', QByteArray(data))
-
+            # 1) 按内容哈希命名的临时 .gif 文件（已在工作线程写好）
+            if payload.file_path:
+                mime_data.setUrls([QUrl.fromLocalFile(payload.file_path)])
+            # 2) 同时提供 GIF 原始数据（与网格/预览共享同一份字节）
+            mime_data.setData('image/gif', as_qbytearray(payload.data))
             # 3) 兜底：再附带一份静态位图，兼容只支持静态图片的应用
-            pixmap = QPixmap()
-            if pixmap.loadFromData(data):
-                mime_data.setImageData(pixmap.toImage())
-
+            if payload.image is not None:
+                mime_data.setImageData(payload.image)
             clipboard.setMimeData(mime_data)
         else:
-            # 使用 QImageReader 限制解码尺寸，避免触发 256MB 限制
-            try:
-                buf = QBuffer()
-                buf.setData(data)
-                if not buf.open(QBuffer.OpenModeFlag.ReadOnly):
-                    return
-                reader = QImageReader(buf)
-                reader.setAutoTransform(True)
-                # 限制最长边，保证剪贴板图片质量且安全
-                max_side = 1200
-                size = reader.size()
-                if size.isValid() and size.width() > 0 and size.height() > 0:
-                    if size.width() >= size.height():
-                        w = min(max_side, size.width())
-                        h = max(1, int(size.height() * w / size.width()))
-                    else:
-                        h = min(max_side, size.height())
-                        w = max(1, int(size.width() * h / size.height()))
-                    reader.setScaledSize(QSize(w, h))
-                image = reader.read()
-                buf.close()
-                if not image.isNull():
-                    clipboard.setPixmap(QPixmap.fromImage(image))
-            except Exception:
-                pass
+            # 已在工作线程按最长边 1200 解码
+            clipboard.setImage(payload.image)
 
         # 复制成功反馈 - 橙色闪烁
         self._show_copy_feedback()
 
-    def _after_copy_done(self, data: bytes, err: str):
-        """复制完成回调（干净实现）"""
+    def _after_copy_done(self, copy_url, data: bytes, err: str, started=None, seq=None):
+        """复制尺寸下载完成：在工作线程准备剪贴板数据"""
         if data:
-            # 检测是否为 GIF
-            is_gif = len(data) >= 6 and data[:6] in (b'GIF87a', b'GIF89a')
-            self._copy_to_clipboard(data, is_gif)
+            if seq is None:
+                return
+            clipboard_payloads.prepare(
+                copy_url, data,
+                lambda p: self._apply_copy_payload(seq, p, True, started, 'fetch')
+            )
         else:
             self.show_error("复制失败: " + (err or "网络错误"))
 
@@ -415,26 +435,9 @@ class MainWindow(QWidget):
             self.hide()
 
     def cleanup(self):
-        """清理资源 - 使用优雅停止"""
-        # 清理搜索管理器中的线程
+        """清理资源 - 取消线程池中未完成的加载任务"""
         if hasattr(self, 'search_manager'):
-            # 使用优雅停止机制
-            for loader in self.search_manager.loaders.values():
-                loader.request_stop()
-
-            # 等待线程自然退出
-            for loader in self.search_manager.loaders.values():
-                if not loader.wait(100):  # 等待100ms
-                    if loader.isRunning():
-                        loader.terminate()
-                        loader.wait(50)
-            self.search_manager.loaders.clear()
-
-        # 清理复制加载器
-        if hasattr(self, 'copy_loader') and self.copy_loader:
-            if self.copy_loader.isRunning():
-                self.copy_loader.terminate()
-                self.copy_loader.wait(100)
+            self.search_manager.image_pool.cancel_all()
 
     def closeEvent(self, event):
         """窗口关闭事件"""
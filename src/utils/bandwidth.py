@@ -0,0 +1,92 @@
+"""
+流量预算 - 省流模式下按“单次搜索 / 每小时”限制图片下载字节数
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class BandwidthBudget:
+    """流量预算管理器 - 统计已用字节，判断预算是否耗尽
+
+    - 计数始终进行（用于性能统计）；只有开启省流模式时才执行预算限制
+    - 小时窗口按分钟分桶，避免逐块记录导致队列膨胀
+    - record() 会在工作线程中调用，内部加锁
+    """
+
+    def __init__(self, search_budget_mb=5, hourly_budget_mb=50):
+        self.enabled = False  # 省流模式开关（托盘菜单切换）
+        self.search_budget = int(search_budget_mb * 1024 * 1024)
+        self.hourly_budget = int(hourly_budget_mb * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._search_bytes = 0
+        self._total_bytes = 0
+        self._buckets = deque()  # [(minute, bytes)]，最多保留 60 个桶
+        self._hour_bytes = 0
+
+    def set_enabled(self, enabled):
+        """开启/关闭省流模式"""
+        self.enabled = bool(enabled)
+
+    def start_search(self):
+        """新搜索开始：重置单次搜索计数"""
+        with self._lock:
+            self._search_bytes = 0
+
+    def record(self, nbytes):
+        """记录已下载字节数（线程安全）"""
+        if nbytes <= 0:
+            return
+        minute = int(time.time() // 60)
+        with self._lock:
+            self._search_bytes += nbytes
+            self._total_bytes += nbytes
+            if self._buckets and self._buckets[-1][0] == minute:
+                m, b = self._buckets[-1]
+                self._buckets[-1] = (m, b + nbytes)
+            else:
+                self._buckets.append((minute, nbytes))
+            self._hour_bytes += nbytes
+            self._expire(minute)
+
+    def _expire(self, minute):
+        """丢弃一小时以前的分钟桶（需持有锁）"""
+        while self._buckets and self._buckets[0][0] <= minute - 60:
+            _, b = self._buckets.popleft()
+            self._hour_bytes -= b
+
+    def hourly_bytes(self):
+        """最近一小时已用字节数"""
+        with self._lock:
+            self._expire(int(time.time() // 60))
+            return self._hour_bytes
+
+    def is_exhausted(self):
+        """预算是否耗尽（仅省流模式下生效）"""
+        if not self.enabled:
+            return False
+        if self._search_bytes >= self.search_budget:
+            return True
+        return self.hourly_bytes() >= self.hourly_budget
+
+    def allow_prefetch(self):
+        """是否允许预取缓冲行（预算耗尽后停止预取）"""
+        return not self.is_exhausted()
+
+    def get_stats(self):
+        """获取流量统计"""
+        hour = self.hourly_bytes()
+        return {
+            'enabled': self.enabled,
+            'search_mb': self._search_bytes / 1024 / 1024,
+            'hour_mb': hour / 1024 / 1024,
+            'total_mb': self._total_bytes / 1024 / 1024,
+            'search_budget_mb': self.search_budget / 1024 / 1024,
+            'hourly_budget_mb': self.hourly_budget / 1024 / 1024,
+            'exhausted': self.is_exhausted()
+        }
+
+# 全局流量预算实例
+bandwidth_budget = BandwidthBudget()
@@ -0,0 +1,146 @@
+"""
+缓存访问记录与淘汰策略模拟器
+用法：
+  MOJI_CACHE_TRACE=~/moji-trace.tsv python main.py      # 记录真实会话的访问
+  python -m src.utils.cache_sim ~/moji-trace.tsv [--capacity 10 25 50] [--policy lru gdsf wtinylfu]
+  python -m src.utils.cache_sim --synthetic 200000      # 无记录时用合成访问（热门表情 + 滚动浏览）
+
+回放记录中的每次 get：命中则计入命中数/命中字节，未命中则按记录的大小放入模拟缓存
+（与 ImageMemoryCache 相同的分片函数与“超过总配额一半不缓存”规则），
+输出各策略在各容量下的命中率与字节命中率。
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+
+from src.utils.eviction import POLICIES, make_policy, shard_of
+
+
+class TraceRecorder:
+    """访问记录器 - 每行：相对时间(秒)\\t图片键\\t大小\\t操作(get/set)；多线程写入加锁"""
+
+    def __init__(self, path):
+        self._file = open(path, 'a', encoding='utf-8', buffering=64 * 1024)
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def record(self, key, size, op):
+        line = f"{time.monotonic() - self._start:.3f}\t{key}\t{size}\t{op}\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def load_trace(path):
+    """读取访问记录，返回 [(时间, 键, 大小, 操作)]；格式错误的行跳过"""
+    events = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) != 4:
+                continue
+            try:
+                events.append((float(parts[0]), parts[1], int(parts[2]), parts[3]))
+            except ValueError:
+                continue
+    return events
+
+
+def synthetic_trace(requests, seed=1):
+    """合成访问：少量热门表情被反复复制，穿插大量只看一次的滚动浏览"""
+    rng = random.Random(seed)
+    hot = [(f"hot{i}:mw1024", rng.randint(30, 300) * 1024) for i in range(300)]
+    weights = [1 / (i + 1) for i in range(len(hot))]
+    events = []
+    t = 0.0
+    unique = 0
+    while len(events) < requests:
+        t += rng.expovariate(20)
+        if rng.random() < 0.3:
+            key, size = rng.choices(hot, weights)[0]
+        else:
+            unique += 1
+            key, size = f"scroll{unique}:orj360", rng.randint(20, 2048) * 1024
+        events.append((t, key, size, 'get'))
+        events.append((t, key, size, 'set'))
+    return events
+
+
+def simulate(events, policy, capacity_bytes, shards=4):
+    """回放访问记录，返回统计"""
+    sizes = {}
+    for _, key, size, _ in events:
+        if size > 0:
+            sizes[key] = size
+
+    shard_max = capacity_bytes // shards
+    policies = [make_policy(policy, shard_max) for _ in range(shards)]
+    resident = [set() for _ in range(shards)]
+    hits = requests = hit_bytes = request_bytes = 0
+
+    for _, key, _, op in events:
+        if op != 'get':
+            continue
+        size = sizes.get(key)
+        if size is None:
+            continue  # 从未成功加载（如下载失败）
+        i = shard_of(key, shards)
+        requests += 1
+        request_bytes += size
+        if key in resident[i]:
+            hits += 1
+            hit_bytes += size
+            policies[i].on_access(key)
+            continue
+        if size > capacity_bytes // 2:
+            continue
+        resident[i].add(key)
+        for victim in policies[i].on_insert(key, size):
+            resident[i].discard(victim)
+
+    return {
+        'policy': policy,
+        'capacity_mb': capacity_bytes / 1024 / 1024,
+        'requests': requests,
+        'hit_ratio': hits / max(1, requests),
+        'byte_hit_ratio': hit_bytes / max(1, request_bytes),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回放缓存访问记录，比较淘汰策略")
+    parser.add_argument('trace', nargs='?', help="访问记录文件（MOJI_CACHE_TRACE 生成）")
+    parser.add_argument('--synthetic', type=int, default=0, help="不读文件，生成 N 次合成访问")
+    parser.add_argument('--capacity', type=float, nargs='+', default=[10, 25, 50], help="缓存容量（MB）")
+    parser.add_argument('--policy', nargs='+', default=list(POLICIES), choices=list(POLICIES))
+    parser.add_argument('--shards', type=int, default=4)
+    args = parser.parse_args(argv)
+
+    if args.synthetic:
+        events = synthetic_trace(args.synthetic)
+    elif args.trace:
+        events = load_trace(args.trace)
+    else:
+        parser.error("需要访问记录文件或 --synthetic")
+
+    gets = sum(1 for e in events if e[3] == 'get')
+    print(f"events={len(events)} gets={gets} keys={len({e[1] for e in events})}")
+    print(f"{'capacity':>9}  {'policy':<9} {'hit':>7} {'byte_hit':>9}")
+    for capacity in args.capacity:
+        for policy in args.policy:
+            r = simulate(events, policy, int(capacity * 1024 * 1024), args.shards)
+            print(f"{capacity:>7.0f}MB  {policy:<9} {r['hit_ratio']:>7.3f} {r['byte_hit_ratio']:>9.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
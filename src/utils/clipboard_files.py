@@ -0,0 +1,137 @@
+"""
+剪贴板临时文件 - GIF 以文件形式放入剪贴板时使用，按内容哈希命名并定期清理
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from PyQt6.QtCore import QThreadPool
+
+from src.utils.image_buffer import as_view
+
+
+class ClipboardFileStore:
+    """剪贴板临时文件存储
+
+    - 文件名为内容哈希：重复复制同一表情直接复用已有文件（刷新 mtime）
+    - 写入在全局线程池中进行（临时文件 + os.replace，读取方不会看到半截文件）
+    - 后台清理：超过保留时间的文件删除，总大小超出配额时从最旧的开始删除；
+      最近交给剪贴板的文件不会被清理
+    """
+
+    CLEANUP_INTERVAL = 60  # 两次清理的最小间隔（秒）
+
+    def __init__(self, directory=None, max_size_mb=50, max_age_hours=24, keep_recent=8):
+        self._dir = directory or os.path.join(tempfile.gettempdir(), "moji_emoji")
+        self._max_bytes = max_size_mb * 1024 * 1024
+        self._max_age = max_age_hours * 3600
+        self._keep_recent = keep_recent
+        self._recent = []          # 最近交给剪贴板的文件路径
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+        self._reused_count = 0
+        self._written_count = 0
+        self._removed_count = 0
+
+    def prepare(self, data, suffix=".gif", background=True):
+        """返回内容对应的文件路径，调用方可立即放入剪贴板；
+        文件不存在时在后台写入（写入失败时返回的路径不可用，不影响其他 MIME 数据）；
+        已在工作线程中时 background=False 直接写入"""
+        digest = hashlib.blake2b(as_view(data), digest_size=16).hexdigest()
+        path = os.path.join(self._dir, digest + suffix)
+
+        with self._lock:
+            if path in self._recent:
+                self._recent.remove(path)
+            self._recent.append(path)
+            del self._recent[:-self._keep_recent]
+
+        try:
+            os.utime(path)
+            with self._lock:
+                self._reused_count += 1
+        except OSError:
+            if background:
+                QThreadPool.globalInstance().start(lambda: self._write(path, data))
+            else:
+                self._write(path, data)
+
+        self._schedule_cleanup()
+        return path
+
+    def _write(self, path, data):
+        """原子写入（工作线程）"""
+        tmp_path = None
+        try:
+            os.makedirs(self._dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self._dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(as_view(data))
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._written_count += 1
+        except OSError:
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def _schedule_cleanup(self):
+        now = time.time()
+        with self._lock:
+            if now - self._last_cleanup < self.CLEANUP_INTERVAL:
+                return
+            self._last_cleanup = now
+        QThreadPool.globalInstance().start(self.cleanup)
+
+    def cleanup(self):
+        """按保留时间与总大小清理（工作线程）"""
+        try:
+            names = os.listdir(self._dir)
+        except OSError:
+            return
+        with self._lock:
+            protected = set(self._recent)
+
+        now = time.time()
+        entries = []
+        for name in names:
+            path = os.path.join(self._dir, name)
+            if path in protected:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, path, st.st_size))
+
+        entries.sort()
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for mtime, path, size in entries:
+            if now - mtime <= self._max_age and total <= self._max_bytes:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+            total -= size
+        with self._lock:
+            self._removed_count += removed
+
+    def get_stats(self):
+        """获取统计"""
+        with self._lock:
+            return {
+                'written': self._written_count,
+                'reused': self._reused_count,
+                'removed': self._removed_count
+            }
+
+# 全局剪贴板文件存储实例
+clipboard_files = ClipboardFileStore()
@@ -0,0 +1,184 @@
+"""
+剪贴板数据准备 - 临时文件写入、静态兜底图与缩放解码都在工作线程完成，
+UI 线程只组装 QMimeData 并写入剪贴板
+"""
+
+from collections import OrderedDict
+import os
+
+from PyQt6.QtCore import QBuffer, QObject, QRunnable, QSize, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QImageReader
+
+from src.utils.clipboard_files import clipboard_files
+from src.utils.decode_service import FALLBACK, decode_service
+from src.utils.image_buffer import as_qbytearray
+
+# 静态图复制的最长边（保证剪贴板图片质量，同时避免触发 256MB 解码限制）
+MAX_CLIPBOARD_SIDE = 1200
+
+
+def _is_gif(data):
+    return len(data) >= 6 and bytes(data[:6]) in (b'GIF87a', b'GIF89a')
+
+
+class ClipboardPayload:
+    """准备好的剪贴板数据"""
+    __slots__ = ('is_gif', 'data', 'file_path', 'image')
+
+    def __init__(self, is_gif, data, file_path, image):
+        self.is_gif = is_gif
+        self.data = data            # GIF 原始字节（静态图为 None）
+        self.file_path = file_path  # GIF 临时文件路径（写入失败时为 None）
+        self.image = image          # 静态图 / GIF 首帧兜底 QImage（可能为 None）
+
+
+def _read_image(data, max_side=None):
+    """解码第一帧，可按最长边缩小；大图交给进程隔离解码服务"""
+    if max_side and decode_service.should_use(data):
+        image = decode_service.decode(data, max_side, upscale=False)
+        if image is not FALLBACK:
+            return image
+    buf = QBuffer()
+    buf.setData(as_qbytearray(data))
+    if not buf.open(QBuffer.OpenModeFlag.ReadOnly):
+        return None
+    try:
+        reader = QImageReader(buf)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if max_side and size.isValid() and size.width() > 0 and size.height() > 0:
+            scale = min(1.0, max_side / max(size.width(), size.height()))
+            reader.setScaledSize(QSize(max(1, int(size.width() * scale)),
+                                       max(1, int(size.height() * scale))))
+        image = reader.read()
+    finally:
+        buf.close()
+    return None if image.isNull() else image
+
+
+def build_payload(data):
+    """在工作线程中准备剪贴板数据；无法解码时返回 None"""
+    if _is_gif(data):
+        try:
+            file_path = clipboard_files.prepare(data, background=False)
+            if not os.path.exists(file_path):
+                file_path = None
+        except Exception:
+            file_path = None  # 文件方式失败也不影响其他 MIME 数据
+        return ClipboardPayload(True, data, file_path, _read_image(data))
+    image = _read_image(data, MAX_CLIPBOARD_SIDE)
+    if image is None:
+        return None
+    return ClipboardPayload(False, None, None, image)
+
+
+class _PayloadSignals(QObject):
+    done = pyqtSignal(object)  # ClipboardPayload 或 None
+
+
+class PayloadTask(QRunnable):
+    """剪贴板数据准备任务（在全局线程池执行）；
+    未给出数据时在工作线程中从内存/磁盘缓存读取"""
+
+    def __init__(self, url, data=None):
+        super().__init__()
+        self.url = url
+        self.data = data
+        self.signals = _PayloadSignals()
+        self.setAutoDelete(True)
+
+    def run(self):
+        try:
+            data = self.data
+            if not data:
+                from src.utils.image_cache import image_cache
+                from src.utils.disk_cache import disk_cache
+                data = image_cache.get(self.url) or disk_cache.get(self.url)
+            result = build_payload(data) if data else None
+        except Exception:
+            result = None
+        self.signals.done.emit(result)
+
+
+class ClipboardPayloadCache:
+    """剪贴板数据缓存（仅 UI 线程访问）
+
+    - 键为规范化图片键；只保留最近几张（悬停预取与刚复制过的卡片）
+    - 同一图片的并发准备请求合并为一个任务
+    """
+
+    def __init__(self, max_entries=6):
+        self._entries = OrderedDict()  # 图片键 -> ClipboardPayload
+        self._pending = {}             # 图片键 -> [callback]
+        self._max_entries = max_entries
+        self._hit_count = 0
+        self._prepared_count = 0
+
+    @staticmethod
+    def _key(url):
+        from src.utils.loaders import get_picture_key
+        return get_picture_key(url)
+
+    def get(self, url):
+        key = self._key(url)
+        payload = self._entries.get(key)
+        if payload is not None:
+            self._entries.move_to_end(key)
+            self._hit_count += 1
+        return payload
+
+    def prepare(self, url, data=None, callback=None, remember=True):
+        """在后台准备 url 对应的剪贴板数据，完成后回调 callback(payload 或 None)
+        data 为空时从缓存读取；remember=False 时结果不进入缓存（如网格缩略图的临时复制）"""
+        key = self._key(url)
+        if remember:
+            payload = self._entries.get(key)
+            if payload is not None:
+                if callback:
+                    callback(payload)
+                return
+            waiters = self._pending.get(key)
+            if waiters is not None:
+                if callback:
+                    waiters.append(callback)
+                return
+            self._pending[key] = [callback] if callback else []
+
+        task = PayloadTask(url, data)
+        task.signals.done.connect(
+            lambda payload, k=key, r=remember, cb=callback: self._on_done(k, payload, r, cb),
+            Qt.ConnectionType.QueuedConnection
+        )
+        QThreadPool.globalInstance().start(task)
+
+    def _on_done(self, key, payload, remember, callback):
+        self._prepared_count += 1
+        if not remember:
+            if callback:
+                callback(payload)
+            return
+        if payload is not None:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        for cb in self._pending.pop(key, []):
+            cb(payload)
+
+    def is_pending(self, url):
+        return self._key(url) in self._pending
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self):
+        """获取统计"""
+        return {
+            'count': len(self._entries),
+            'pending': len(self._pending),
+            'prepared': self._prepared_count,
+            'hits': self._hit_count
+        }
+
+# 全局剪贴板数据缓存实例
+clipboard_payloads = ClipboardPayloadCache()
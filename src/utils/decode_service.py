@@ -0,0 +1,263 @@
+"""
+进程隔离解码服务（可选）- 大图/可疑图片在子进程中解码，经共享内存传入字节、传回缩放后的 RGBA 像素
+"""
+
+import atexit
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+from PyQt6.QtCore import QBuffer, QSize
+from PyQt6.QtGui import QImage, QImageReader
+
+from src.utils.image_buffer import as_view
+from src.utils.image_header import ImageHeaderSniffer
+
+# 超过任一阈值的图片交给子进程解码
+HEAVY_BYTES = 1024 * 1024
+HEAVY_PIXELS = 4_000_000
+# 单个解码任务超时（秒），超时的子进程直接结束并重新创建
+JOB_TIMEOUT = 2.0
+# 子进程解码的分配上限（MB）；崩溃或超限只影响子进程
+CHILD_ALLOCATION_LIMIT_MB = 512
+
+# decode() 返回该值表示服务不可用，调用方应在本进程内解码
+FALLBACK = object()
+
+
+def _decode_in_child(shm, in_size, side, upscale):
+    """子进程：从共享内存读取原始字节，按最长边 side 解码首帧，RGBA 像素写回输入之后的区域
+    返回 (宽, 高, 每行字节数) 或 None"""
+    buf = QBuffer()
+    buf.setData(bytes(shm.buf[:in_size]))
+    if not buf.open(QBuffer.OpenModeFlag.ReadOnly):
+        return None
+    try:
+        reader = QImageReader(buf)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid() and size.width() > 0 and size.height() > 0:
+            scale = side / max(size.width(), size.height())
+            if not upscale:
+                scale = min(1.0, scale)
+            reader.setScaledSize(QSize(max(1, int(size.width() * scale)),
+                                       max(1, int(size.height() * scale))))
+        else:
+            reader.setScaledSize(QSize(side, side))
+        image = reader.read()
+    finally:
+        buf.close()
+    if image.isNull():
+        return None
+
+    image = image.convertToFormat(QImage.Format.Format_RGBA8888)
+    nbytes = image.sizeInBytes()
+    if in_size + nbytes > shm.size:
+        return None
+    bits = image.constBits()
+    bits.setsize(nbytes)
+    shm.buf[in_size:in_size + nbytes] = bits.asstring()
+    return image.width(), image.height(), image.bytesPerLine()
+
+
+def _worker_main(conn):
+    """子进程主循环：逐个处理 (共享内存名, 输入字节数, side, upscale)，收到 None 退出"""
+    QImageReader.setAllocationLimit(CHILD_ALLOCATION_LIMIT_MB)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            return
+        if job is None:
+            return
+        name, in_size, side, upscale = job
+        result = None
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+            try:
+                result = _decode_in_child(shm, in_size, side, upscale)
+            finally:
+                shm.close()
+        except Exception:
+            result = None
+        conn.send(result)
+
+
+class _Worker:
+    __slots__ = ('process', 'conn')
+
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        try:
+            self.process.kill()
+            self.process.join(1)
+        except Exception:
+            pass
+        self.conn.close()
+
+
+class DecodeService:
+    """进程池解码服务
+
+    - 默认关闭；开启后预先启动子进程（spawn，避免 fork 带上 Qt 线程状态）
+    - decode() 在工作线程中调用并阻塞等待：原始字节写入共享内存，子进程解码后把 RGBA 像素
+      写回同一块共享内存，父进程复制为 QImage；解码占用其他 CPU 核，不受 GIL 限制
+    - 每个任务有超时：超时的子进程被结束并替换，崩溃的子进程同样替换，应用不受影响
+    - 只有大图（字节数或像素数超过阈值）才走子进程，小图在本进程解码更快
+    """
+
+    def __init__(self, processes=None, timeout=JOB_TIMEOUT):
+        self.enabled = False
+        self.processes = processes or max(1, min(4, (os.cpu_count() or 2) - 1))
+        self.timeout = timeout
+        self._context = multiprocessing.get_context('spawn')
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._jobs = 0
+        self._failures = 0
+        self._timeouts = 0
+        self._crashes = 0
+        self._fallbacks = 0
+        self._total_ms = 0.0
+
+    def set_enabled(self, enabled):
+        """开启/关闭进程隔离解码（开启时预先启动子进程）"""
+        self.enabled = bool(enabled)
+        if self.enabled:
+            with self._lock:
+                missing = self.processes - self._workers
+                self._workers += max(0, missing)
+            for _ in range(max(0, missing)):
+                self._spawn()
+        else:
+            self.shutdown()
+
+    def _spawn(self):
+        try:
+            self._idle.put(_Worker(self._context))
+        except Exception:
+            with self._lock:
+                self._workers -= 1
+                # 无法启动子进程（如打包环境不支持）：关闭服务，回退到本进程解码
+                self.enabled = False
+
+    def should_use(self, data):
+        """是否值得交给子进程解码"""
+        if not self.enabled:
+            return False
+        if len(data) >= HEAVY_BYTES:
+            return True
+        sniffer = ImageHeaderSniffer()
+        if sniffer.feed(as_view(data)[:64 * 1024]):
+            return sniffer.width * sniffer.height >= HEAVY_PIXELS
+        return False
+
+    def decode(self, data, side, upscale=True):
+        """在子进程中按最长边 side 解码首帧；失败/超时返回 None，服务不可用时返回 FALLBACK"""
+        if not self.enabled:
+            return FALLBACK
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._fallbacks += 1
+            return FALLBACK
+
+        view = as_view(data)
+        in_size = len(view)
+        started = time.perf_counter()
+        try:
+            shm = shared_memory.SharedMemory(create=True, size=in_size + side * side * 4)
+        except Exception:
+            self._idle.put(worker)
+            with self._lock:
+                self._fallbacks += 1
+            return FALLBACK
+
+        result = None
+        replace = False
+        try:
+            shm.buf[:in_size] = view
+            worker.conn.send((shm.name, in_size, side, upscale))
+            if worker.conn.poll(self.timeout):
+                result = worker.conn.recv()
+            else:
+                replace = True
+                with self._lock:
+                    self._timeouts += 1
+            if result is not None:
+                width, height, stride = result
+                pixels = bytes(shm.buf[in_size:in_size + stride * height])
+                result = QImage(pixels, width, height, stride,
+                                QImage.Format.Format_RGBA8888).copy()  # 脱离 pixels 缓冲区
+        except (EOFError, OSError):
+            replace = True
+            result = None
+            with self._lock:
+                self._crashes += 1
+        finally:
+            shm.close()
+            shm.unlink()
+            if replace:
+                worker.kill()
+                if self.enabled:
+                    self._spawn()
+                else:
+                    with self._lock:
+                        self._workers -= 1
+            elif self.enabled:
+                self._idle.put(worker)
+            else:
+                worker.kill()
+                with self._lock:
+                    self._workers -= 1
+
+        with self._lock:
+            self._jobs += 1
+            self._total_ms += (time.perf_counter() - started) * 1000
+            if result is None:
+                self._failures += 1
+        return result
+
+    def shutdown(self):
+        """结束空闲子进程（正在执行的任务完成后自行退出）"""
+        self.enabled = False
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+            with self._lock:
+                self._workers -= 1
+
+    def get_stats(self):
+        """获取统计"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'workers': self._workers,
+                'jobs': self._jobs,
+                'failures': self._failures,
+                'timeouts': self._timeouts,
+                'crashes': self._crashes,
+                'fallbacks': self._fallbacks,
+                'avg_ms': self._total_ms / max(1, self._jobs)
+            }
+
+# 全局解码服务实例
+decode_service = DecodeService()
+atexit.register(decode_service.shutdown)
@@ -0,0 +1,113 @@
+"""
+结果分帧批量交付 - 工作线程的加载结果先进入队列，UI 线程每帧（约 16ms）统一应用一次
+"""
+
+from collections import deque
+import threading
+import time
+
+from PyQt6.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+# 一帧的时长（毫秒）
+FRAME_MS = 16
+
+
+class DeliveryBatcher(QObject):
+    """结果交付批处理器
+
+    - post() 可在任意线程调用：回调进入队列，每个批次只向 UI 事件循环投递一次唤醒
+      监听方可在批次内推迟布局，批次结束后只做一次布局（只有被更新的卡片各自重绘）
+      监听方可在批次内暂停重绘，批次结束后只做一次布局与重绘
+    - 两次 flush 至少间隔一帧；空闲后的第一个结果立即交付
+    - 统计节省的事件循环轮次，并按单条交付的平均耗时估算节省的事件循环时间
+    """
+
+    batch_started = pyqtSignal()
+    batch_finished = pyqtSignal(int)  # 本批回调数
+    _wake = pyqtSignal()
+
+    def __init__(self, frame_ms=FRAME_MS):
+        super().__init__()
+        self.frame_ms = frame_ms
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._scheduled = False
+        self._last_flush = 0.0
+        self._wake.connect(self._on_wake, Qt.ConnectionType.QueuedConnection)
+
+        # 统计（仅 UI 线程更新）
+        self._flush_count = 0
+        self._item_count = 0
+        self._max_batch = 0
+        self._flush_ms = 0.0
+        self._single_ms = None      # 单条批次耗时的滑动平均（相当于逐条交付的代价）
+        self._multi_items = 0       # 多条批次中的回调数
+        self._multi_ms = 0.0        # 多条批次的总耗时
+
+    def post(self, callback, *args):
+        """加入一条待交付回调（线程安全）"""
+        with self._lock:
+            self._queue.append((callback, args))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._wake.emit()
+
+    def _on_wake(self):
+        elapsed_ms = (time.perf_counter() - self._last_flush) * 1000
+        QTimer.singleShot(max(0, int(self.frame_ms - elapsed_ms)), self.flush)
+
+    def flush(self):
+        """在 UI 线程应用队列中的全部结果"""
+        with self._lock:
+            items = list(self._queue)
+            self._queue.clear()
+            self._scheduled = False
+        self._last_flush = time.perf_counter()
+        if not items:
+            return
+
+        started = time.perf_counter()
+        self.batch_started.emit()
+        try:
+            for callback, args in items:
+                try:
+                    callback(*args)
+                except Exception as e:
+                    print(f"[delivery] callback error: {e}", flush=True)
+        finally:
+            self.batch_finished.emit(len(items))
+        cost_ms = (time.perf_counter() - started) * 1000
+
+        n = len(items)
+        self._flush_count += 1
+        self._item_count += n
+        self._max_batch = max(self._max_batch, n)
+        self._flush_ms += cost_ms
+        if n == 1:
+            self._single_ms = cost_ms if self._single_ms is None else self._single_ms * 0.9 + cost_ms * 0.1
+        else:
+            self._multi_items += n
+            self._multi_ms += cost_ms
+
+    def pending(self):
+        """队列中尚未交付的回调数"""
+        with self._lock:
+            return len(self._queue)
+
+    def get_stats(self):
+        """获取统计；saved_ms 为按单条交付平均耗时估算的节省时间（尚无单条样本时为 None）"""
+        saved_ms = None
+        if self._single_ms is not None:
+            saved_ms = max(0.0, self._single_ms * self._multi_items - self._multi_ms)
+        return {
+            'items': self._item_count,
+            'flushes': self._flush_count,
+            'turns_saved': self._item_count - self._flush_count,
+            'avg_batch': self._item_count / max(1, self._flush_count),
+            'max_batch': self._max_batch,
+            'flush_ms': self._flush_ms,
+            'single_ms': self._single_ms,
+            'saved_ms': saved_ms,
+            'pending': self.pending()
+        }
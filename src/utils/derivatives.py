@@ -0,0 +1,230 @@
+"""
+衍生缩略图存储 - 网格 64px 预缩放图，每张图只解码一次
+"""
+
+from collections import OrderedDict
+import os
+import threading
+
+from PyQt6.QtCore import QBuffer, QSize, Qt
+from PyQt6.QtGui import QImage, QImageReader
+
+from src.utils.decode_service import FALLBACK, decode_service
+from src.utils.disk_cache import DiskImageCache
+from src.utils.image_buffer import as_qbytearray
+from src.utils.paths import get_cache_dir
+
+# 衍生图尺寸：网格卡片（72 卡片 - padding）；悬停预览由 PreviewCache 按需解码，不在此预生成
+GRID_SIDE = 64
+
+# 原图不小于该字节数（或经进程隔离解码）时才把衍生图写入磁盘：
+# 小原图从磁盘缓存重新解码的代价与读取衍生图相当，不值得在加载路径上额外编码、写盘
+PERSIST_MIN_BYTES = 256 * 1024
+
+# 小于目标边长的图片是否放大：衍生图、卡片兜底解码与卡片动画共用同一规则，同一表情不论走哪条路径尺寸一致
+UPSCALE_SMALL = False
+
+
+def fit_size(width, height, side, upscale=UPSCALE_SMALL):
+    """按最长边 side 等比缩放后的尺寸"""
+    scale = side / max(width, height)
+    if not upscale:
+        scale = min(1.0, scale)
+    return QSize(max(1, int(width * scale)), max(1, int(height * scale)))
+
+
+def decode_scaled(data, side, upscale=UPSCALE_SMALL):
+    """在当前线程按最长边 side 解码首帧（QImageReader 直接按目标尺寸解码），失败返回 None"""
+    buf = QBuffer()
+    buf.setData(as_qbytearray(data))
+    if not buf.open(QBuffer.OpenModeFlag.ReadOnly):
+        return None
+    try:
+        reader = QImageReader(buf)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        known = size.isValid() and size.width() > 0 and size.height() > 0
+        if known:
+            reader.setScaledSize(fit_size(size.width(), size.height(), side, upscale))
+        image = reader.read()
+    finally:
+        buf.close()
+    if image.isNull():
+        return None
+    if not known:
+        # 头部未给出尺寸：解码后再按同一规则缩放
+        target = fit_size(image.width(), image.height(), side, upscale)
+        if target != image.size():
+            image = image.scaled(target, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                 Qt.TransformationMode.SmoothTransformation)
+    return image
+
+
+class DerivativeStore:
+    """衍生缩略图存储 - 内存 QImage LRU + 磁盘编码文件
+
+    - build() 在工作线程中调用：原图只解码一次，生成各尺寸衍生图（GIF 取首帧）
+    - get(memory_only=True) 供 UI 线程调用：只查内存，回收的卡片重新绑定无需再解码原图；
+      磁盘读取、解码只在工作线程（thumbnail/build）进行，磁盘索引由 warm() 在工作线程建立
+    - 键为图片 ID（与尺寸段无关）；thumb150 为方形裁切，不用于生成衍生图
+    - QImage 可跨线程共享（隐式共享 + 只读），内存 LRU 加锁保护
+    """
+
+    SIZES = (GRID_SIDE,)
+
+    def __init__(self, max_size_mb=32, disk_size_mb=100):
+        self._images = OrderedDict()  # (picture_id, side) -> QImage
+        self._max_bytes = max_size_mb * 1024 * 1024
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self._disk = DiskImageCache(os.path.join(get_cache_dir(), 'derived'), max_size_mb=disk_size_mb)
+        self._hit_count = 0
+        self._miss_count = 0
+        self._build_count = 0
+
+    @staticmethod
+    def _disk_key(picture_id, side):
+        return f"{picture_id}:d{side}"
+
+    def _put(self, picture_id, side, image):
+        """放入内存 LRU"""
+        key = (picture_id, side)
+        size = image.sizeInBytes()
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self._current_bytes -= old.sizeInBytes()
+            while self._images and self._current_bytes + size > self._max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._current_bytes -= evicted.sizeInBytes()
+            self._images[key] = image
+            self._current_bytes += size
+
+    def warm(self):
+        """预先建立磁盘索引（启动时在工作线程调用）"""
+        self._disk.warm()
+
+    def get(self, url, side, memory_only=False):
+        """获取衍生图（内存 -> 磁盘），未生成时返回 None；memory_only 时不读磁盘（UI 线程）"""
+        from src.utils.loaders import get_picture_id
+        picture_id = get_picture_id(url)
+        key = (picture_id, side)
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self._hit_count += 1
+                return image
+            if memory_only:
+                self._miss_count += 1
+                return None
+
+        data = self._disk.get_by_key(self._disk_key(picture_id, side))
+        if data:
+            image = QImage()
+            if image.loadFromData(data):
+                self._put(picture_id, side, image)
+                with self._lock:
+                    self._hit_count += 1
+                return image
+
+        with self._lock:
+            self._miss_count += 1
+        return None
+
+    def has(self, url, side):
+        """是否已有衍生图（不计入统计）"""
+        from src.utils.loaders import get_picture_id
+        picture_id = get_picture_id(url)
+        with self._lock:
+            if (picture_id, side) in self._images:
+                return True
+        return self._disk.contains_key(self._disk_key(picture_id, side))
+
+    def build(self, url, data):
+        """在工作线程中生成缺失的衍生图（内存 + 磁盘）；返回 {side: QImage}"""
+        if '/thumb150/' in url:
+            return {}
+        missing = [side for side in self.SIZES if not self.has(url, side)]
+        if not missing:
+            return {}
+
+        from src.utils.loaders import get_picture_id
+        picture_id = get_picture_id(url)
+        largest = self._decode(data, max(missing))
+        if largest is None:
+            return {}
+
+        with self._lock:
+            self._build_count += 1
+        persist = len(data) >= PERSIST_MIN_BYTES or decode_service.should_use(data)
+        result = {}
+        for side in missing:
+            target = fit_size(largest.width(), largest.height(), side)
+            if target == largest.size():
+                image = largest
+            else:
+                image = largest.scaled(target, Qt.AspectRatioMode.IgnoreAspectRatio,
+                                       Qt.TransformationMode.SmoothTransformation)
+            self._put(picture_id, side, image)
+            if persist:
+                self._persist(picture_id, side, image)
+            result[side] = image
+        return result
+
+    def thumbnail(self, url, data, side=GRID_SIDE):
+        """在工作线程中获取 side 尺寸的缩略图：生成缺失的衍生图后返回；
+        无法生成衍生图（如 thumb150 裁切图）时直接解码一份"""
+        built = self.build(url, data)
+        if side in built:
+            return built[side]
+        if '/thumb150/' not in url:
+            image = self.get(url, side)
+            if image is not None:
+                return image
+        return self._decode(data, side)
+
+    def _decode(self, data, side):
+        """按最长边 side 解码首帧；大图交给进程隔离解码服务"""
+        if decode_service.should_use(data):
+            image = decode_service.decode(data, side, upscale=UPSCALE_SMALL)
+            if image is not FALLBACK:
+                return image
+        return decode_scaled(data, side)
+
+    def _persist(self, picture_id, side, image):
+        """编码后写入磁盘：带透明通道用 PNG，否则用 JPEG"""
+        buf = QBuffer()
+        if not buf.open(QBuffer.OpenModeFlag.WriteOnly):
+            return
+        if image.hasAlphaChannel():
+            ok = image.save(buf, "PNG")
+        else:
+            ok = image.save(buf, "JPG", 85)
+        buf.close()
+        if ok:
+            self._disk.set_by_key(self._disk_key(picture_id, side), bytes(buf.data()))
+
+    def trim(self, max_bytes):
+        """把内存中的衍生图淘汰到 max_bytes 以下（内存调控使用），返回释放的字节数"""
+        freed = 0
+        with self._lock:
+            while self._images and self._current_bytes > max_bytes:
+                _, evicted = self._images.popitem(last=False)
+                self._current_bytes -= evicted.sizeInBytes()
+                freed += evicted.sizeInBytes()
+        return freed
+
+    def get_stats(self):
+        """获取统计"""
+        with self._lock:
+            return {
+                'size_mb': self._current_bytes / 1024 / 1024,
+                'count': len(self._images),
+                'hit_rate': self._hit_count / max(1, self._hit_count + self._miss_count),
+                'builds': self._build_count,
+                'disk': self._disk.get_stats()
+            }
+
+# 全局衍生图存储实例
+derivative_store = DerivativeStore()
@@ -0,0 +1,225 @@
+"""
+图片磁盘缓存 - 重启后仍可复用，避免重复下载热门表情
+"""
+
+from collections import OrderedDict
+import hashlib
+import mmap
+import os
+import re
+import tempfile
+import threading
+
+from src.utils.paths import get_cache_dir
+
+_SAFE_NAME = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class DiskImageCache:
+    """图片磁盘缓存 - 以“图片 ID + 尺寸段”为键，字节配额 + LRU 淘汰
+
+    - 写入：先写同目录临时文件再 os.replace，进程崩溃也不会留下半截文件
+    - 读取：mmap 映射后返回只读 memoryview，字节直接交给 QBuffer/QImageReader，不额外拷贝
+      （文件被淘汰/覆盖后已映射的内容仍然有效）
+    - LRU 顺序持久化在文件 mtime 上，启动时按 mtime 重建索引（warm() 在工作线程扫描目录；
+      扫描完成前 UI 线程以 block=False 查询得到“未知”，不会被目录扫描阻塞）
+    """
+
+    def __init__(self, cache_dir=None, max_size_mb=300):
+        self._dir = cache_dir or os.path.join(get_cache_dir(), 'images')
+        self._max_bytes = max_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()  # 串行化目录扫描，扫描期间不持有 _lock
+        self._index = OrderedDict()  # 文件名 -> 字节数（最旧在前）
+        self._current_bytes = 0
+        self._loaded = False
+        self._hit_count = 0
+        self._miss_count = 0
+        self._evict_count = 0
+
+    def _file_name(self, key):
+        """缓存键 -> 文件名（可读则直接使用，否则取哈希）"""
+        pid, _, variant = key.partition(':')
+        if variant and _SAFE_NAME.match(pid) and _SAFE_NAME.match(variant):
+            return f"{pid}.{variant}"
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def _path(self, name):
+        # 按哈希前两位分目录，避免单目录文件过多
+        shard = hashlib.md5(name.encode()).hexdigest()[:2]
+        return os.path.join(self._dir, shard, name)
+
+    def _ensure_loaded(self):
+        """首次使用时扫描缓存目录重建 LRU 索引（不可持有 _lock）"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            entries = self._scan()
+            entries.sort()
+            with self._lock:
+                for _, name, size in entries:
+                    self._index[name] = size
+                    self._current_bytes += size
+                self._evict()
+                self._loaded = True
+
+    def _scan(self):
+        """扫描缓存目录，返回 [(mtime, 文件名, 字节数)]；顺带删除上次异常退出残留的临时文件"""
+        entries = []
+        try:
+            for shard in os.listdir(self._dir):
+                shard_dir = os.path.join(self._dir, shard)
+                if not os.path.isdir(shard_dir):
+                    continue
+                for name in os.listdir(shard_dir):
+                    path = os.path.join(shard_dir, name)
+                    if name.endswith('.tmp'):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                        continue
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, name, st.st_size))
+        except OSError:
+            pass
+        return entries
+
+    def warm(self):
+        """预先建立索引（启动时在工作线程调用）"""
+        self._ensure_loaded()
+
+    def _evict(self, reserve=0):
+        """淘汰最久未用的文件直到满足配额（需持有锁）"""
+        while self._index and self._current_bytes + reserve > self._max_bytes:
+            name, size = self._index.popitem(last=False)
+            self._current_bytes -= size
+            self._evict_count += 1
+            try:
+                os.remove(self._path(name))
+            except OSError:
+                pass
+
+    def get(self, url):
+        """按图片 URL 读取缓存，命中返回 mmap 支持的只读 memoryview，未命中返回 None"""
+        from src.utils.loaders import get_picture_key
+        return self.get_by_key(get_picture_key(url))
+
+    def set(self, url, data):
+        """按图片 URL 写入缓存"""
+        from src.utils.loaders import get_picture_key
+        self.set_by_key(get_picture_key(url), data)
+
+    def contains(self, url, block=True):
+        """按图片 URL 判断是否已缓存（不计入命中统计）"""
+        from src.utils.loaders import get_picture_key
+        return self.contains_key(get_picture_key(url), block)
+
+    def contains_key(self, key, block=True):
+        """是否已缓存（不计入命中统计）；block=False 时索引未建立则返回 None（未知），供 UI 线程调用"""
+        if not self._loaded:
+            if not block:
+                return None
+            self._ensure_loaded()
+        name = self._file_name(key)
+        with self._lock:
+            return name in self._index
+
+    def get_by_key(self, key):
+        """按缓存键读取（键格式 '图片ID:尺寸段'）"""
+        name = self._file_name(key)
+        self._ensure_loaded()
+        with self._lock:
+            if name not in self._index:
+                self._miss_count += 1
+                return None
+            self._index.move_to_end(name)
+
+        path = self._path(name)
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    raise OSError("empty cache file")
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # 刷新 mtime，使 LRU 顺序在重启后依然有效
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                size = self._index.pop(name, None)
+                if size is not None:
+                    self._current_bytes -= size
+                self._miss_count += 1
+            return None
+
+        with self._lock:
+            self._hit_count += 1
+        return memoryview(mapped)
+
+    def set_by_key(self, key, data):
+        """按缓存键写入（原子替换）"""
+        size = len(data)
+        if size == 0 or size > self._max_bytes // 2:
+            return
+
+        name = self._file_name(key)
+        path = self._path(name)
+        shard_dir = os.path.dirname(path)
+        tmp_path = None
+        try:
+            os.makedirs(shard_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=shard_dir, suffix='.tmp')
+            from src.utils.image_buffer import as_view
+            with os.fdopen(fd, 'wb') as f:
+                f.write(as_view(data))
+            os.replace(tmp_path, path)
+            tmp_path = None
+        except OSError:
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        self._ensure_loaded()
+        with self._lock:
+            old = self._index.pop(name, None)
+            if old is not None:
+                self._current_bytes -= old
+            self._evict(reserve=size)
+            self._index[name] = size
+            self._current_bytes += size
+
+    def clear(self):
+        """清空磁盘缓存"""
+        self._ensure_loaded()
+        with self._lock:
+            for name in list(self._index):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._current_bytes = 0
+            self._hit_count = 0
+            self._miss_count = 0
+
+    def get_stats(self):
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                'size_mb': self._current_bytes / 1024 / 1024,
+                'count': len(self._index),
+                'hit_rate': self._hit_count / max(1, self._hit_count + self._miss_count),
+                'hits': self._hit_count,
+                'misses': self._miss_count,
+                'evictions': self._evict_count
+            }
+
+# 全局磁盘缓存实例
+disk_cache = DiskImageCache()
@@ -0,0 +1,308 @@
+"""
+缓存淘汰策略 - LRU / GDSF（按大小加权）/ W-TinyLFU，按字节配额工作
+策略只维护键的顺序与元数据，不持有数据；调用方（缓存分片）负责加锁
+"""
+
+from collections import OrderedDict
+import heapq
+import itertools
+import zlib
+
+
+def shard_of(key, shards):
+    """键所属的分片序号（crc32，跨进程稳定；缓存与模拟器共用）"""
+    return zlib.crc32(key.encode('utf-8')) % shards
+
+
+class LRUPolicy:
+    """最近最少使用：淘汰最久未访问的键"""
+
+    name = 'lru'
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._order = OrderedDict()  # 键 -> 大小
+
+    def on_access(self, key):
+        self._order.move_to_end(key)
+
+    def on_insert(self, key, size):
+        """加入新键，返回需要淘汰的键列表（准入型策略可能包含新键本身）"""
+        self._order[key] = size
+        self.bytes += size
+        evicted = []
+        while self.bytes > self.max_bytes and len(self._order) > 1:
+            old, old_size = self._order.popitem(last=False)
+            self.bytes -= old_size
+            evicted.append(old)
+        return evicted
+
+    def on_remove(self, key):
+        size = self._order.pop(key, None)
+        if size is not None:
+            self.bytes -= size
+
+    def resize(self, max_bytes):
+        """调整配额，返回需要淘汰的键列表"""
+        self.max_bytes = max_bytes
+        evicted = []
+        while self.bytes > self.max_bytes and self._order:
+            old, old_size = self._order.popitem(last=False)
+            self.bytes -= old_size
+            evicted.append(old)
+        return evicted
+
+    def clear(self):
+        self._order.clear()
+        self.bytes = 0
+
+
+class GDSFPolicy:
+    """Greedy-Dual-Size-Frequency：优先级 = L + 访问次数 / 大小
+
+    小而常用的表情优先保留，大而只看过一次的动图先被淘汰；
+    L 为最近一次淘汰的优先级（老化），使长期不访问的高频项最终也能被淘汰
+    """
+
+    name = 'gdsf'
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = {}   # 键 -> [频次, 大小, 优先级]
+        self._heap = []      # (优先级, 序号, 键)，失效条目出堆时惰性丢弃
+        self._seq = itertools.count()
+        self._clock = 0.0    # L
+
+    def _push(self, key, entry):
+        entry[2] = self._clock + entry[0] / max(1, entry[1])
+        heapq.heappush(self._heap, (entry[2], next(self._seq), key))
+
+    def on_access(self, key):
+        entry = self._entries[key]
+        entry[0] += 1
+        self._push(key, entry)
+
+    def on_insert(self, key, size):
+        # 先在已有键中按优先级从低到高淘汰，再加入新键
+        evicted = []
+        while self.bytes + size > self.max_bytes and self._entries:
+            priority, _, victim = heapq.heappop(self._heap)
+            current = self._entries.get(victim)
+            if current is None or current[2] != priority:
+                continue
+            self._clock = priority
+            del self._entries[victim]
+            self.bytes -= current[1]
+            evicted.append(victim)
+        entry = [1, size, 0.0]
+        self._entries[key] = entry
+        self.bytes += size
+        self._push(key, entry)
+        if len(self._heap) > 4 * len(self._entries) + 64:
+            self._compact()
+        return evicted
+
+    def _compact(self):
+        """清理堆中的失效条目"""
+        self._heap = [(e[2], next(self._seq), k) for k, e in self._entries.items()]
+        heapq.heapify(self._heap)
+
+    def on_remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[1]
+
+    def resize(self, max_bytes):
+        self.max_bytes = max_bytes
+        evicted = []
+        while self.bytes > self.max_bytes and self._entries:
+            priority, _, victim = heapq.heappop(self._heap)
+            current = self._entries.get(victim)
+            if current is None or current[2] != priority:
+                continue
+            self._clock = priority
+            del self._entries[victim]
+            self.bytes -= current[1]
+            evicted.append(victim)
+        return evicted
+
+    def clear(self):
+        self._entries.clear()
+        self._heap = []
+        self.bytes = 0
+        self._clock = 0.0
+
+
+class FrequencySketch:
+    """Count-Min Sketch（4 行，计数上限 15），定期减半以反映近期热度"""
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, expected_items):
+        width = 64
+        while width < expected_items:
+            width <<= 1
+        self._mask = width - 1
+        self._rows = [[0] * width for _ in range(self.DEPTH)]
+        self._additions = 0
+        self._sample_size = 10 * width
+
+    def _indexes(self, key):
+        h = hash(key)
+        for i in range(self.DEPTH):
+            yield (h ^ (h >> (7 * i + 5)) ^ (0x9E3779B9 * (i + 1))) & self._mask
+
+    def increment(self, key):
+        for row, idx in zip(self._rows, self._indexes(key)):
+            if row[idx] < self.MAX_COUNT:
+                row[idx] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._reset()
+
+    def frequency(self, key):
+        return min(row[idx] for row, idx in zip(self._rows, self._indexes(key)))
+
+    def _reset(self):
+        for row in self._rows:
+            for i, count in enumerate(row):
+                row[i] = count >> 1
+        self._additions //= 2
+
+
+class WTinyLFUPolicy:
+    """W-TinyLFU：小的 LRU 窗口 + 分段 LRU 主区（试用段 / 保护段），频率草图决定准入
+
+    新键先进入窗口；窗口溢出的键要进入主区时，与主区试用段最久未用的键比较历史访问频率，
+    频率更高才准入。一次性滚动浏览的大量图片只能在窗口中停留，不会冲掉反复复制的热门表情。
+    """
+
+    name = 'wtinylfu'
+
+    def __init__(self, max_bytes, window_ratio=0.01, protected_ratio=0.8, avg_item_bytes=16 * 1024):
+        self.bytes = 0
+        self._window_ratio = window_ratio
+        self._protected_ratio = protected_ratio
+        self._set_limits(max_bytes)
+        self._window = OrderedDict()      # 键 -> 大小
+        self._probation = OrderedDict()
+        self._protected = OrderedDict()
+        self._window_bytes = 0
+        self._probation_bytes = 0
+        self._protected_bytes = 0
+        self._sketch = FrequencySketch(max(64, max_bytes // avg_item_bytes))
+
+    def _set_limits(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._window_max = max(1, int(max_bytes * self._window_ratio))
+        self._main_max = max_bytes - self._window_max
+        self._protected_max = int(self._main_max * self._protected_ratio)
+
+    def resize(self, max_bytes):
+        """调整配额：依次从窗口、试用段、保护段最久未用的一端淘汰"""
+        self._set_limits(max_bytes)
+        evicted = []
+        for segment, attr in ((self._window, '_window_bytes'),
+                              (self._probation, '_probation_bytes'),
+                              (self._protected, '_protected_bytes')):
+            while self.bytes > self.max_bytes and segment:
+                key, size = segment.popitem(last=False)
+                setattr(self, attr, getattr(self, attr) - size)
+                self._drop(key, size, evicted)
+        return evicted
+
+    def on_access(self, key):
+        self._sketch.increment(key)
+        if key in self._window:
+            self._window.move_to_end(key)
+        elif key in self._probation:
+            size = self._probation.pop(key)
+            self._probation_bytes -= size
+            self._protected[key] = size
+            self._protected_bytes += size
+            # 保护段溢出：最久未用的降回试用段
+            while self._protected_bytes > self._protected_max and len(self._protected) > 1:
+                demoted, demoted_size = self._protected.popitem(last=False)
+                self._protected_bytes -= demoted_size
+                self._probation[demoted] = demoted_size
+                self._probation_bytes += demoted_size
+        elif key in self._protected:
+            self._protected.move_to_end(key)
+
+    def on_insert(self, key, size):
+        self._sketch.increment(key)
+        self._window[key] = size
+        self._window_bytes += size
+        self.bytes += size
+        evicted = []
+        while self._window_bytes > self._window_max and self._window:
+            candidate, candidate_size = self._window.popitem(last=False)
+            self._window_bytes -= candidate_size
+            self._admit(candidate, candidate_size, evicted)
+        return evicted
+
+    def _admit(self, candidate, size, evicted):
+        """窗口淘汰的候选键尝试进入主区"""
+        main_bytes = self._probation_bytes + self._protected_bytes
+        if main_bytes + size > self._main_max:
+            if size > self._main_max:
+                self._drop(candidate, size, evicted)
+                return
+            # 依次与主区最久未用的键比较频率，需要腾出的空间全部由较冷的键让出才准入
+            frequency = self._sketch.frequency(candidate)
+            victims = []
+            freed = 0
+            for victim in itertools.chain(self._probation, self._protected):
+                if main_bytes - freed + size <= self._main_max:
+                    break
+                if self._sketch.frequency(victim) >= frequency:
+                    self._drop(candidate, size, evicted)
+                    return
+                victims.append(victim)
+                freed += self._probation.get(victim) or self._protected.get(victim)
+            for victim in victims:
+                if victim in self._probation:
+                    victim_size = self._probation.pop(victim)
+                    self._probation_bytes -= victim_size
+                else:
+                    victim_size = self._protected.pop(victim)
+                    self._protected_bytes -= victim_size
+                self._drop(victim, victim_size, evicted)
+        self._probation[candidate] = size
+        self._probation_bytes += size
+
+    def _drop(self, key, size, evicted):
+        self.bytes -= size
+        evicted.append(key)
+
+    def on_remove(self, key):
+        for segment, attr in ((self._window, '_window_bytes'),
+                              (self._probation, '_probation_bytes'),
+                              (self._protected, '_protected_bytes')):
+            size = segment.pop(key, None)
+            if size is not None:
+                setattr(self, attr, getattr(self, attr) - size)
+                self.bytes -= size
+                return
+
+    def clear(self):
+        self._window.clear()
+        self._probation.clear()
+        self._protected.clear()
+        self._window_bytes = self._probation_bytes = self._protected_bytes = 0
+        self.bytes = 0
+
+
+POLICIES = {
+    LRUPolicy.name: LRUPolicy,
+    GDSFPolicy.name: GDSFPolicy,
+    WTinyLFUPolicy.name: WTinyLFUPolicy,
+}
+
+
+def make_policy(name, max_bytes):
+    """按名称创建淘汰策略（未知名称回退为 LRU）"""
+    return POLICIES.get(name, LRUPolicy)(max_bytes)
@@ -0,0 +1,187 @@
+"""
+共享图片字节 - 下载时按 Content-Length 预分配缓冲区，下游共享同一份只读数据
+"""
+
+import threading
+import weakref
+
+from PyQt6.QtCore import QByteArray
+
+
+class SharedImageBuffer:
+    """只读共享图片字节
+
+    - Python 侧通过 view（只读 memoryview）访问：写磁盘、解析头部、切片判断格式都不拷贝
+    - Qt 侧通过 qbytes 访问：首次使用时构造一次 QByteArray，此后 QBuffer / QMimeData / QImage
+      共享这一份（QByteArray 隐式共享，传递时不拷贝）；可在工作线程中构造
+    - 作为内存缓存的值在网格、预览、剪贴板之间传递，缓存命中时无需再次转换
+    - 构造 QByteArray 后 view 改为指向 QByteArray 的内存，释放 Python 侧的那份，
+      每张图片只保留一份字节（绑定不支持缓冲区协议时两份并存，qt_backed 为 False）
+    - partial 为 True 表示只含首帧的渐进式 GIF，完整数据需续传
+    """
+
+    __slots__ = ('view', 'partial', 'qt_backed', '_qbytes', '__weakref__')
+
+    def __init__(self, data, partial=False):
+        if isinstance(data, SharedImageBuffer):
+            view = data.view
+        else:
+            view = memoryview(data)
+        self.view = view.toreadonly()
+        self.partial = partial
+        self.qt_backed = False
+        self._qbytes = None
+
+    @property
+    def qbytes(self):
+        """共享的 QByteArray（并发首次访问时可能各构造一份，内容相同，保留其一即可）"""
+        qbytes = self._qbytes
+        if qbytes is None:
+            qbytes = QByteArray(self.view)
+            self._qbytes = qbytes
+            try:
+                self.view = memoryview(qbytes).toreadonly()
+                self.qt_backed = True
+            except TypeError:
+                pass
+        return qbytes
+
+    def __len__(self):
+        return self.view.nbytes
+
+    def __getitem__(self, item):
+        return self.view[item]
+
+    def tobytes(self):
+        """显式拷贝为 bytes（仅在确实需要独立副本时使用）"""
+        return self.view.tobytes()
+
+
+class ImageHandleRegistry:
+    """共享图片句柄登记表 - 按图片键弱引用仍存活的 SharedImageBuffer
+
+    - 引用计数交给 Python：缓存、卡片、预览、剪贴板持有同一对象，最后一个持有方释放时字节随之释放
+    - intern()：同一图片（同样大小）已有存活的缓冲区时直接返回它，
+      内存缓存淘汰后从磁盘/网络再次得到的数据不会与卡片手中的那份并存
+    - get_stats() 按存活缓冲区统计内存，每张图片只计一次
+    """
+
+    def __init__(self):
+        self._buffers = weakref.WeakValueDictionary()  # 图片键 -> SharedImageBuffer
+        self._lock = threading.Lock()
+        self._interned_count = 0
+
+    def intern(self, url, data):
+        from src.utils.loaders import get_picture_key
+        key = get_picture_key(url)
+        buffer = share(data)
+        with self._lock:
+            existing = self._buffers.get(key)
+            if existing is not None and len(existing) == len(buffer) and existing.partial == buffer.partial:
+                if existing is not buffer:
+                    self._interned_count += 1
+                return existing
+            self._buffers[key] = buffer
+        return buffer
+
+    def get_stats(self):
+        """获取统计"""
+        with self._lock:
+            buffers = list(self._buffers.values())
+            interned = self._interned_count
+        return {
+            'live': len(buffers),
+            'live_mb': sum(len(b) for b in buffers) / 1024 / 1024,
+            'qt_copies_mb': sum(len(b) for b in buffers
+                                if b._qbytes is not None and not b.qt_backed) / 1024 / 1024,
+            'interned': interned
+        }
+
+
+def share(data):
+    """包装为共享只读缓冲区（已包装的原样返回）"""
+    if isinstance(data, SharedImageBuffer):
+        return data
+    return SharedImageBuffer(data)
+
+
+def as_view(data):
+    """获取只读 memoryview（不拷贝）"""
+    if isinstance(data, SharedImageBuffer):
+        return data.view
+    return memoryview(data)
+
+
+def as_qbytearray(data):
+    """获取可交给 Qt 的 QByteArray（共享缓冲区复用已构造的一份）"""
+    if isinstance(data, SharedImageBuffer):
+        return data.qbytes
+    if isinstance(data, QByteArray):
+        return data
+    return QByteArray(data)
+
+
+class BodyReader:
+    """响应体读取器
+
+    已知 Content-Length 且未压缩时按长度预分配缓冲区，用 raw.readinto 直接写入，
+    结束后无需 join；否则退回 iter_content 分块拼接。迭代产出每次新到的字节（memoryview）。
+    prefix 为 Range 续传前已下载的字节：content_length / received 均包含这部分。
+    """
+
+    def __init__(self, response, chunk_size=16384, prefix=None, preallocate=True):
+        self.response = response
+        self.chunk_size = chunk_size
+        self._prefix = prefix
+        self.received = len(prefix) if prefix else 0
+        try:
+            length = int(response.headers.get('Content-Length') or 0)
+        except ValueError:
+            length = 0
+        self.content_length = self.received + length if length else 0
+        encoding = (response.headers.get('Content-Encoding') or 'identity').lower()
+        self.preallocated = preallocate and length > 0 and encoding == 'identity'
+        self._buf = None
+        self._chunks = [bytes(prefix)] if prefix and not self.preallocated else []
+
+    def __iter__(self):
+        if self.preallocated:
+            self._buf = bytearray(self.content_length)
+            if self._prefix:
+                self._buf[:len(self._prefix)] = self._prefix
+            view = memoryview(self._buf)
+            raw = self.response.raw
+            while self.received < self.content_length:
+                end = min(self.received + self.chunk_size, self.content_length)
+                n = raw.readinto(view[self.received:end])
+                if not n:
+                    break
+                chunk = view[self.received:self.received + n]
+                self.received += n
+                yield chunk
+        else:
+            for chunk in self.response.iter_content(chunk_size=self.chunk_size):
+                if not chunk:
+                    continue
+                self._chunks.append(chunk)
+                self.received += len(chunk)
+                yield chunk
+
+    def partial(self):
+        """已接收的字节（中途停止时使用）"""
+        if self.preallocated:
+            return bytes(self._buf[:self.received]) if self._buf is not None else b''
+        return b''.join(self._chunks)
+
+    def result(self):
+        """读取结束后的共享缓冲区；预分配但未读满（连接中断）时返回 None"""
+        if self.preallocated:
+            if self._buf is None or self.received < self.content_length:
+                return None
+            return SharedImageBuffer(self._buf)
+        if len(self._chunks) == 1:
+            return SharedImageBuffer(self._chunks[0])
+        return SharedImageBuffer(b''.join(self._chunks))
+
+# 全局图片句柄登记表实例
+image_handles = ImageHandleRegistry()
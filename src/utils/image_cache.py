@@ -2,83 +2,178 @@
 图片内存缓存 - 避免重复下载
 """
 
-from collections import OrderedDict
-import hashlib
-import time
+import atexit
+import os
+import threading
+
+from src.utils.eviction import make_policy, shard_of
+
+
+class _Shard:
+    """缓存分片 - 独立的锁、淘汰策略与字节计数"""
+    __slots__ = ('lock', 'entries', 'policy', 'bytes', 'max_bytes', 'hits', 'misses', 'evictions')
+
+    def __init__(self, max_bytes, policy):
+        self.lock = threading.Lock()
+        self.entries = {}  # 图片键 -> (data, size)
+        self.policy = make_policy(policy, max_bytes)
+        self.bytes = 0
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
 
 class ImageMemoryCache:
-    """图片字节缓存管理器 - 基于LRU和字节数限制"""
-    
-    def __init__(self, max_size_mb=50):
+    """图片字节缓存管理器 - 可替换的淘汰策略 + 字节数限制
+
+    - 所有 ImageLoadTask 工作线程并发读写：按键哈希分片，每个分片一把锁，
+      淘汰策略的调整、淘汰与字节计数都在分片锁内完成
+    - 键为规范化图片键（图片 ID + 尺寸段），不再对 URL 做 md5
+    - 每个分片各占总配额的 1/shards，策略为分片内近似；单个数据超过总配额一半时不缓存
+      （超过分片配额的单个数据由 LRU/GDSF 独占该分片，W-TinyLFU 的准入会拒绝它）
+    - 淘汰策略：lru（默认）/ gdsf / wtinylfu，可用 src.utils.cache_sim 回放访问记录比较
+    - 开启访问记录后，每次 get/set 写入一行 (时间, 图片键, 大小, 操作)
+    """
+
+    def __init__(self, max_size_mb=50, shards=4, policy='lru'):
         """
         初始化缓存
         max_size_mb: 最大缓存大小（MB）
+        shards: 分片数（降低多线程锁竞争）
+        policy: 淘汰策略名称（见 src.utils.eviction.POLICIES）
         """
-        self._cache = OrderedDict()  # URL -> (bytes, size, time)
         self._max_bytes = max_size_mb * 1024 * 1024  # 转换为字节
-        self._current_bytes = 0
-        self._hit_count = 0
-        self._miss_count = 0
-        
+        self.policy = policy
+        self._shards = [_Shard(self._max_bytes // shards, policy) for _ in range(shards)]
+        self._trace = None
+
+    def start_trace(self, path):
+        """开始记录访问（供 cache_sim 回放）"""
+        from src.utils.cache_sim import TraceRecorder
+        self.stop_trace()
+        self._trace = TraceRecorder(path)
+
+    def stop_trace(self):
+        trace, self._trace = self._trace, None
+        if trace is not None:
+            trace.close()
+
     def get_key(self, url):
-        """生成缓存键"""
-        return hashlib.md5(url.encode()).hexdigest()
-        
+        """生成缓存键（规范化图片键，与 wx1~wx4 等域名无关）"""
+        from src.utils.loaders import get_picture_key
+        return get_picture_key(url)
+
+    def _shard(self, key):
+        return self._shards[shard_of(key, len(self._shards))]
+
     def get(self, url):
         """获取缓存的图片数据"""
         key = self.get_key(url)
-        
-        if key in self._cache:
-            # 移到末尾（LRU）
-            self._cache.move_to_end(key)
-            data, size, _ = self._cache[key]
-            self._hit_count += 1
-            return data
-        
-        self._miss_count += 1
-        return None
-        
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is not None:
+                shard.policy.on_access(key)
+                shard.hits += 1
+            else:
+                shard.misses += 1
+        trace = self._trace
+        if trace is not None:
+            trace.record(key, entry[1] if entry is not None else 0, 'get')
+        return entry[0] if entry is not None else None
+
+    def contains(self, url):
+        """是否已缓存（不调整淘汰顺序、不计入命中统计）"""
+        key = self.get_key(url)
+        shard = self._shard(key)
+        with shard.lock:
+            return key in shard.entries
+
     def set(self, url, data):
         """缓存图片数据"""
         key = self.get_key(url)
+        shard = self._shard(key)
         data_size = len(data)
-        
-        # 如果单个文件超过缓存限制的一半，不缓存
+
+        trace = self._trace
+        if trace is not None:
+            trace.record(key, data_size, 'set')
+
+        # 如果单个文件超过总配额的一半，不缓存
         if data_size > self._max_bytes // 2:
             return
-        
-        # 如果已存在，先移除旧的
-        if key in self._cache:
-            _, old_size, _ = self._cache[key]
-            self._current_bytes -= old_size
-            del self._cache[key]
-        
-        # 清理空间直到能容纳新数据
-        while self._current_bytes + data_size > self._max_bytes and self._cache:
-            # 删除最旧的（最前面的）
-            old_key, (_, old_size, _) = self._cache.popitem(last=False)
-            self._current_bytes -= old_size
-        
-        # 添加新数据
-        self._cache[key] = (data, data_size, time.time())
-        self._current_bytes += data_size
-        
+
+        with shard.lock:
+            # 如果已存在，先移除旧的
+            old = shard.entries.pop(key, None)
+            if old is not None:
+                shard.bytes -= old[1]
+                shard.policy.on_remove(key)
+
+            # 添加新数据，再删除策略选出的淘汰项（准入型策略可能拒绝新数据本身）
+            shard.entries[key] = (data, data_size)
+            shard.bytes += data_size
+            for victim in shard.policy.on_insert(key, data_size):
+                evicted = shard.entries.pop(victim, None)
+                if evicted is not None:
+                    shard.bytes -= evicted[1]
+                    shard.evictions += 1
+
+    def resize(self, max_size_mb):
+        """调整总配额（内存调控使用）；缩小时立即按淘汰策略释放，返回释放的字节数"""
+        self._max_bytes = int(max_size_mb * 1024 * 1024)
+        shard_max = self._max_bytes // len(self._shards)
+        freed = 0
+        for shard in self._shards:
+            with shard.lock:
+                shard.max_bytes = shard_max
+                for victim in shard.policy.resize(shard_max):
+                    evicted = shard.entries.pop(victim, None)
+                    if evicted is not None:
+                        shard.bytes -= evicted[1]
+                        shard.evictions += 1
+                        freed += evicted[1]
+        return freed
+
+    @property
+    def max_size_mb(self):
+        return self._max_bytes / 1024 / 1024
+
     def clear(self):
         """清空缓存"""
-        self._cache.clear()
-        self._current_bytes = 0
-        self._hit_count = 0
-        self._miss_count = 0
-    
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.policy.clear()
+                shard.bytes = 0
+                shard.hits = 0
+                shard.misses = 0
+                shard.evictions = 0
+
     def get_stats(self):
-        """获取缓存统计"""
+        """获取缓存统计（逐个分片加锁汇总）"""
+        size = count = hits = misses = evictions = 0
+        for shard in self._shards:
+            with shard.lock:
+                size += shard.bytes
+                count += len(shard.entries)
+                hits += shard.hits
+                misses += shard.misses
+                evictions += shard.evictions
         return {
-            'size_mb': self._current_bytes / 1024 / 1024,
-            'count': len(self._cache),
-            'hit_rate': self._hit_count / max(1, self._hit_count + self._miss_count),
-            'hits': self._hit_count,
-            'misses': self._miss_count
+            'size_mb': size / 1024 / 1024,
+            'count': count,
+            'hit_rate': hits / max(1, hits + misses),
+            'hits': hits,
+            'misses': misses,
+            'evictions': evictions,
+            'shards': len(self._shards),
+            'policy': self.policy
         }
 
-# 全局缓存实例
-image_cache = ImageMemoryCache()
\ No newline at end of file
+# 全局缓存实例（MOJI_CACHE_POLICY 选择淘汰策略，MOJI_CACHE_TRACE 指定访问记录文件）
+image_cache = ImageMemoryCache(policy=os.environ.get('MOJI_CACHE_POLICY', 'lru'))
+if os.environ.get('MOJI_CACHE_TRACE'):
+    image_cache.start_trace(os.environ['MOJI_CACHE_TRACE'])
+    atexit.register(image_cache.stop_trace)  # 关闭文件，写出缓冲区中的记录
@@ -0,0 +1,252 @@
+"""
+增量图片头解析 - 边下载边喂入字节，尽早得到格式/尺寸/是否动图
+支持 GIF / PNG(APNG) / JPEG(SOFn 扫描) / WebP，纯 Python，无需 Qt
+"""
+
+import struct
+
+# JPEG 帧起始标记（SOF0-SOF15，排除 DHT/JPG/DAC）
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class ImageHeaderSniffer:
+    """增量图片头解析器
+
+    - feed() 接收下载到的分块，内部用游标推进，已解析的字节在每次 feed 结束时丢弃；
+      需要跳过的大段（如 JPEG 的 EXIF、GIF 的图像数据）不会被缓存
+    - 尺寸一旦可知 size_known 即为 True；complete 表示不再需要更多数据
+    - GIF 会继续解析到第二帧（判定动图）或结尾，并记录首帧结束位置 first_frame_end
+    """
+
+    def __init__(self):
+        self.format = None           # 'gif' / 'png' / 'jpeg' / 'webp' / 'unknown'
+        self.width = None
+        self.height = None
+        self.animated = None         # None 表示尚未确定
+        self.frame_count = 0         # GIF 已发现的帧数
+        self.first_frame_end = None  # GIF 首帧数据结束的绝对偏移
+        self.complete = False
+        self.bytes_fed = 0
+
+        self._data = bytearray()
+        self._pos = 0       # 当前解析游标（相对 _data）
+        self._offset = 0    # _data[0] 的绝对偏移
+        self._skip = 0      # 尚未到达、需要跳过的字节数
+        self._in_image = False
+        self._state = self._detect
+
+    @property
+    def size_known(self):
+        return self.width is not None and self.height is not None
+
+    def feed(self, chunk):
+        """喂入新下载的字节；返回当前是否已得到尺寸"""
+        if self.complete:
+            return self.size_known
+        self.bytes_fed += len(chunk)
+
+        view = memoryview(chunk)
+        if self._skip:
+            n = min(self._skip, len(view))
+            self._skip -= n
+            view = view[n:]
+        if len(view):
+            self._data += view
+
+        while not self.complete and not self._skip and self._state():
+            pass
+
+        # 丢弃已解析的字节
+        if self._pos:
+            del self._data[:self._pos]
+            self._offset += self._pos
+            self._pos = 0
+        return self.size_known
+
+    # --------- 内部辅助 ---------
+    def _avail(self):
+        return len(self._data) - self._pos
+
+    def _consume(self, n):
+        """前进 n 字节；超出已有数据的部分记为待跳过（_offset 直接指向跳过之后的位置）"""
+        avail = self._avail()
+        if n <= avail:
+            self._pos += n
+        else:
+            self._skip = n - avail
+            self._offset += len(self._data) + self._skip
+            self._data.clear()
+            self._pos = 0
+
+    def _tell(self):
+        """当前游标的绝对偏移"""
+        return self._offset + self._pos
+
+    def _finish(self, animated=None):
+        if animated is not None:
+            self.animated = animated
+        self.complete = True
+        return False
+
+    # --------- 格式识别 ---------
+    def _detect(self):
+        if self._avail() < 12:
+            return False
+        d, p = self._data, self._pos
+        head = bytes(d[p:p + 12])
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            self.format = 'gif'
+            self._state = self._gif_header
+        elif head[:8] == b'\x89PNG\r\n\x1a\n':
+            self.format = 'png'
+            self._state = self._png_header
+        elif head[:2] == b'\xff\xd8':
+            self.format = 'jpeg'
+            self._consume(2)
+            self._state = self._jpeg_marker
+        elif head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            self.format = 'webp'
+            self._consume(12)
+            self._state = self._webp_chunk
+        else:
+            self.format = 'unknown'
+            return self._finish()
+        return True
+
+    # --------- GIF ---------
+    def _gif_header(self):
+        if self._avail() < 13:
+            return False
+        d, p = self._data, self._pos
+        self.width, self.height = struct.unpack_from('<HH', d, p + 6)
+        flags = d[p + 10]
+        gct = 3 * (2 << (flags & 0x07)) if flags & 0x80 else 0
+        self._consume(13 + gct)
+        self._state = self._gif_block
+        return True
+
+    def _gif_block(self):
+        if self._avail() < 1:
+            return False
+        d, p = self._data, self._pos
+        block = d[p]
+        if block == 0x21:  # 扩展块：标签后接数据子块
+            if self._avail() < 2:
+                return False
+            self._consume(2)
+            self._in_image = False
+            self._state = self._gif_subblocks
+        elif block == 0x2C:  # 图像描述符
+            if self._avail() < 10:
+                return False
+            self.frame_count += 1
+            if self.frame_count >= 2:
+                return self._finish(animated=True)
+            flags = d[p + 9]
+            lct = 3 * (2 << (flags & 0x07)) if flags & 0x80 else 0
+            self._consume(10 + lct + 1)  # + LZW 最小码长
+            self._in_image = True
+            self._state = self._gif_subblocks
+        else:  # 0x3B 结尾，或无法识别的块
+            return self._finish(animated=self.frame_count > 1)
+        return True
+
+    def _gif_subblocks(self):
+        if self._avail() < 1:
+            return False
+        size = self._data[self._pos]
+        if size == 0:
+            self._consume(1)
+            if self._in_image:
+                self._in_image = False
+                if self.first_frame_end is None:
+                    self.first_frame_end = self._tell()
+            self._state = self._gif_block
+            return True
+        self._consume(1 + size)
+        return True
+
+    # --------- PNG / APNG ---------
+    def _png_header(self):
+        if self._avail() < 24:
+            return False
+        d, p = self._data, self._pos
+        if bytes(d[p + 12:p + 16]) != b'IHDR':
+            self.format = 'unknown'
+            return self._finish()
+        self.width, self.height = struct.unpack_from('>II', d, p + 16)
+        self._consume(8)
+        self._state = self._png_chunk
+        return True
+
+    def _png_chunk(self):
+        # acTL 出现在首个 IDAT 之前即为 APNG
+        if self._avail() < 8:
+            return False
+        d, p = self._data, self._pos
+        length, = struct.unpack_from('>I', d, p)
+        ctype = bytes(d[p + 4:p + 8])
+        if ctype == b'acTL':
+            return self._finish(animated=True)
+        if ctype in (b'IDAT', b'IEND'):
+            return self._finish(animated=False)
+        self._consume(12 + length)
+        return True
+
+    # --------- JPEG ---------
+    def _jpeg_marker(self):
+        d = self._data
+        # 跳过标记前的填充字节 0xFF
+        while self._avail() >= 2 and d[self._pos] == 0xFF and d[self._pos + 1] == 0xFF:
+            self._pos += 1
+        if self._avail() < 2:
+            return False
+        p = self._pos
+        if d[p] != 0xFF:
+            return self._finish()
+        marker = d[p + 1]
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:  # 无长度的独立标记
+            self._consume(2)
+            return True
+        if marker in (0xD9, 0xDA):  # 在 SOF 之前遇到 EOI/SOS，放弃
+            return self._finish()
+        if self._avail() < 4:
+            return False
+        if marker in _JPEG_SOF:
+            if self._avail() < 9:
+                return False
+            self.height, self.width = struct.unpack_from('>HH', d, p + 5)
+            return self._finish(animated=False)
+        length, = struct.unpack_from('>H', d, p + 2)
+        self._consume(2 + length)
+        return True
+
+    # --------- WebP ---------
+    def _webp_chunk(self):
+        if self._avail() < 8:
+            return False
+        d, p = self._data, self._pos
+        fourcc = bytes(d[p:p + 4])
+        size, = struct.unpack_from('<I', d, p + 4)
+        if fourcc == b'VP8X':
+            if self._avail() < 18:
+                return False
+            flags = d[p + 8]
+            self.width = 1 + int.from_bytes(d[p + 12:p + 15], 'little')
+            self.height = 1 + int.from_bytes(d[p + 15:p + 18], 'little')
+            return self._finish(animated=bool(flags & 0x02))
+        if fourcc == b'VP8 ':
+            if self._avail() < 18:
+                return False
+            w, h = struct.unpack_from('<HH', d, p + 14)
+            self.width, self.height = w & 0x3FFF, h & 0x3FFF
+            return self._finish(animated=False)
+        if fourcc == b'VP8L':
+            if self._avail() < 13:
+                return False
+            bits, = struct.unpack_from('<I', d, p + 9)
+            self.width = (bits & 0x3FFF) + 1
+            self.height = ((bits >> 14) & 0x3FFF) + 1
+            return self._finish(animated=False)
+        self._consume(8 + size + (size & 1))
+        return True
@@ -0,0 +1,205 @@
+"""
+图片探测 - 下载大尺寸图片前先用 Range 请求读取头部，决定跳过 / 改用小尺寸 / 完整下载
+"""
+
+from collections import OrderedDict
+import re
+import threading
+from urllib.parse import urlsplit
+
+from src.utils.image_header import ImageHeaderSniffer
+
+# 与 API / 线程池侧阈值保持一致
+MAX_PIXELS = 24_000_000
+MAX_DIM = 12000
+
+# 需要探测的尺寸段（宽度不受限或较大）及超限时改用的小一档尺寸段
+PROBE_VARIANTS = ('large', 'mw1024')
+SMALLER_VARIANT = {'large': '/mw1024/', 'mw1024': '/mw690/'}
+# 原图尺寸在结果中的键（与尺寸段名不会冲突）
+ORIGINAL = '#original'
+
+_CONTENT_RANGE = re.compile(r'bytes\s+\d+-\d+/(\d+)')
+
+
+class ImageProbe:
+    """图片探测器 - 结果按图片 ID 缓存，同一图片同一尺寸段只探测一次
+
+    - 读取 Content-Length（或 206 响应的 Content-Range 总长），并用 Range: bytes=0-N
+      取回头部交给 ImageHeaderSniffer 解析尺寸与是否动图
+    - CDN 忽略 Range（返回 200）时读满 N 字节即断开，并记住该域名不支持 Range，之后不再向其探测
+    - API 已给出原图尺寸的图片可通过 remember_original() 按图片 ID 登记，
+      各尺寸段据此判断是否还需探测
+    - check() 在工作线程中调用，内部加锁
+    """
+
+    def __init__(self, probe_bytes=16 * 1024, max_bytes=8 * 1024 * 1024, max_entries=5000):
+        self.enabled = True
+        self.probe_bytes = probe_bytes
+        self.max_bytes = max_bytes  # 超过该字节数改用小一档尺寸
+        self._max_entries = max_entries
+        self._results = OrderedDict()  # 图片 ID -> {尺寸段: 探测结果}
+        self._range_hosts = {}         # 域名 -> 是否支持 Range
+        self._lock = threading.Lock()
+        self._probe_count = 0
+        self._skip_count = 0
+        self._smaller_count = 0
+        self._probe_bytes_total = 0
+
+    @staticmethod
+    def _split(url):
+        from src.utils.loaders import get_picture_key
+        pid, _, variant = get_picture_key(url).partition(':')
+        return pid, variant
+
+    def get(self, url):
+        """获取已缓存的探测结果（该尺寸段），没有则返回 None"""
+        pid, variant = self._split(url)
+        with self._lock:
+            entry = self._results.get(pid)
+            return dict(entry[variant]) if entry and variant in entry else None
+
+    def remember_original(self, url, width, height):
+        """登记 API 返回的原图尺寸（按图片 ID，与 URL 携带的尺寸段无关）"""
+        pid, _variant = self._split(url)
+        self._store(pid, ORIGINAL, {'width': width, 'height': height})
+
+    def _store(self, pid, variant, info):
+        with self._lock:
+            entry = self._results.pop(pid, None) or {}
+            entry[variant] = info
+            self._results[pid] = entry
+            while len(self._results) > self._max_entries:
+                self._results.popitem(last=False)
+
+    def should_check(self, url):
+        """是否需要经过 check()：仅大尺寸段；已知原图尺寸未超限时无需检查
+        （已有探测结果时仍需检查，由 check() 复用缓存结果而不再发起请求）
+        原图尺寸优先取 API 登记的值，其次取 large 尺寸段的探测结果"""
+        if not self.enabled:
+            return False
+        pid, variant = self._split(url)
+        if variant not in PROBE_VARIANTS:
+            return False
+        with self._lock:
+            entry = self._results.get(pid) or {}
+            if variant in entry:
+                return True
+            original = entry.get(ORIGINAL) or entry.get('large')
+        # 原图尺寸已知且未超限：各尺寸段同样不会超限
+        if original and original.get('width') and original.get('height'):
+            return is_oversize(original['width'], original['height'])
+        return True
+
+    def check(self, url):
+        """给出决定：('skip' | 'smaller' | 'full', 实际下载 URL)
+        优先使用缓存的探测结果；域名已知不支持 Range 时不再发起探测（由下载时的头部解析兜底）；
+        探测失败时按完整下载处理"""
+        info = self.get(url)
+        if info is None and self.supports_range(url) is not False:
+            info = self.probe(url)
+        if info is None:
+            return 'full', url
+
+        pid, variant = self._split(url)
+        too_large = is_oversize(info.get('width'), info.get('height'))
+        too_heavy = bool(info.get('size')) and info['size'] > self.max_bytes
+        if not (too_large or too_heavy):
+            return 'full', url
+
+        smaller = SMALLER_VARIANT.get(variant)
+        if smaller:
+            from src.utils.loaders import _replace_size_segment
+            with self._lock:
+                self._smaller_count += 1
+            return 'smaller', _replace_size_segment(url, smaller)
+        with self._lock:
+            self._skip_count += 1
+        return 'skip', url
+
+    def probe(self, url):
+        """发起 Range 请求读取头部（工作线程调用）；失败返回 None"""
+        from src.utils.network import NetworkManager
+        from src.utils.bandwidth import bandwidth_budget
+        from src.utils.net_timing import net_timing
+        from src.core.api import WeiboAPI
+
+        headers = dict(WeiboAPI.HEADERS)
+        headers['Range'] = f'bytes=0-{self.probe_bytes - 1}'
+        host = urlsplit(url).hostname or ''
+        response = None
+        received = 0
+        try:
+            session = NetworkManager.get_session()
+            response = session.get(url, headers=headers, timeout=(2, 3), stream=True)
+            if response.status_code == 206:
+                match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+                size = int(match.group(1)) if match else None
+            elif response.status_code == 200:
+                size = int(response.headers.get('Content-Length') or 0) or None
+            else:
+                return None
+
+            # 读到尺寸可知或达到探测字节数为止
+            sniffer = ImageHeaderSniffer()
+            for chunk in response.iter_content(chunk_size=4096):
+                if not chunk:
+                    continue
+                received += len(chunk)
+                sniffer.feed(chunk)
+                if sniffer.complete or received >= self.probe_bytes:
+                    break
+            bandwidth_budget.record(received)
+        except Exception:
+            return None
+        finally:
+            if response is not None:
+                net_timing.finish(response, received)
+                response.close()
+
+        info = {
+            'size': size,
+            'width': sniffer.width,
+            'height': sniffer.height,
+            'animated': sniffer.animated,
+            'format': sniffer.format,
+            'range': response.status_code == 206,
+        }
+        pid, variant = self._split(url)
+        self._store(pid, variant, info)
+        with self._lock:
+            self._range_hosts[host] = info['range']
+            self._probe_count += 1
+            self._probe_bytes_total += received
+        return dict(info)
+
+    def supports_range(self, url):
+        """该域名是否支持 Range（未探测过返回 None）"""
+        with self._lock:
+            return self._range_hosts.get(urlsplit(url).hostname or '')
+
+    def get_stats(self):
+        """获取统计"""
+        with self._lock:
+            return {
+                'entries': len(self._results),
+                'probes': self._probe_count,
+                'probe_kb': self._probe_bytes_total / 1024,
+                'skipped': self._skip_count,
+                'smaller': self._smaller_count,
+                'range_hosts': dict(self._range_hosts)
+            }
+
+
+def is_oversize(width, height):
+    """尺寸是否超限（未知尺寸视为未超限）"""
+    try:
+        if width and height:
+            w, h = int(width), int(height)
+            return w * h > MAX_PIXELS or max(w, h) > MAX_DIM
+    except (TypeError, ValueError):
+        return False
+    return False
+
+# 全局探测器实例
+image_probe = ImageProbe()
@@ -1,10 +1,9 @@
 """
-异步图片加载器
+图片 URL 工具 - 尺寸段选择、规范化图片键（加载由 ImageThreadPool 完成）
 """
 
-import requests
-from PyQt6.QtCore import QThread, pyqtSignal
-from src.core.api import WeiboAPI
+from functools import lru_cache
+from urllib.parse import urlsplit
 
 
 # --- Weibo CDN size helpers -------------------------------------------------
@@ -40,6 +39,26 @@ def get_display_url(url: str) -> str:
         return url_b
     return _replace_size_segment(url, '/orj360/')
 
+# 网格缩略图候选（按宽度上限从小到大；thumb150 为方形裁切，仅省流模式使用）
+GRID_VARIANTS = ((360, '/orj360/'), (440, '/bmiddle/'), (690, '/mw690/'))
+
+# 悬停预览候选：在网格候选基础上允许 mw1024
+PREVIEW_VARIANTS = GRID_VARIANTS + ((1024, '/mw1024/'),)
+
+def _pick_variant(url: str, need: float, variants) -> str:
+    for limit, seg in variants:
+        if need <= limit:
+            return _replace_size_segment(url, seg)
+    return _replace_size_segment(url, variants[-1][1])
+
+def get_grid_url(url: str, side_px: int, dpr: float = 1.0) -> str:
+    """网格缩略图 URL：按卡片解码边长 × 设备像素比选择够用的最小尺寸段。"""
+    return _pick_variant(url, side_px * max(1.0, dpr), GRID_VARIANTS)
+
+def get_preview_url(url: str, side_px: int, dpr: float = 1.0) -> str:
+    """悬停预览 URL：按预览最长边 × 设备像素比选择够用的最小尺寸段（最大 mw1024）。"""
+    return _pick_variant(url, side_px * max(1.0, dpr), PREVIEW_VARIANTS)
+
 def get_copy_url(url: str) -> str:
     """复制用的 URL：使用 mw1024（质量和体积的折中），避免动辄 4K+ 的 large。"""
     return _replace_size_segment(url, '/mw1024/')
@@ -47,91 +66,31 @@ def get_copy_url(url: str) -> str:
 def get_original_url(url: str) -> str:
     return _replace_size_segment(url, '/large/')
 
+def get_thumb_url(url: str) -> str:
+    """省流模式用的缩略图 URL：thumb150（方形裁切，体积最小）。"""
+    return _replace_size_segment(url, '/thumb150/')
+
+def is_gif_url(url: str) -> bool:
+    """根据扩展名判断是否为 GIF（微博图片 URL 均带扩展名）"""
+    path = url.split('?', 1)[0]
+    return path.lower().endswith('.gif')
+
+@lru_cache(maxsize=4096)
+def get_picture_key(url: str) -> str:
+    """规范化缓存键：图片 ID + 尺寸段（如 '006xyz:orj360'），与 wx1~wx4 等域名无关。
+    无法识别为微博图片路径时返回原 URL。结果带缓存（各级缓存每次读写都会调用）。"""
+    parts = [p for p in urlsplit(url).path.split('/') if p]
+    if len(parts) >= 2:
+        pid = parts[-1].rsplit('.', 1)[0]
+        if pid:
+            return f"{pid}:{parts[-2]}"
+    return url
+
+def get_picture_id(url: str) -> str:
+    """图片 ID（与尺寸段、域名无关）"""
+    return get_picture_key(url).split(':', 1)[0]
+
 # 兼容旧接口名：get_large_url 返回原图 large
 
 def get_large_url(url: str) -> str:
     return get_original_url(url)
-
-
-class ImageLoader(QThread):
-    """异步图片加载器 - 支持优雅停止"""
-    image_loaded = pyqtSignal(int, bytes)
-    error_occurred = pyqtSignal(str)
-
-    def __init__(self, url, index):
-        super().__init__()
-        self.url = url
-        self.index = index
-        self._stop_requested = False  # 新增：停止标记
-    
-    def request_stop(self):
-        """请求停止线程"""
-        self._stop_requested = True
-        self.requestInterruption()  # Qt的中断请求
-
-    def run(self):
-        try:
-            # 使用更短的超时，支持快速响应中断
-            for attempt in range(3):  # 最多重试3次
-                if self._stop_requested or self.isInterruptionRequested():
-                    return
-                    
-                try:
-                    response = requests.get(
-                        get_display_url(self.url),
-                        headers=WeiboAPI.HEADERS,
-                        timeout=1.5,  # 缩短到1.5秒
-                        stream=True
-                    )
-                    break
-                except requests.exceptions.Timeout:
-                    if attempt == 2:  # 最后一次尝试
-                        raise
-                    continue
-                    
-            if self._stop_requested or self.isInterruptionRequested():
-                return
-                
-            # 分块读取，支持中断
-            chunks = []
-            for chunk in response.iter_content(chunk_size=8192):
-                if self._stop_requested or self.isInterruptionRequested():
-                    response.close()
-                    return
-                if chunk:
-                    chunks.append(chunk)
-                    
-            if response.status_code == 200:
-                data = b''.join(chunks)
-                if not self._stop_requested:
-                    self.image_loaded.emit(self.index, data)
-            else:
-                if not self._stop_requested:
-                    self.error_occurred.emit(f"图片加载失败: {response.status_code}")
-        except requests.exceptions.Timeout:
-            if not self._stop_requested:
-                self.error_occurred.emit("图片加载超时")
-        except requests.exceptions.ConnectionError:
-            if not self._stop_requested:
-                self.error_occurred.emit("网络连接失败")
-        except Exception:
-            pass  # 静默处理其他异常
-
-
-class CopyLoader(QThread):
-    """后台下载用于复制的图片"""
-    done = pyqtSignal(bytes, str)  # data, error
-
-    def __init__(self, url: str):
-        super().__init__()
-        self.url = url
-
-    def run(self):
-        try:
-            r = requests.get(get_copy_url(self.url), headers=WeiboAPI.HEADERS, timeout=10)
-            if r.status_code == 200:
-                self.done.emit(r.content, "")
-            else:
-                self.done.emit(b"", f"状态码: {r.status_code}")
-        except Exception as e:
-            self.done.emit(b"", str(e))
\ No newline at end of file
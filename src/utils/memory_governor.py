@@ -0,0 +1,185 @@
+"""
+内存预算调控 - 统计卡片动画、解码帧与缓存字节的总占用，超出预算时按代价从低到高释放
+"""
+
+import os
+import time
+
+from PyQt6.QtCore import QObject, QTimer
+
+from src.utils.image_cache import image_cache
+from src.utils.image_buffer import image_handles
+from src.utils.derivatives import derivative_store
+from src.utils.preview_cache import preview_cache
+from src.utils.progressive import partial_store
+
+# 默认预算（MB），可用环境变量 MOJI_MEMORY_BUDGET_MB 覆盖
+DEFAULT_BUDGET_MB = 256
+# 检查间隔（毫秒）
+CHECK_MS = 2000
+# 系统可用内存低于总内存的该比例时视为内存紧张，有效预算减半
+PRESSURE_RATIO = 0.10
+# 占用回落到有效预算的该比例以下时恢复被压缩的缓存配额
+RESTORE_RATIO = 0.6
+# 压缩内存缓存时的下限（MB）
+MIN_CACHE_MB = 8
+
+
+def read_meminfo(path='/proc/meminfo'):
+    """读取 (MemAvailable, MemTotal) 字节数；非 Linux 或读取失败时返回 None"""
+    values = {}
+    try:
+        with open(path, encoding='ascii') as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in ('MemAvailable', 'MemTotal'):
+                    values[name] = int(rest.split()[0]) * 1024  # kB
+                    if len(values) == 2:
+                        break
+    except (OSError, ValueError, IndexError):
+        return None
+    if 'MemAvailable' not in values or not values.get('MemTotal'):
+        return None
+    return values['MemAvailable'], values['MemTotal']
+
+
+class MemoryGovernor(QObject):
+    """内存预算调控器（仅 UI 线程使用）
+
+    - 统计三类占用：movies（卡片 QMovie 已解码帧）、frames（卡片首帧、预览帧、衍生图）、
+      bytes（原始图片字节：共享句柄、内存缓存、部分下载）；共享句柄与内存缓存持有同一份数据，取较大者
+    - 超出预算时按顺序释放，每步之后重新统计，回到预算内即停止：
+      1. 离屏卡片的动画（保留首帧与原始数据，悬停时重建）+ 超出上限的空闲卡片
+      2. 解码帧：其余未在播放的动画、预览缓存、内存衍生图（均可由原始字节重新解码）
+      3. 缓存字节：按超出量压缩内存缓存配额、清空部分下载（需重新下载）
+    - 每 CHECK_MS 读取一次 /proc/meminfo，系统内存紧张时有效预算减半
+    - 占用回落后恢复内存缓存的原始配额
+    """
+
+    def __init__(self, budget_mb=None, parent=None):
+        super().__init__(parent)
+        if budget_mb is None:
+            budget_mb = float(os.environ.get('MOJI_MEMORY_BUDGET_MB', DEFAULT_BUDGET_MB))
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._widgets = {}
+        self._virtual_manager = None
+        self._cache_mb = image_cache.max_size_mb  # 内存缓存的原始配额
+        self._under_pressure = False
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(CHECK_MS)
+        self._timer.timeout.connect(self.check)
+
+        # 统计
+        self._check_count = 0
+        self._shed_count = {'movies': 0, 'frames': 0, 'bytes': 0}
+        self._freed_bytes = 0
+        self._pressure_count = 0
+        self._last_usage = {}
+        self._last_check_ms = 0.0
+
+    def watch(self, widgets, virtual_manager=None):
+        """关联活动卡片字典 {index: EmojiWidget} 与虚拟滚动管理器，并开始定时检查"""
+        self._widgets = widgets
+        self._virtual_manager = virtual_manager
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def effective_budget(self):
+        return self.budget // 2 if self._under_pressure else self.budget
+
+    def usage(self):
+        """当前各类占用（字节）"""
+        movies = 0
+        frames = 0
+        for widget in list(self._widgets.values()):
+            movies += widget.movie_bytes()
+            frames += widget.pixmap_bytes()
+        preview = preview_cache.get_stats()['size_mb']
+        derived = derivative_store.get_stats()['size_mb']
+        frames += int((preview + derived) * 1024 * 1024)
+        handles = image_handles.get_stats()
+        cached = image_cache.get_stats()['size_mb']
+        partial = partial_store.get_stats()['size_mb']
+        shared = max(handles['live_mb'], cached) + handles['qt_copies_mb'] + partial
+        return {'movies': movies, 'frames': frames, 'bytes': int(shared * 1024 * 1024)}
+
+    def _check_pressure(self):
+        meminfo = read_meminfo()
+        pressure = meminfo is not None and meminfo[0] < meminfo[1] * PRESSURE_RATIO
+        if pressure and not self._under_pressure:
+            self._pressure_count += 1
+        self._under_pressure = pressure
+
+    def check(self):
+        """检查一次占用，超出预算时按顺序释放"""
+        started = time.perf_counter()
+        self._check_count += 1
+        self._check_pressure()
+        budget = self.effective_budget()
+        usage = self.usage()
+        total = sum(usage.values())
+
+        for stage, shed in (('movies', self._shed_offscreen_movies),
+                            ('frames', self._shed_decoded_frames),
+                            ('bytes', self._shed_cached_bytes)):
+            if total <= budget:
+                break
+            shed(total - budget)
+            self._shed_count[stage] += 1
+            before = total
+            usage = self.usage()
+            total = sum(usage.values())
+            self._freed_bytes += max(0, before - total)
+
+        if total < budget * RESTORE_RATIO and image_cache.max_size_mb < self._cache_mb:
+            image_cache.resize(self._cache_mb)
+
+        self._last_usage = usage
+        self._last_check_ms = (time.perf_counter() - started) * 1000
+
+    def _shed_offscreen_movies(self, excess):
+        """释放离屏卡片的动画，裁剪空闲卡片池"""
+        for widget in list(self._widgets.values()):
+            if widget.movie is not None and widget.visibleRegion().isEmpty():
+                widget.release_movie()
+        if self._virtual_manager is not None:
+            self._virtual_manager.trim_pool()
+
+    def _shed_decoded_frames(self, excess):
+        """释放可由原始字节重新解码的帧"""
+        from src.ui.widgets import GifPlaybackManager  # 延迟导入，避免 utils 依赖 UI 模块
+        playing = GifPlaybackManager().playing_widgets
+        for widget in list(self._widgets.values()):
+            if widget.movie is not None and widget not in playing:
+                widget.release_movie()
+        freed = preview_cache.trim(0)
+        if freed < excess:
+            derived = derivative_store.get_stats()['size_mb'] * 1024 * 1024
+            derivative_store.trim(max(0, int(derived - (excess - freed))))
+
+    def _shed_cached_bytes(self, excess):
+        """压缩内存缓存配额并丢弃部分下载"""
+        partial_store.trim(0)
+        current_mb = image_cache.get_stats()['size_mb']
+        target_mb = max(MIN_CACHE_MB, current_mb - excess / 1024 / 1024)
+        if target_mb < image_cache.max_size_mb:
+            image_cache.resize(target_mb)
+
+    def get_stats(self):
+        """获取统计"""
+        usage = self._last_usage
+        return {
+            'budget_mb': self.effective_budget() / 1024 / 1024,
+            'under_pressure': self._under_pressure,
+            'pressure_events': self._pressure_count,
+            'usage_mb': {k: v / 1024 / 1024 for k, v in usage.items()},
+            'total_mb': sum(usage.values()) / 1024 / 1024,
+            'cache_limit_mb': image_cache.max_size_mb,
+            'checks': self._check_count,
+            'last_check_ms': self._last_check_ms,
+            'shed': dict(self._shed_count),
+            'freed_mb': self._freed_bytes / 1024 / 1024
+        }
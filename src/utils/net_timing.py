@@ -0,0 +1,240 @@
+"""
+网络请求耗时分解 - DNS / 连接 / TLS / 首字节 / 传输
+用于区分“CDN 慢”、“DNS 慢”还是“连接频繁重建”
+"""
+
+import socket
+import threading
+import time
+from collections import deque, defaultdict
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# 当前线程正在发送的请求的连接阶段耗时（每个线程同一时刻只有一个请求）
+_local = threading.local()
+
+
+def _current_phases():
+    return getattr(_local, 'phases', None)
+
+
+class _TimedConnectionMixin:
+    """记录新建连接时的 DNS 与 TCP 连接耗时"""
+
+    def _new_conn(self):
+        phases = _current_phases()
+        if phases is None:
+            return super()._new_conn()
+
+        # 明确标记本次尝试新建了连接（DNS 失败等未记录到连接阶段的情况也不算复用）
+        phases['new_connection'] = True
+        host = self._dns_host
+        t0 = time.perf_counter()
+        try:
+            infos = socket.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+        except OSError:
+            # 解析失败交给 urllib3 抛出标准异常
+            return super()._new_conn()
+        t1 = time.perf_counter()
+        phases['dns'] = t1 - t0
+
+        # 逐个尝试解析出的地址（与 urllib3 行为一致），避免重复 DNS 解析
+        sock = None
+        last_error = OSError(f"getaddrinfo returned no addresses for {host}")
+        try:
+            for addr in dict.fromkeys(info[4][0] for info in infos):
+                self._dns_host = addr
+                try:
+                    sock = super()._new_conn()
+                    break
+                except Exception as e:
+                    last_error = e
+        finally:
+            self._dns_host = host
+        if sock is None:
+            raise last_error
+
+        phases['connect'] = time.perf_counter() - t1
+        return sock
+
+
+class TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    """额外记录 TLS 握手耗时"""
+
+    def connect(self):
+        phases = _current_phases()
+        t0 = time.perf_counter()
+        super().connect()
+        if phases is not None:
+            elapsed = time.perf_counter() - t0
+            phases['tls'] = max(0.0, elapsed - phases.get('dns', 0.0) - phases.get('connect', 0.0))
+
+
+class _TimedPoolMixin:
+    """urllib3 重试时每次尝试都会调用 _make_request：清空上一次尝试的阶段耗时，只保留尝试次数"""
+
+    def _make_request(self, *args, **kwargs):
+        phases = _current_phases()
+        if phases is not None:
+            attempts = phases.get('attempts', 0) + 1
+            phases.clear()
+            phases['attempts'] = attempts
+        return super()._make_request(*args, **kwargs)
+
+
+class _TimedHTTPConnectionPool(_TimedPoolMixin, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(_TimedPoolMixin, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """带耗时分解的 HTTPAdapter
+
+    响应头到达时记录连接阶段与首字节时间，挂在 response 上；
+    调用方读完响应体后调用 net_timing.finish(response, nbytes) 补齐传输耗时并入队。
+    重定向的每一跳都各自经过 send，finish 时一并补齐 response.history 中各跳的记录。
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        phases = {}
+        _local.phases = phases
+        start = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception as e:
+            record = net_timing.build_record(request.url, phases, start, time.perf_counter())
+            record['error'] = type(e).__name__
+            net_timing.add(record)
+            raise
+        finally:
+            _local.phases = None
+
+        record = net_timing.build_record(request.url, phases, start, time.perf_counter())
+        record['status'] = response.status_code
+        response._moji_timing = record
+        return response
+
+
+class NetworkTimingRecorder:
+    """请求耗时记录器 - 有界环形缓冲区（线程安全）"""
+
+    def __init__(self, max_records=500):
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def build_record(self, url, phases, start, headers_at):
+        """根据连接阶段生成一条记录（传输阶段待 finish 补齐）"""
+        dns = phases.get('dns', 0.0)
+        connect = phases.get('connect', 0.0)
+        tls = phases.get('tls', 0.0)
+        return {
+            'host': urlsplit(url).hostname or '',
+            'url': url,
+            'time': time.time(),
+            'dns': dns,
+            'connect': connect,
+            'tls': tls,
+            'ttfb': max(0.0, headers_at - start - dns - connect - tls),
+            'transfer': 0.0,
+            'bytes': 0,
+            # 未经过计时连接池（如代理）时无法判断，记为 None
+            'reused': None if not phases.get('attempts') else not phases.get('new_connection'),
+            'attempts': phases.get('attempts', 0),
+            'status': None,
+            'error': None,
+            '_start': start,
+            '_headers_at': headers_at,
+        }
+
+    def add(self, record):
+        record.pop('_start', None)
+        record.pop('_headers_at', None)
+        with self._lock:
+            self._records.append(record)
+
+    def finish(self, response, nbytes=None, error=None):
+        """响应体读取结束（或中止）：补齐传输耗时与字节数并入队；重复调用无副作用
+
+        重定向经过的各跳（response.history）一并入队：其响应体已由 requests 在跳转前读完，
+        传输结束时间取下一跳请求的开始时间
+        """
+        chain = list(getattr(response, 'history', None) or ()) + [response]
+        for hop, next_hop in zip(chain, chain[1:]):
+            next_record = getattr(next_hop, '_moji_timing', None)
+            self._finish_one(hop, None, None, next_record['_start'] if next_record else None)
+        self._finish_one(response, nbytes, error, None)
+
+    def _finish_one(self, response, nbytes, error, ended_at):
+        record = getattr(response, '_moji_timing', None)
+        if record is None:
+            return
+        response._moji_timing = None
+        if ended_at is None:
+            ended_at = time.perf_counter()
+        record['transfer'] = max(0.0, ended_at - record['_headers_at'])
+        if nbytes is None:
+            try:
+                nbytes = len(response.content)
+            except Exception:
+                nbytes = 0
+        record['bytes'] = nbytes
+        if error:
+            record['error'] = error
+        self.add(record)
+
+    def get_records(self, host=None):
+        """获取记录快照（可按 host 过滤）"""
+        with self._lock:
+            records = list(self._records)
+        if host:
+            records = [r for r in records if r['host'] == host]
+        return records
+
+    def get_summary(self):
+        """按 host 汇总平均耗时（毫秒）与连接复用率"""
+        groups = defaultdict(list)
+        for r in self.get_records():
+            groups[r['host']].append(r)
+
+        summary = {}
+        for host, records in groups.items():
+            n = len(records)
+            known = [r for r in records if r['reused'] is not None]
+            new_conns = [r for r in known if not r['reused']]
+            summary[host] = {
+                'count': n,
+                'errors': sum(1 for r in records if r['error']),
+                'reuse_rate': 1 - len(new_conns) / len(known) if known else None,
+                'retries': sum(max(0, r['attempts'] - 1) for r in records),
+                'dns_ms': 1000 * sum(r['dns'] for r in new_conns) / max(1, len(new_conns)),
+                'connect_ms': 1000 * sum(r['connect'] for r in new_conns) / max(1, len(new_conns)),
+                'tls_ms': 1000 * sum(r['tls'] for r in new_conns) / max(1, len(new_conns)),
+                'ttfb_ms': 1000 * sum(r['ttfb'] for r in records) / n,
+                'transfer_ms': 1000 * sum(r['transfer'] for r in records) / n,
+                'bytes': sum(r['bytes'] for r in records),
+            }
+        return summary
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+# 全局耗时记录实例
+net_timing = NetworkTimingRecorder()
@@ -3,8 +3,8 @@
 """
 import threading
 import requests
-from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from src.utils.net_timing import TimedHTTPAdapter
 
 class NetworkManager:
     """网络管理器 - 连接复用与重试策略"""
@@ -17,8 +17,8 @@ class NetworkManager:
         if not hasattr(cls._thread_local, 'session'):
             session = requests.Session()
             
-            # 配置连接池
-            adapter = HTTPAdapter(
+            # 配置连接池（带 DNS/连接/TLS/首字节 耗时记录）
+            adapter = TimedHTTPAdapter(
                 pool_connections=10,  # 连接池大小
                 pool_maxsize=10,      # 最大连接数
                 max_retries=Retry(
@@ -3,6 +3,7 @@
 """
 
 import os
+import sys
 
 def get_resource_path(filename):
     """获取资源文件的绝对路径"""
@@ -11,4 +12,12 @@ def get_resource_path(filename):
 
 def get_icon_path():
     """获取应用图标路径"""
-    return get_resource_path('icon.png')
\ No newline at end of file
+    return get_resource_path('icon.png')
+
+def get_cache_dir():
+    """获取用户缓存目录（macOS: ~/Library/Caches/Moji；其他：$XDG_CACHE_HOME/moji）"""
+    if sys.platform == "darwin":
+        base = os.path.expanduser('~/Library/Caches')
+        return os.path.join(base, 'Moji')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'moji')
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+感知哈希 - 在网格缩略图上计算 pHash（有 NumPy 时）或 dHash，合并同一搜索中重复上传的表情
+"""
+
+import atexit
+import os
+import threading
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage
+
+from src.utils.paths import get_cache_dir
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时退回纯 Python 的 dHash
+    np = None
+
+# 使用的算法与判定为重复的最大汉明距离（64 位哈希）
+ALGORITHM = 'phash' if np is not None else 'dhash'
+THRESHOLDS = {'phash': 8, 'dhash': 6}
+
+_PHASH_SIZE = 32
+_DCT = None  # 32x32 DCT-II 矩阵（首次使用时生成）
+
+
+def _gray_pixels(image, width, height):
+    """缩放为 width x height 灰度图，返回逐行像素字节（去掉行尾对齐）"""
+    gray = image.scaled(width, height, Qt.AspectRatioMode.IgnoreAspectRatio,
+                        Qt.TransformationMode.SmoothTransformation)
+    gray = gray.convertToFormat(QImage.Format.Format_Grayscale8)
+    bits = gray.constBits()
+    bits.setsize(gray.sizeInBytes())
+    raw = bits.asstring()
+    stride = gray.bytesPerLine()
+    return [raw[y * stride:y * stride + width] for y in range(height)]
+
+
+def dhash(image):
+    """差异哈希：9x8 灰度图中每行相邻像素的明暗关系"""
+    rows = _gray_pixels(image, 9, 8)
+    value = 0
+    for row in rows:
+        for x in range(8):
+            value = (value << 1) | (row[x] > row[x + 1])
+    return value
+
+
+def phash(image):
+    """DCT 感知哈希：32x32 灰度图做二维 DCT，取左上 8x8 低频（去掉直流分量）与中位数比较"""
+    global _DCT
+    if _DCT is None:
+        n = _PHASH_SIZE
+        k = np.arange(n).reshape(-1, 1)
+        dct = np.cos(np.pi * k * (2 * np.arange(n) + 1) / (2 * n))
+        dct[0] /= np.sqrt(2)
+        _DCT = dct
+    rows = _gray_pixels(image, _PHASH_SIZE, _PHASH_SIZE)
+    pixels = np.frombuffer(b''.join(rows), dtype=np.uint8).reshape(_PHASH_SIZE, _PHASH_SIZE)
+    freq = _DCT @ pixels.astype(np.float32) @ _DCT.T
+    low = freq[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    bits[0] = False
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class PerceptualHashStore:
+    """感知哈希缓存 - 按图片 ID 保存，落盘后再次搜索到同一图片无需重新计算
+
+    - compute() 在工作线程中调用（由网格缩略图计算）；get() 可能读磁盘，UI 线程用 peek()；内部加锁
+    - 键区分算法与是否方形裁切（thumb150），不同来源的哈希不混用
+    - 磁盘文件每行 “键\\t十六进制哈希”，新结果批量追加；条目过多时整体重写
+    """
+
+    FLUSH_EVERY = 32
+
+    def __init__(self, path=None, max_entries=50000):
+        self._path = path or os.path.join(get_cache_dir(), 'phash.tsv')
+        self._max_entries = max_entries
+        self._hashes = {}
+        self._pending = []
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._computed_count = 0
+        self._hit_count = 0
+
+    @staticmethod
+    def _key(url):
+        from src.utils.loaders import get_picture_id
+        shape = 'crop' if '/thumb150/' in url else 'fit'
+        return f"{get_picture_id(url)}:{shape}:{ALGORITHM}"
+
+    def _ensure_loaded(self):
+        """首次访问时读取磁盘文件（调用方持有锁）"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self._path, encoding='utf-8') as f:
+                for line in f:
+                    key, _, value = line.rstrip('\n').partition('\t')
+                    try:
+                        self._hashes[key] = int(value, 16)
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+
+    def warm(self):
+        """预先读取磁盘文件（在工作线程调用，避免首次搜索时在 UI 线程读文件）"""
+        with self._lock:
+            self._ensure_loaded()
+
+    def get(self, url):
+        """已知的哈希（未计算过时返回 None）"""
+        key = self._key(url)
+        with self._lock:
+            self._ensure_loaded()
+            value = self._hashes.get(key)
+            if value is not None:
+                self._hit_count += 1
+            return value
+
+    def peek(self, url):
+        """只查内存中已知的哈希（不读磁盘、不计入统计），供 UI 线程调用；磁盘文件未读入时返回 None"""
+        key = self._key(url)
+        with self._lock:
+            return self._hashes.get(key) if self._loaded else None
+
+    def compute(self, url, image):
+        """由缩略图计算哈希（已缓存时直接返回）"""
+        value = self.get(url)
+        if value is not None or image is None or image.isNull():
+            return value
+        value = phash(image) if ALGORITHM == 'phash' else dhash(image)
+        key = self._key(url)
+        with self._lock:
+            self._hashes[key] = value
+            self._pending.append((key, value))
+            self._computed_count += 1
+            flush = len(self._pending) >= self.FLUSH_EVERY
+        if flush:
+            self.flush()
+        return value
+
+    def flush(self):
+        """把新计算的哈希写入磁盘"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            rewrite = len(self._hashes) > self._max_entries
+            if rewrite:
+                # 只保留最近的一半
+                items = list(self._hashes.items())[-self._max_entries // 2:]
+                self._hashes = dict(items)
+            else:
+                items = pending
+            if not items:
+                return
+            try:
+                os.makedirs(os.path.dirname(self._path), exist_ok=True)
+                with open(self._path, 'w' if rewrite else 'a', encoding='utf-8') as f:
+                    f.writelines(f"{key}\t{value:016x}\n" for key, value in items)
+            except OSError:
+                pass
+
+    def get_stats(self):
+        """获取统计"""
+        with self._lock:
+            return {
+                'algorithm': ALGORITHM,
+                'count': len(self._hashes),
+                'computed': self._computed_count,
+                'hits': self._hit_count
+            }
+
+
+class DuplicateIndex:
+    """单次搜索内的近似重复检测（仅 UI 线程访问）
+
+    add() 返回与之重复的已有索引（无重复时返回 None 并记录）；
+    有 NumPy 时对本次搜索的全部哈希做向量化异或 + 位计数
+    """
+
+    def __init__(self, threshold=None):
+        self.threshold = THRESHOLDS[ALGORITHM] if threshold is None else threshold
+        self._indices = []
+        self._hashes = []
+        self._array = None  # NumPy 数组缓存，新增哈希后失效
+        self.collapsed = 0
+
+    def _distances(self, value):
+        if np is None:
+            return [hamming(value, h) for h in self._hashes]
+        if self._array is None:
+            self._array = np.array(self._hashes, dtype=np.uint64)
+        xor = np.bitwise_xor(self._array, np.uint64(value))
+        return np.unpackbits(xor.view(np.uint8)).reshape(-1, 64).sum(axis=1)
+
+    def add(self, index, value):
+        if self._hashes:
+            distances = self._distances(value)
+            best = int(np.argmin(distances)) if np is not None else min(
+                range(len(distances)), key=distances.__getitem__)
+            if distances[best] <= self.threshold and self._indices[best] != index:
+                self.collapsed += 1
+                return self._indices[best]
+        if index in self._indices:
+            return None
+        self._indices.append(index)
+        self._hashes.append(value)
+        self._array = None
+        return None
+
+    def clear(self):
+        self._indices.clear()
+        self._hashes.clear()
+        self._array = None
+        self.collapsed = 0
+
+# 全局感知哈希缓存实例
+perceptual_hashes = PerceptualHashStore()
+atexit.register(perceptual_hashes.flush)
@@ -0,0 +1,184 @@
+"""
+悬停预览解码缓存 - 工作线程按预览尺寸解码（含 GIF 全部帧），UI 线程保存最近的解码结果
+"""
+
+from collections import OrderedDict
+
+from PyQt6.QtCore import QBuffer, QObject, QRunnable, QSize, pyqtSignal
+from PyQt6.QtGui import QImageReader, QPixmap
+
+from src.utils.image_buffer import as_qbytearray
+
+# 单个预览解码上限：帧数与字节数（超出时退回 QMovie 边播边解码）
+MAX_FRAMES = 150
+MAX_PREVIEW_BYTES = 16 * 1024 * 1024
+
+# 解码结果：超出帧数/字节上限（与解码失败 None 区分，只有超限才记入 oversized）
+TOO_LARGE = 'too_large'
+
+
+class DecodedPreview:
+    """解码好的预览 - 静态图为单帧；工作线程产出 QImage，放入缓存时在 UI 线程转为 QPixmap"""
+    __slots__ = ('frames', 'delays', 'nbytes')
+
+    def __init__(self, frames, delays, nbytes):
+        self.frames = frames  # [QImage] 或 [QPixmap]
+        self.delays = delays  # 每帧显示时长（毫秒）
+        self.nbytes = nbytes
+
+    @property
+    def animated(self):
+        return len(self.frames) > 1
+
+    def to_pixmaps(self, dpr=1.0):
+        """转为 QPixmap（仅 UI 线程调用）"""
+        pixmaps = []
+        for frame in self.frames:
+            pixmap = frame if isinstance(frame, QPixmap) else QPixmap.fromImage(frame)
+            pixmap.setDevicePixelRatio(dpr)
+            pixmaps.append(pixmap)
+        self.frames = pixmaps
+
+
+def decode_preview(data, side):
+    """按最长边 side 解码全部帧；超出帧数/字节上限返回 TOO_LARGE，解码失败返回 None"""
+    buf = QBuffer()
+    buf.setData(as_qbytearray(data))
+    if not buf.open(QBuffer.OpenModeFlag.ReadOnly):
+        return None
+    try:
+        reader = QImageReader(buf)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if size.isValid() and size.width() > 0 and size.height() > 0:
+            scale = min(1.0, side / max(size.width(), size.height()))
+            reader.setScaledSize(QSize(max(1, int(size.width() * scale)),
+                                       max(1, int(size.height() * scale))))
+
+        frames, delays, nbytes = [], [], 0
+        animated = reader.supportsAnimation() and reader.imageCount() != 1
+        while True:
+            image = reader.read()
+            if image.isNull():
+                break
+            frames.append(image)
+            delays.append(max(20, reader.nextImageDelay() or 100))
+            nbytes += image.sizeInBytes()
+            if not animated or not reader.canRead():
+                break
+            if len(frames) >= MAX_FRAMES or nbytes > MAX_PREVIEW_BYTES:
+                return TOO_LARGE
+    finally:
+        buf.close()
+    if not frames:
+        return None
+    return DecodedPreview(frames, delays, nbytes)
+
+
+class _DecodeSignals(QObject):
+    done = pyqtSignal(object)  # DecodedPreview、TOO_LARGE 或 None
+
+
+class PreviewDecodeTask(QRunnable):
+    """预览解码任务（在全局线程池执行）"""
+
+    def __init__(self, data, side):
+        super().__init__()
+        self.data = data
+        self.side = side
+        self.signals = _DecodeSignals()
+        self.setAutoDelete(True)
+
+    def run(self):
+        try:
+            result = decode_preview(self.data, self.side)
+        except Exception:
+            result = None
+        self.signals.done.emit(result)
+
+
+class PreviewCache:
+    """预览解码结果 LRU（仅 UI 线程访问）
+
+    - 键为 (图片 ID, 解码边长)，与域名、尺寸段无关
+    - 字节数上限；无法完整解码的（帧数过多的长动图）记入 oversized（条数上限 + LRU），不再重复尝试
+    """
+
+    def __init__(self, max_size_mb=48, max_oversized=2000):
+        self._entries = OrderedDict()
+        self._max_bytes = max_size_mb * 1024 * 1024
+        self._current_bytes = 0
+        self._oversized = OrderedDict()  # 键 -> None，超过 max_oversized 时淘汰最久未用的
+        self._max_oversized = max_oversized
+        self._hit_count = 0
+        self._miss_count = 0
+
+    @staticmethod
+    def _key(url, side):
+        from src.utils.loaders import get_picture_id
+        return (get_picture_id(url), side)
+
+    def get(self, url, side):
+        key = self._key(url, side)
+        preview = self._entries.get(key)
+        if preview is not None:
+            self._entries.move_to_end(key)
+            self._hit_count += 1
+            return preview
+        self._miss_count += 1
+        return None
+
+    def put(self, url, side, preview, dpr=1.0):
+        """放入缓存（帧转换为 QPixmap）；超过配额一半的不缓存并记入 oversized，避免每次悬停重复获取、解码"""
+        if preview.nbytes > self._max_bytes // 2:
+            self.mark_oversized(url, side)
+            return
+        preview.to_pixmaps(dpr)
+        key = self._key(url, side)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._current_bytes -= old.nbytes
+        while self._entries and self._current_bytes + preview.nbytes > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._current_bytes -= evicted.nbytes
+        self._entries[key] = preview
+        self._current_bytes += preview.nbytes
+
+    def mark_oversized(self, url, side):
+        key = self._key(url, side)
+        self._oversized[key] = None
+        self._oversized.move_to_end(key)
+        while len(self._oversized) > self._max_oversized:
+            self._oversized.popitem(last=False)
+
+    def is_oversized(self, url, side):
+        key = self._key(url, side)
+        if key not in self._oversized:
+            return False
+        self._oversized.move_to_end(key)
+        return True
+
+    def trim(self, max_bytes):
+        """淘汰到 max_bytes 以下，返回释放的字节数"""
+        freed = 0
+        while self._entries and self._current_bytes > max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._current_bytes -= evicted.nbytes
+            freed += evicted.nbytes
+        return freed
+
+    def clear(self):
+        self._entries.clear()
+        self._current_bytes = 0
+
+    def get_stats(self):
+        """获取统计"""
+        return {
+            'size_mb': self._current_bytes / 1024 / 1024,
+            'count': len(self._entries),
+            'hit_rate': self._hit_count / max(1, self._hit_count + self._miss_count),
+            'oversized': len(self._oversized)
+        }
+
+# 全局预览缓存实例
+preview_cache = PreviewCache()
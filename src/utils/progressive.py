@@ -0,0 +1,105 @@
+"""
+渐进式 GIF - 网格只下载到首帧结束，悬停时用 Range 续传其余字节
+"""
+
+from collections import OrderedDict
+import threading
+
+# 剩余字节不足该值时不值得中途停止（直接下载完整动图）
+MIN_DEFERRED_BYTES = 64 * 1024
+
+
+class PartialDownload:
+    """一次中途停止的下载"""
+    __slots__ = ('data', 'total', 'first_frame_end', 'validator')
+
+    def __init__(self, data, total, first_frame_end, validator=None):
+        self.data = data                        # 已下载的前缀字节
+        self.total = total                      # 完整大小（Content-Length）
+        self.first_frame_end = first_frame_end  # 首帧数据结束偏移
+        self.validator = validator              # ETag / Last-Modified，续传时用于 If-Range
+
+    def first_frame(self):
+        """首帧 + GIF 结尾标记，构成一张可解码的单帧 GIF"""
+        return bytes(self.data[:self.first_frame_end]) + b'\x3b'
+
+
+class PartialDownloadStore:
+    """部分下载存储 - 按规范化图片键保存前缀字节，字节数上限 + LRU 淘汰
+
+    - put()/take() 在工作线程中调用，内部加锁
+    - take() 取出后即删除：续传失败时重新完整下载
+    """
+
+    def __init__(self, max_size_mb=32):
+        self._entries = OrderedDict()  # 图片键 -> PartialDownload
+        self._max_bytes = max_size_mb * 1024 * 1024
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+        self._deferred_bytes = 0   # 因只下载首帧而暂缓的字节数
+        self._resumed_count = 0
+
+    @staticmethod
+    def _key(url):
+        from src.utils.loaders import get_picture_key
+        return get_picture_key(url)
+
+    def put(self, url, partial):
+        """保存部分下载"""
+        key = self._key(url)
+        size = len(partial.data)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._current_bytes -= len(old.data)
+            while self._entries and self._current_bytes + size > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= len(evicted.data)
+            self._entries[key] = partial
+            self._current_bytes += size
+            self._deferred_bytes += max(0, partial.total - size)
+
+    def get(self, url):
+        """查看部分下载（不取出）"""
+        key = self._key(url)
+        with self._lock:
+            partial = self._entries.get(key)
+            if partial is not None:
+                self._entries.move_to_end(key)
+            return partial
+
+    def take(self, url):
+        """取出部分下载用于续传"""
+        with self._lock:
+            partial = self._entries.pop(self._key(url), None)
+            if partial is not None:
+                self._current_bytes -= len(partial.data)
+                self._resumed_count += 1
+            return partial
+
+    def has(self, url):
+        with self._lock:
+            return self._key(url) in self._entries
+
+    def trim(self, max_bytes):
+        """淘汰到 max_bytes 以下，返回释放的字节数（被淘汰的图片之后重新完整下载）"""
+        freed = 0
+        with self._lock:
+            while self._entries and self._current_bytes > max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._current_bytes -= len(evicted.data)
+                freed += len(evicted.data)
+        return freed
+
+    def get_stats(self):
+        """获取统计"""
+        with self._lock:
+            return {
+                'count': len(self._entries),
+                'size_mb': self._current_bytes / 1024 / 1024,
+                'deferred_mb': self._deferred_bytes / 1024 / 1024,
+                'resumed': self._resumed_count
+            }
+
+# 全局部分下载存储实例
+partial_store = PartialDownloadStore()
@@ -2,63 +2,196 @@
 线程池管理器 - 优化图片加载性能
 """
 
-from PyQt6.QtCore import QThreadPool, QRunnable, pyqtSignal, QObject, Qt, QBuffer
-from PyQt6.QtGui import QImageReader
+from PyQt6.QtCore import QThreadPool, QRunnable, pyqtSignal, QObject, Qt
+import heapq
+import itertools
 import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from src.utils.delivery import DeliveryBatcher
+from src.utils.image_buffer import BodyReader, SharedImageBuffer, image_handles, share
+from src.utils.image_header import ImageHeaderSniffer
+
+# 调度优先级（数值越小越优先）：悬停等用户交互最先
+PRIORITY_URGENT = -1
+
+# 卡片离开视口时，已下载超过该比例（或剩余不足 NEARLY_DONE_BYTES）的任务降级为仅填充缓存
+NEARLY_DONE_RATIO = 0.75
+NEARLY_DONE_BYTES = 32 * 1024
+
+# 任务未交付结果就结束时，为请求方重新提交的最多次数（超过后按错误上报）
+MAX_RESUBMITS = 1
 
 class TaskSignals(QObject):
-    """任务信号 - 改进版包含index"""
-    loaded = pyqtSignal(int, bytes)     # index, data
-    error = pyqtSignal(int, str, str)   # index, code, message
+    """任务信号 - 一个任务可能服务多个请求方，由线程池按请求方分发"""
+    loaded = pyqtSignal(object, object) # data（SharedImageBuffer 共享只读字节）, 网格缩略图 QImage（可能为 None）
+    error = pyqtSignal(str, str)        # code, message
+    finished = pyqtSignal()             # 任务结束（无论成功/失败/取消），用于调度下一个
 
 class CancelToken:
-    """取消令牌 - 支持取消正在进行的任务"""
-    def __init__(self):
-        self.is_cancelled = False
+    """取消令牌 - 支持取消正在进行的任务；可挂在父令牌下，父令牌取消时一并取消
+    线程池每一代搜索使用一个新的父令牌，取消后不再重置，旧任务因此永久失效"""
+    def __init__(self, parent=None):
+        self.parent = parent
+        self._cancelled = False
+
+    @property
+    def is_cancelled(self):
+        return self._cancelled or (self.parent is not None and self.parent.is_cancelled)
     
     def cancel(self):
-        self.is_cancelled = True
+        self._cancelled = True
     
     def reset(self):
-        self.is_cancelled = False
+        self._cancelled = False
 
 class ImageLoadTask(QRunnable):
     """可取消的图片加载任务 - 支持真正的中断"""
     
-    def __init__(self, url, index, cancel_token):
+    def __init__(self, url, cancel_token, generation=0, first_frame_only=False):
         super().__init__()
         self.url = url
-        self.index = index
         self.cancel_token = cancel_token
+        self.generation = generation  # 所属搜索代数，迟到的旧代结果会被丢弃
         self.signals = TaskSignals()
         self.setAutoDelete(True)
+
+        # 下载进度（工作线程写，主线程读），用于判断离屏时是否值得继续
+        self.bytes_received = 0
+        self.content_length = 0
+        self.header = None      # 图片头解析结果（ImageHeaderSniffer），仅网络下载时存在
+        # 降级为仅填充缓存：继续下载并写入缓存，但不再通知 UI
+        self.cache_only = False
+        # 渐进式 GIF：只下载到首帧结束（主线程可在运行中改回 False，继续下载完整动图）
+        self.first_frame_only = first_frame_only
+
+        # 调度/去重状态（由 ImageThreadPool 在主线程维护）
+        self.key = url          # 规范化 URL
+        self.waiters = {}       # {请求方: (callback, error_callback, priority)}
+        self.priority = None    # 当前在堆中的优先级；None 表示未入队
+        self.started = False
+        self.delivered = False
+        self.result_posted = False  # 结果已进入交付批次（工作线程写）
+        self.attempt = 0            # 未交付结果就结束后重新提交的次数
+
+    def is_nearly_done(self):
+        """下载是否接近完成（未知总长时按未完成处理）"""
+        if self.content_length <= 0:
+            return False
+        remaining = self.content_length - self.bytes_received
+        return (self.bytes_received >= self.content_length * NEARLY_DONE_RATIO
+                or remaining <= NEARLY_DONE_BYTES)
+
+    def _wants_result(self):
+        return not self.cancel_token.is_cancelled and not self.cache_only
+
+    def _deliver(self, data):
+        """在工作线程解码并缩放网格缩略图（QImage 可跨线程传递），连同原始字节一起交给 UI；
+        UI 线程只需 QPixmap.fromImage，不再在事件循环里解码；同时计算缩略图的感知哈希"""
+        if self.cancel_token.is_cancelled:
+            return
+        data = share(data)
+        thumb = None
+        if not self.cache_only:
+            try:
+                from src.utils.derivatives import derivative_store
+                thumb = derivative_store.thumbnail(self.url, data)
+            except Exception:
+                thumb = None  # 解码失败不影响原图（UI 会回退到直接解码）
+            if thumb is not None:
+                # 顺带计算感知哈希（已缓存时跳过），UI 线程据此合并重复表情
+                try:
+                    from src.utils.phash import perceptual_hashes
+                    perceptual_hashes.compute(self.url, thumb)
+                except Exception:
+                    pass
+        if self._wants_result():
+            self.signals.loaded.emit(data, thumb)
+
+    def _emit_error(self, code, message):
+        """发出错误信号（已取消或仅填充缓存的任务不再上报）"""
+        if self._wants_result():
+            self.signals.error.emit(code, message)
         
     def run(self):
-        """执行图片加载 - 支持缓存"""
+        """执行图片加载；结束时总是发出 finished，释放调度名额"""
+        try:
+            self._load()
+        finally:
+            self.signals.finished.emit()
+
+    def _load(self):
+        """执行图片加载 - 依次查询内存缓存、磁盘缓存、（可选）头部探测、网络"""
         if self.cancel_token.is_cancelled:
             return
         
-        # 先检查缓存
+        # 1) 内存缓存
         from src.utils.image_cache import image_cache
         cached_data = image_cache.get(self.url)
         if cached_data:
-            if not self.cancel_token.is_cancelled:
-                self.signals.loaded.emit(self.index, cached_data)
+            self._deliver(cached_data)
             return
-            
+
+        # 2) 磁盘缓存（mmap，命中后提升到内存缓存）
+        from src.utils.disk_cache import disk_cache
+        cached_data = disk_cache.get(self.url)
+        if cached_data:
+            cached_data = image_handles.intern(self.url, cached_data)
+            image_cache.set(self.url, cached_data)
+            self._deliver(cached_data)
+            return
+
+        # 3) 可选探测：大图先用 Range 请求读取头部（已探测过则复用结果），决定跳过 / 改用小尺寸 / 完整下载
+        url = self.url
+        from src.utils.image_probe import image_probe
+        if image_probe.should_check(url):
+            action, url = image_probe.check(url)
+            if self.cancel_token.is_cancelled:
+                return
+            if action == 'skip':
+                self._emit_error("TOO_LARGE", "图片尺寸过大")
+                return
+            if url != self.url:
+                cached_data = image_cache.get(url) or disk_cache.get(url)
+                if cached_data:
+                    cached_data = image_handles.intern(url, cached_data)
+                    image_cache.set(url, cached_data)
+                    self._deliver(cached_data)
+                    return
+
+        # 4) 渐进式 GIF：已有首帧的部分下载时，网格直接复用；完整请求则取出用于续传
+        from src.utils.progressive import partial_store, PartialDownload, MIN_DEFERRED_BYTES
+        if self.first_frame_only:
+            partial = partial_store.get(url)
+            if partial is not None:
+                self._deliver(SharedImageBuffer(partial.first_frame(), partial=True))
+                return
+        else:
+            partial = partial_store.take(url)
+
+        response = None
+        total_size = 0
         try:
             # 延迟导入以避免循环依赖
             from src.utils.network import NetworkManager
-            from src.utils.loaders import get_original_url
+            from src.utils.bandwidth import bandwidth_budget
             from src.core.api import WeiboAPI
             
             # 使用thread-local session
             session = NetworkManager.get_session()
+
+            headers = WeiboAPI.HEADERS
+            if partial is not None:
+                # 从已下载的位置续传；资源已变化时 If-Range 使服务器返回完整内容
+                headers = dict(headers)
+                headers['Range'] = f'bytes={len(partial.data)}-'
+                if partial.validator:
+                    headers['If-Range'] = partial.validator
             
-            # 分离超时，支持快速取消
+            # 分离超时，支持快速取消；URL 尺寸段由调用方选择（探测后可能降为小一档）
             response = session.get(
-                get_original_url(self.url),
-                headers=WeiboAPI.HEADERS,
+                url,
+                headers=headers,
                 timeout=(2, 5),  # 连接2秒，读取5秒
                 stream=True
             )
@@ -66,135 +199,348 @@ class ImageLoadTask(QRunnable):
             if self.cancel_token.is_cancelled:
                 response.close()
                 return
+
+            resumed = (partial is not None and response.status_code == 206
+                       and response.headers.get('Content-Range', '').startswith(f'bytes {len(partial.data)}-'))
                 
-            if response.status_code == 200:
-                # 分块读取，支持中断；在下载过程中尽早探测尺寸，过大则立刻中止
-                chunks = []
-                total_size = 0
+            if response.status_code == 200 or resumed:
+                # 按 Content-Length 预分配缓冲区直接 readinto（未知长度时退回分块拼接）；
+                # 在下载过程中增量解析图片头，尺寸一旦可知、过大则立刻中止
+                # 渐进式下载可能中途停止，不预分配完整长度
+                reader = BodyReader(
+                    response, chunk_size=16384,
+                    prefix=partial.data if resumed else None,
+                    preallocate=not self.first_frame_only
+                )
+                self.content_length = reader.content_length
                 max_size = 10 * 1024 * 1024  # 10MB限制（兜底）
-                header_probe = bytearray()
+                sniffer = ImageHeaderSniffer()
+                self.header = sniffer
                 header_checked = False
                 MAX_PIXELS = 24_000_000   # 约24MP
                 MAX_DIM = 12000           # 任一边超过12000视为过大
 
-                for chunk in response.iter_content(chunk_size=16384):
+                # 声明长度已超限时无需开始下载
+                if reader.content_length > max_size:
+                    self._emit_error("SIZE_LIMIT", "图片过大")
+                    response.close()
+                    return
+
+                # 续传：先解析已下载的前缀
+                if resumed:
+                    total_size = reader.received
+                    sniffer.feed(partial.data)
+
+                for chunk in reader:
                     if self.cancel_token.is_cancelled:
                         response.close()
                         return
-                    if not chunk:
-                        continue
 
-                    chunks.append(chunk)
-                    total_size += len(chunk)
+                    total_size = reader.received
+                    self.bytes_received = total_size
+                    bandwidth_budget.record(len(chunk))
 
-                    # 1) 边下边探测尺寸，尽量只凭前面少量字节即可判断
-                    if not header_checked:
+                    # 1) 边下边解析图片头（纯 Python，只看必要字节）
+                    if not sniffer.complete:
                         try:
-                            header_probe.extend(chunk)
-                            if len(header_probe) >= 4096:  # 有足够头部数据再尝试
-                                buf = QBuffer()
-                                buf.setData(bytes(header_probe))
-                                if buf.open(QBuffer.OpenModeFlag.ReadOnly):
-                                    reader = QImageReader(buf)
-                                    size = reader.size()
-                                    buf.close()
-                                    if size.isValid():
-                                        w, h = size.width(), size.height()
-                                        if w * h > MAX_PIXELS or max(w, h) > MAX_DIM:
-                                            self.signals.error.emit(self.index, "TOO_LARGE", f"图片尺寸过大: {w}x{h}")
-                                            response.close()
-                                            return
-                                        header_checked = True
+                            sniffer.feed(chunk)
                         except Exception:
-                            pass
+                            sniffer.complete = True
+                    if not header_checked and sniffer.size_known:
+                        header_checked = True
+                        w, h = sniffer.width, sniffer.height
+                        if w * h > MAX_PIXELS or max(w, h) > MAX_DIM:
+                            self._emit_error("TOO_LARGE", f"图片尺寸过大: {w}x{h}")
+                            response.close()
+                            return
 
                     # 2) 字节数限制（兜底，防止少数格式长头部导致大流量）
                     if total_size > max_size:
-                        self.signals.error.emit(self.index, "SIZE_LIMIT", "图片过大")
+                        self._emit_error("SIZE_LIMIT", "图片过大")
                         response.close()
                         return
 
-                # 完成下载
-                data = b''.join(chunks)
+                    # 3) 渐进式 GIF：首帧已完整且剩余足够多时停止，其余字节待悬停时续传
+                    if (self.first_frame_only and sniffer.first_frame_end is not None
+                            and sniffer.animated is not False
+                            and reader.content_length - total_size >= MIN_DEFERRED_BYTES):
+                        partial = PartialDownload(
+                            reader.partial(), reader.content_length, sniffer.first_frame_end,
+                            response.headers.get('ETag') or response.headers.get('Last-Modified')
+                        )
+                        response.close()
+                        partial_store.put(url, partial)
+                        self._deliver(SharedImageBuffer(partial.first_frame(), partial=True))
+                        return
 
-                # 存入缓存并回调
-                image_cache.set(self.url, data)
-                if not self.cancel_token.is_cancelled:
-                    self.signals.loaded.emit(self.index, data)
+                # 完成下载（共享只读缓冲区，缓存/磁盘/UI 共用同一份）
+                data = reader.result()
+                if data is None:
+                    self._emit_error("CONNECTION", "下载中断")
+                    response.close()
+                    return
+
+                # 存入缓存并回调（与仍被卡片持有的同一图片共用一份）
+                data = image_handles.intern(url, data)
+                image_cache.set(url, data)
+                disk_cache.set(url, data)
+                self._deliver(data)
             else:
-                self.signals.error.emit(
-                    self.index, f"HTTP_{response.status_code}", 
+                self._emit_error(
+                    f"HTTP_{response.status_code}",
                     f"服务器错误 {response.status_code}"
                 )
                 
-        except requests.exceptions.Timeout:
-            if not self.cancel_token.is_cancelled:
-                self.signals.error.emit(self.index, "TIMEOUT", "连接超时")
-        except requests.exceptions.ConnectionError:
-            if not self.cancel_token.is_cancelled:
-                self.signals.error.emit(self.index, "CONNECTION", "网络错误")
+        except (requests.exceptions.Timeout, ReadTimeoutError):
+            self._emit_error("TIMEOUT", "连接超时")
+        except (requests.exceptions.ConnectionError, ProtocolError):
+            self._emit_error("CONNECTION", "网络错误")
         except Exception as e:
-            if not self.cancel_token.is_cancelled:
-                self.signals.error.emit(self.index, "UNKNOWN", str(e))
+            self._emit_error("UNKNOWN", str(e))
+        finally:
+            # 记录本次请求的耗时分解（中止的下载也记录已接收字节）
+            if response is not None:
+                from src.utils.net_timing import net_timing
+                net_timing.finish(response, total_size)
 
 class ImageThreadPool:
-    """图片加载线程池管理器"""
+    """图片加载线程池管理器
+
+    任务先进入按优先级排序的等待队列（数值越小越优先，通常为距视口中心的行距），
+    同时运行的任务数不超过 max_threads；任务结束后再从队列取出下一个。
+    这样快速滚动时，视口内的卡片总是先于缓冲行/预取项下载。
+
+    同一图片（规范化 URL）同时只下载一次：后来的请求方挂到正在进行的任务上，
+    完成时统一通知；任务优先级取所有请求方中最高的一个。
+
+    新搜索通过“代数”取消旧任务：旧代令牌被取消，旧任务在下一次检查时自行退出，
+    UI 线程从不等待；旧任务不再占用调度名额，使用独立线程池并预留余量供其收尾。
+
+    成功/失败结果不再逐个投递到事件循环，而是交给 batcher 按帧批量交付；
+    finished 仍逐个投递，调度不受批处理延迟影响。
+    """
     
     def __init__(self, max_threads=8):
         """
         初始化线程池
         max_threads: 最大并发线程数（建议 4-8）
         """
-        self.pool = QThreadPool.globalInstance()
-        self.pool.setMaxThreadCount(max_threads)
-        self.cancel_token = CancelToken()
-        self.active_tasks = {}  # {index: task}
+        # 独立线程池：不与全局线程池中的其他任务互相等待
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads * 2)
+        self.max_threads = max_threads
+        self.generation = 0
+        self.cancel_token = CancelToken()  # 当前代的父令牌
+        self.active_tasks = {}  # {请求方: task}（网格为 index，其他为 fetch 分配的负数键）
+        self._inflight = {}     # {规范化 URL: task}，用于合并重复下载
+        self.coalesced_count = 0
+
+        # 优先级调度：堆中条目 (priority, seq, task)，失效条目出堆时惰性丢弃
+        self._queue = []
+        self._seq = itertools.count()
+        self._fetch_keys = itertools.count(-1, -1)
+        self._running = set()   # 当前代正在执行的任务
+
+        # 按帧批量交付结果（在 UI 线程创建）
+        self.batcher = DeliveryBatcher()
         
-    def load_image(self, url, index, callback, error_callback=None):
+    def load_image(self, url, index, callback, error_callback=None, priority=0, first_frame_only=False,
+                   attempt=0):
         """
         提交图片加载任务
-        url: 图片 URL
+        url: 图片 URL（已选定尺寸段，按原样下载）
         index: 图片索引
-        callback: 成功回调 (index, data)
+        callback: 成功回调 (index, data, thumb)，thumb 为工作线程解码好的网格缩略图 QImage（可能为 None）
         error_callback: 错误回调 (index, code, message)
+        priority: 优先级，数值越小越先执行
+        first_frame_only: 渐进式 GIF，只下载到首帧结束（结果 data.partial 为 True）
+        attempt: 重新提交的次数（内部使用，见 _on_finished）
         """
-        # 如果该索引已有任务，不重复提交
+        # 如果该索引已有任务，不重复提交（仅更新优先级）
         if index in self.active_tasks:
+            self.set_priority(index, priority)
             return
-            
-        task = ImageLoadTask(url, index, self.cancel_token)
-        
-        # 使用QueuedConnection确保主线程执行
+
+        from src.utils.loaders import get_picture_key
+        key = get_picture_key(url)
+        task = self._inflight.get(key)
+        if task is not None and not task.cancel_token.is_cancelled:
+            # 同一图片正在下载：挂到现有任务上（仅填充缓存的任务重新恢复通知）
+            self.coalesced_count += 1
+            task.cache_only = False
+            if not first_frame_only:
+                # 有请求方需要完整数据：渐进式任务改为下载完整动图
+                task.first_frame_only = False
+        else:
+            task = self._create_task(url, key, first_frame_only)
+            task.attempt = attempt
+
+        task.waiters[index] = (callback, error_callback, priority)
+        self.active_tasks[index] = task
+        self._update_task_priority(task)
+        self._dispatch()
+
+    def fetch(self, url, callback, error_callback=None, priority=PRIORITY_URGENT):
+        """
+        非网格请求（复制/预览/预取）：与网格共用缓存、去重与调度
+        callback: 成功回调 (data)
+        error_callback: 错误回调 (code, message)
+        返回请求键，可用于 cancel()
+        """
+        key = next(self._fetch_keys)
+        self.load_image(
+            url, key,
+            lambda _key, data, _thumb: callback(data),
+            (lambda _key, code, message: error_callback(code, message)) if error_callback else None,
+            priority
+        )
+        return key
+
+    def _create_task(self, url, key, first_frame_only=False):
+        """创建任务并连接信号（尚未入队）"""
+        # 每个任务有自己的取消句柄，挂在全局令牌下
+        task = ImageLoadTask(url, CancelToken(parent=self.cancel_token), self.generation, first_frame_only)
+        task.key = key
+
+        # 结果在工作线程直接放入交付批次，由 batcher 在主线程按帧统一执行
         task.signals.loaded.connect(
-            lambda idx, data: self._on_loaded(idx, data, callback),
+            lambda data, thumb, t=task: self._post_result(t, self._on_loaded, data, thumb),
+            Qt.ConnectionType.DirectConnection
+        )
+        task.signals.error.connect(
+            lambda code, message, t=task: self._post_result(t, self._on_error, code, message),
+            Qt.ConnectionType.DirectConnection
+        )
+        # 使用QueuedConnection确保主线程执行
+        task.signals.finished.connect(
+            lambda t=task: self._on_finished(t),
             Qt.ConnectionType.QueuedConnection
         )
+        self._inflight[key] = task
+        return task
+
+    def _post_result(self, task, handler, *args):
+        """工作线程：结果进入交付批次（先于 finished，主线程据此不再重新提交请求方）"""
+        task.result_posted = True
+        self.batcher.post(handler, task, *args)
+
+    def _update_task_priority(self, task):
+        """任务优先级 = 所有请求方中最高（数值最小）的优先级；排队中才需要重新入堆"""
+        if task.started or not task.waiters:
+            return
+        priority = min(p for _, _, p in task.waiters.values())
+        if priority == task.priority:
+            return
+        task.priority = priority
+        # 旧条目留在堆中，出堆时因优先级不匹配被丢弃
+        heapq.heappush(self._queue, (priority, next(self._seq), task))
+
+    def _dispatch(self):
+        """在并发名额内按优先级启动排队中的任务"""
+        while self._queue and len(self._running) < self.max_threads:
+            priority, _, task = heapq.heappop(self._queue)
+            # 丢弃失效条目：任务已开始/已取消，或优先级已更新（有更新的条目在堆中）
+            if task.started or not task.waiters or task.priority != priority:
+                continue
+            task.started = True
+            self._running.add(task)
+            self.pool.start(task)
+
+    def _release(self, task):
+        """解除任务与所有请求方、去重表的关联"""
+        for requester in task.waiters:
+            if self.active_tasks.get(requester) is task:
+                del self.active_tasks[requester]
+        task.waiters = {}
+        if self._inflight.get(task.key) is task:
+            del self._inflight[task.key]
+
+    def _on_finished(self, task):
+        """任务结束：释放名额并调度下一个"""
+        self._running.discard(task)
+        if task.result_posted and not task.delivered:
+            # 结果还在交付批次中：由交付时释放请求方
+            self._dispatch()
+            return
+        if task.generation == self.generation and task.waiters and not task.delivered:
+            # 任务未交付结果就结束（如降级为仅填充缓存后又有人挂上来）：
+            # 为剩余请求方重新提交一次，通常会直接命中缓存；再次失败（如确定性异常）时按错误上报，避免反复重试
+            waiters = task.waiters
+            self._release(task)
+            for requester, (callback, error_callback, priority) in waiters.items():
+                if task.attempt < MAX_RESUBMITS:
+                    self.load_image(task.url, requester, callback, error_callback, priority,
+                                    task.first_frame_only, attempt=task.attempt + 1)
+                elif error_callback:
+                    error_callback(requester, "NO_RESULT", "图片加载失败")
+        else:
+            self._release(task)
+        self._dispatch()
         
-        if error_callback:
-            task.signals.error.connect(
-                error_callback,
-                Qt.ConnectionType.QueuedConnection
-            )
-            
-        self.active_tasks[index] = task
-        self.pool.start(task)
-        
-    def _on_loaded(self, index, data, callback):
-        """加载完成处理"""
-        self.active_tasks.pop(index, None)
-        callback(index, data)
+    def _on_loaded(self, task, data, thumb):
+        """加载完成处理：通知所有请求方（旧代或已取消任务的迟到结果一律丢弃）"""
+        if task.generation != self.generation:
+            return
+        task.delivered = True
+        waiters = task.waiters
+        self._release(task)
+        for requester, (callback, _, _) in waiters.items():
+            callback(requester, data, thumb)
+
+    def _on_error(self, task, code, message):
+        """错误处理：通知所有请求方（旧代或已取消任务不再上报）"""
+        if task.generation != self.generation:
+            return
+        task.delivered = True
+        waiters = task.waiters
+        self._release(task)
+        for requester, (_, error_callback, _) in waiters.items():
+            if error_callback:
+                error_callback(requester, code, message)
+
+    def cancel(self, index):
+        """取消单个请求方（卡片离开视口时调用）
+        - 任务仍有其他请求方：只移除该请求方
+        - 排队中：直接出队
+        - 运行中且接近完成：降级为仅填充缓存，完成后不通知 UI
+        - 其他：中止下载
+        """
+        task = self.active_tasks.pop(index, None)
+        if task is None:
+            return
+        task.waiters.pop(index, None)
+        if task.waiters:
+            self._update_task_priority(task)
+            return
+        if task.started and task.is_nearly_done():
+            task.cache_only = True
+            return
+        # 堆中条目会因没有请求方而在出堆时被丢弃
+        task.cancel_token.cancel()
+        if self._inflight.get(task.key) is task:
+            del self._inflight[task.key]
         
     def cancel_all(self):
-        """取消所有任务"""
+        """取消所有任务：进入新一代，不等待正在执行的旧任务
+        旧令牌保持取消状态（不再 reset），仍在运行的旧任务检查后自行退出"""
         self.cancel_token.cancel()
+        self.cancel_token = CancelToken()
+        self.generation += 1
         self.active_tasks.clear()
-        # 等待当前正在执行的任务完成
-        self.pool.waitForDone(100)  # 最多等待 100ms
-        # 重置令牌供下次使用
-        self.cancel_token.reset()
+        self._inflight.clear()
+        self._queue.clear()
+        # 旧任务不再计入调度名额（其 finished 到达时不在集合中，直接忽略）
+        self._running = set()
         
     def set_priority(self, index, priority):
-        """设置任务优先级（为未来扩展预留）"""
-        # QThreadPool 不直接支持优先级
-        # 可以通过自定义调度实现
-        pass
\ No newline at end of file
+        """更新请求方的优先级（已开始执行的任务不受影响）"""
+        task = self.active_tasks.get(index)
+        if task is None or index not in task.waiters:
+            return
+        callback, error_callback, _ = task.waiters[index]
+        task.waiters[index] = (callback, error_callback, priority)
+        self._update_task_priority(task)
+
+    def pending_count(self):
+        """排队中（尚未开始）的任务数"""
+        return sum(1 for t in set(self.active_tasks.values()) if not t.started)